@@ -5,4 +5,6 @@ class AuthenticationConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'authentication'
 
+    def ready(self):
+        from . import signals  # noqa: F401
 
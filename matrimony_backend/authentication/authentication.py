@@ -1,6 +1,9 @@
-from rest_framework.authentication import TokenAuthentication
+from django.utils.translation import gettext_lazy as _
+from rest_framework.authentication import TokenAuthentication, get_authorization_header
 from rest_framework.exceptions import AuthenticationFailed
 
+from .cache import cache_token, get_cached_token
+
 
 class TokenOrBearerAuthentication(TokenAuthentication):
     """
@@ -8,33 +11,52 @@ class TokenOrBearerAuthentication(TokenAuthentication):
     Accepts:
     - Authorization: Token <token_key>
     - Authorization: Bearer <token_key>
+
+    Resolved tokens are cached (see authentication.cache), so a cache hit
+    authenticates without touching the database. A miss loads the user's
+    profile along with the token.
     """
-    
+    keywords = ('Token', 'Bearer')
+
     def authenticate(self, request):
-        # Get the authorization header
-        auth = request.META.get('HTTP_AUTHORIZATION', '')
-        
-        if not auth:
+        auth = get_authorization_header(request).split()
+
+        if not auth or auth[0].lower() not in [keyword.lower().encode() for keyword in self.keywords]:
             return None
-            
-        # Check if it starts with 'Token ' or 'Bearer '
-        if auth.startswith('Token '):
-            # Use the parent TokenAuthentication for Token format
-            return super().authenticate(request)
-        elif auth.startswith('Bearer '):
-            # Handle Bearer format by extracting the token and using parent method
-            # Temporarily modify the header to use Token format
-            original_auth = request.META.get('HTTP_AUTHORIZATION')
-            request.META['HTTP_AUTHORIZATION'] = auth.replace('Bearer ', 'Token ', 1)
-            
-            try:
-                result = super().authenticate(request)
-                return result
-            finally:
-                # Restore the original header
-                if original_auth:
-                    request.META['HTTP_AUTHORIZATION'] = original_auth
-                else:
-                    del request.META['HTTP_AUTHORIZATION']
-        
-        return None
+
+        if len(auth) == 1:
+            msg = _('Invalid token header. No credentials provided.')
+            raise AuthenticationFailed(msg)
+        elif len(auth) > 2:
+            msg = _('Invalid token header. Token string should not contain spaces.')
+            raise AuthenticationFailed(msg)
+
+        try:
+            token = auth[1].decode()
+        except UnicodeError:
+            msg = _('Invalid token header. Token string should not contain invalid characters.')
+            raise AuthenticationFailed(msg)
+
+        return self.authenticate_credentials(token)
+
+    def authenticate_credentials(self, key):
+        token = get_cached_token(key)
+        if token is None:
+            token = self.load_token(key)
+            cache_token(token)
+
+        if not token.user.is_active:
+            raise AuthenticationFailed(_('User inactive or deleted.'))
+
+        return (token.user, token)
+
+    def load_token(self, key):
+        """
+        The token with its user and the user's profile, in one query; the
+        profile is picked up by the request's ViewerContext (authentication.viewer)
+        """
+        model = self.get_model()
+        try:
+            return model.objects.select_related('user', 'user__profile').get(key=key)
+        except model.DoesNotExist:
+            raise AuthenticationFailed(_('Invalid token.'))
@@ -0,0 +1,108 @@
+"""
+Token -> user resolution cache used by TokenOrBearerAuthentication.
+
+Two tiers: a small in-process TTL/LRU cache answers repeat requests without
+any network round-trip, and the shared Django cache (Redis) lets every worker
+reuse a lookup. Entries are invalidated explicitly whenever a user's tokens
+or account change; other workers' in-process entries expire within
+AUTH_TOKEN_LOCAL_CACHE_TIMEOUT seconds.
+"""
+import logging
+import pickle
+import threading
+
+from cachetools import TTLCache
+from django.conf import settings
+from django.core.cache import cache
+
+from matrimony.instrumentation import record_cache
+
+logger = logging.getLogger(__name__)
+
+SHARED_TIMEOUT = getattr(settings, 'AUTH_TOKEN_CACHE_TIMEOUT', 300)
+
+_local = TTLCache(
+    maxsize=getattr(settings, 'AUTH_TOKEN_LOCAL_CACHE_SIZE', 1024),
+    ttl=getattr(settings, 'AUTH_TOKEN_LOCAL_CACHE_TIMEOUT', 10),
+)
+_local_lock = threading.Lock()
+
+
+def _token_cache_key(key):
+    return f'auth:token:{key}'
+
+
+def _user_tokens_cache_key(user_id):
+    return f'auth:user_tokens:{user_id}'
+
+
+def get_cached_token(key):
+    """The cached Token (with its user loaded) for ``key``, or None"""
+    with _local_lock:
+        entry = _local.get(key)
+    if entry is not None:
+        record_cache(True)
+        # Each request gets its own copy so in-request mutations never leak
+        return pickle.loads(entry[1])
+
+    try:
+        token = cache.get(_token_cache_key(key))
+    except Exception:
+        logger.warning('Shared token cache unavailable', exc_info=True)
+        return None
+
+    record_cache(token is not None)
+    if token is not None:
+        with _local_lock:
+            _local[key] = (token.user_id, pickle.dumps(token))
+    return token
+
+
+def cache_token(token):
+    """Cache a Token whose user has been loaded (e.g. via select_related)"""
+    token = _without_profile(token)
+    with _local_lock:
+        _local[token.key] = (token.user_id, pickle.dumps(token))
+
+    try:
+        cache.set(_token_cache_key(token.key), token, SHARED_TIMEOUT)
+        # Remember which keys belong to the user so they can be invalidated
+        # without a database lookup
+        user_tokens_key = _user_tokens_cache_key(token.user_id)
+        keys = cache.get(user_tokens_key) or set()
+        keys.add(token.key)
+        cache.set(user_tokens_key, keys, SHARED_TIMEOUT)
+    except Exception:
+        logger.warning('Shared token cache unavailable', exc_info=True)
+
+
+def _without_profile(token):
+    """
+    Copy of ``token`` without the user's profile, if it was loaded: profiles
+    change far more often than users, and nothing invalidates tokens then
+    """
+    token = pickle.loads(pickle.dumps(token))
+    token.user._state.fields_cache.pop('profile', None)
+    return token
+
+
+def invalidate_user_tokens(user):
+    """Drop every cached token of ``user``; call whenever tokens or the user change"""
+    user_id = getattr(user, 'pk', user)
+
+    with _local_lock:
+        local_keys = [key for key, (owner, _) in _local.items() if owner == user_id]
+        for key in local_keys:
+            _local.pop(key, None)
+
+    try:
+        user_tokens_key = _user_tokens_cache_key(user_id)
+        keys = (cache.get(user_tokens_key) or set()) | set(local_keys)
+        cache.delete_many([_token_cache_key(key) for key in keys] + [user_tokens_key])
+    except Exception:
+        logger.warning('Shared token cache unavailable', exc_info=True)
+
+
+def clear_local_cache():
+    with _local_lock:
+        _local.clear()
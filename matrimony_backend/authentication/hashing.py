@@ -0,0 +1,105 @@
+"""
+Password hashing on a small per-process thread pool.
+
+Hashing a password takes a few hundred milliseconds of CPU by design. Run
+inline, a burst of logins occupies every thread and worker the server has,
+and profile reads queue behind them. Here hashing runs on at most
+PASSWORD_HASHING_WORKERS threads per process; Django's hashers (PBKDF2,
+Argon2, bcrypt) release the GIL, so other threads keep serving requests
+meanwhile. Async views await the pool (acheck_password, aauthenticate)
+without holding any thread at all.
+
+Only hashing runs on the pool; database work stays with the caller.
+"""
+import asyncio
+import functools
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.contrib.auth import hashers
+
+WORKERS = getattr(settings, 'PASSWORD_HASHING_WORKERS', 1)
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def _pool():
+    global _executor
+    if _executor is None:
+        with _executor_lock:
+            if _executor is None:
+                _executor = ThreadPoolExecutor(max_workers=WORKERS, thread_name_prefix='password-hashing')
+    return _executor
+
+
+def _forget_pool():
+    # A forked worker doesn't inherit the pool's threads
+    global _executor
+    _executor = None
+
+
+os.register_at_fork(after_in_child=_forget_pool)
+
+
+def _run(fn, *args):
+    return _pool().submit(fn, *args).result()
+
+
+async def _arun(fn, *args):
+    return await asyncio.get_running_loop().run_in_executor(_pool(), functools.partial(fn, *args))
+
+
+def _verify(raw_password, encoded):
+    """(correct, hash needs upgrading), as hashers.check_password tells"""
+    upgrade = []
+    correct = hashers.check_password(raw_password, encoded, setter=upgrade.append)
+    return correct, bool(upgrade)
+
+
+def make_password(raw_password):
+    return _run(hashers.make_password, raw_password)
+
+
+def set_password(user, raw_password):
+    """user.set_password(), hashing on the pool"""
+    user.password = make_password(raw_password)
+    # Picked up by save() to notify the password validators, as set_password does
+    user._password = raw_password
+
+
+def check_password(user, raw_password):
+    """user.check_password(), hashing on the pool"""
+    correct, upgrade = _run(_verify, raw_password, user.password)
+    if upgrade:
+        # Rehash with the preferred hasher; not a password change
+        user.password = make_password(raw_password)
+        user.save(update_fields=['password'])
+    return correct
+
+
+async def acheck_password(user, raw_password):
+    correct, upgrade = await _arun(_verify, raw_password, user.password)
+    if upgrade:
+        user.password = await _arun(hashers.make_password, raw_password)
+        await user.asave(update_fields=['password'])
+    return correct
+
+
+async def aauthenticate(username, password):
+    """
+    authenticate() with ModelBackend's rules (see backends.PooledHashingBackend)
+    for async views: the user if the credentials are right and it is active
+    """
+    User = get_user_model()
+    user = await User._default_manager.filter(**{User.USERNAME_FIELD: username}).afirst()
+    if user is None:
+        # Hash anyway, so unknown usernames take as long as wrong passwords
+        await _arun(hashers.make_password, password)
+        return None
+    if await acheck_password(user, password) and getattr(user, 'is_active', True):
+        return user
+    return None
@@ -1,7 +1,12 @@
 from django.contrib.auth import authenticate, get_user_model
 from django.contrib.auth.password_validation import validate_password
+from django.db import IntegrityError, transaction
 from rest_framework import serializers
 
+from user_profile import constraints
+
+from . import hashing
+
 
 User = get_user_model()
 
@@ -31,22 +36,35 @@ class RegisterSerializer(serializers.ModelSerializer):
 
     def create(self, validated_data):
         password = validated_data.pop('password')
-        user: User = User.objects.create(**validated_data)
-        user.set_password(password)
-        user.save()
+        user: User = User(**validated_data)
+        hashing.set_password(user, password)
+        try:
+            # Email uniqueness is enforced by the database (see user_profile.constraints)
+            with transaction.atomic():
+                user.save()
+        except IntegrityError as e:
+            field = constraints.duplicate_field(e)
+            if field != 'email':
+                raise
+            raise serializers.ValidationError({field: constraints.MESSAGES[field]})
         return user
 
 
-class LoginSerializer(serializers.Serializer):
+class LoginCredentialsSerializer(serializers.Serializer):
+    """The fields of a login, not checked against any user"""
     username = serializers.CharField()
     password = serializers.CharField(write_only=True)
 
+    invalid_credentials = 'Invalid credentials'
+
+
+class LoginSerializer(LoginCredentialsSerializer):
     def validate(self, attrs):
         username = attrs.get('username')
         password = attrs.get('password')
         user = authenticate(username=username, password=password)
         if not user:
-            raise serializers.ValidationError('Invalid credentials')
+            raise serializers.ValidationError(self.invalid_credentials)
         attrs['user'] = user
         return attrs
 
@@ -0,0 +1,21 @@
+from django.contrib.auth import get_user_model
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from rest_framework.authtoken.models import Token
+
+from .cache import invalidate_user_tokens
+
+User = get_user_model()
+
+
+@receiver(post_save, sender=User)
+def invalidate_tokens_on_user_change(sender, instance, created=False, update_fields=None, **kwargs):
+    """Cached tokens carry a copy of the user (is_active, names, ...)"""
+    if created or (update_fields and set(update_fields) <= {'last_login'}):
+        return
+    invalidate_user_tokens(instance)
+
+
+@receiver(post_delete, sender=Token)
+def invalidate_deleted_token(sender, instance, **kwargs):
+    invalidate_user_tokens(instance.user_id)
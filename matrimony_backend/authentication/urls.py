@@ -1,3 +1,4 @@
+from django.conf import settings
 from django.urls import path
 
 from .views import (
@@ -8,10 +9,15 @@ from .views import (
     PasswordChangeView,
 )
 
+login_view = LoginView.as_view()
+
+if settings.ASYNC_LOGIN:
+    from .async_views import AsyncLoginView
+    login_view = AsyncLoginView.as_view()
 
 urlpatterns = [
     path('register/', RegisterView.as_view(), name='auth-register'),
-    path('login/', LoginView.as_view(), name='auth-login'),
+    path('login/', login_view, name='auth-login'),
     path('logout/', LogoutView.as_view(), name='auth-logout'),
     path('profile/', ProfileView.as_view(), name='auth-profile'),
     path('password/change/', PasswordChangeView.as_view(), name='auth-password-change'),
@@ -0,0 +1,78 @@
+"""
+Who a request is made by, resolved once per request.
+
+TokenOrBearerAuthentication loads the token, its user and the user's profile
+in one joined query; get_viewer() wraps them in a ViewerContext that views
+share instead of looking the profile up again. Cached tokens don't carry the
+profile (see authentication.cache), so on a token cache hit the profile is
+loaded on first use, once.
+"""
+from dataclasses import dataclass
+from functools import cached_property
+from typing import Optional
+
+from django.contrib.auth import get_user_model
+from django.contrib.auth.base_user import AbstractBaseUser
+from django.contrib.auth.models import AnonymousUser
+
+from user_profile.models import UserProfile
+
+User = get_user_model()
+
+_NOT_LOADED = object()
+
+
+def _profile_cache():
+    """The reverse one-to-one holding ``user.profile`` once loaded"""
+    return User.profile.related
+
+
+@dataclass
+class ViewerContext:
+    """The user a request is made by and their profile, shared by the request's views"""
+    user: AbstractBaseUser | AnonymousUser
+
+    @property
+    def is_authenticated(self) -> bool:
+        return self.user.is_authenticated
+
+    @property
+    def is_staff(self) -> bool:
+        return self.user.is_staff
+
+    @cached_property
+    def profile(self) -> Optional[UserProfile]:
+        """The viewer's profile, None when anonymous or without one"""
+        if not self.is_authenticated:
+            return None
+        profile = self._loaded_profile()
+        if profile is _NOT_LOADED:
+            profile = self._remember(UserProfile.objects.filter(user=self.user).first())
+        return profile
+
+    async def aload_profile(self):
+        """Resolve ``profile`` ahead of time on the event loop, where lazy queries aren't allowed"""
+        if 'profile' in self.__dict__ or not self.is_authenticated:
+            return
+        if self._loaded_profile() is _NOT_LOADED:
+            self._remember(await UserProfile.objects.filter(user=self.user).afirst())
+
+    def _loaded_profile(self):
+        """The profile loaded along with the user, _NOT_LOADED if it wasn't"""
+        related = _profile_cache()
+        return related.get_cached_value(self.user) if related.is_cached(self.user) else _NOT_LOADED
+
+    def _remember(self, profile):
+        # Cache both ways, so user.profile and profile.user don't query again
+        _profile_cache().set_cached_value(self.user, profile)
+        if profile is not None:
+            UserProfile.user.field.set_cached_value(profile, self.user)
+        return profile
+
+
+def get_viewer(request) -> ViewerContext:
+    """The ViewerContext of a DRF ``request``, made on first use"""
+    viewer = getattr(request, '_viewer', None)
+    if viewer is None or viewer.user is not request.user:
+        viewer = request._viewer = ViewerContext(request.user)
+    return viewer
@@ -4,7 +4,11 @@ from rest_framework.permissions import AllowAny, IsAuthenticated
 from rest_framework.response import Response
 from rest_framework.authtoken.models import Token
 from rest_framework.views import APIView
+from matrimony.celery import enqueue_on_commit
+from notification.tasks import unregister_user_devices
+from . import hashing
 from .authentication import TokenOrBearerAuthentication
+from .cache import invalidate_user_tokens
 
 from .serializers import (
     RegisterSerializer,
@@ -49,12 +53,7 @@ class LogoutView(APIView):
     def post(self, request):
         if request.user.is_authenticated:
             # Unregister all notification devices on logout
-            try:
-                from notification.services import FirebaseNotificationService
-                firebase_service = FirebaseNotificationService()
-                firebase_service.unregister_user_devices(request.user)
-            except Exception:
-                pass
+            enqueue_on_commit(unregister_user_devices.si(request.user.pk))
                 
             # Token.objects.filter(user=request.user).delete()
         return Response(status=status.HTTP_204_NO_CONTENT)
@@ -81,10 +80,11 @@ class PasswordChangeView(APIView):
     def put(self, request):
         serializer = PasswordChangeSerializer(data=request.data)
         serializer.is_valid(raise_exception=True)
-        if not request.user.check_password(serializer.validated_data['old_password']):
+        if not hashing.check_password(request.user, serializer.validated_data['old_password']):
             return Response({'detail': 'Old password is incorrect'}, status=status.HTTP_400_BAD_REQUEST)
-        request.user.set_password(serializer.validated_data['new_password'])
+        hashing.set_password(request.user, serializer.validated_data['new_password'])
         request.user.save()
+        invalidate_user_tokens(request.user)
         Token.objects.filter(user=request.user).delete()
         new_token = Token.objects.create(user=request.user)
         return Response({'token': new_token.key})
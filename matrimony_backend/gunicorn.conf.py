@@ -10,6 +10,8 @@ BASE_DIR = Path(__file__).resolve().parent
 # For I/O-bound applications, you can use: num_cores + 1
 def get_workers():
     """Calculate the number of workers based on CPU cores"""
+    if os.getenv("GUNICORN_WORKERS"):
+        return int(os.getenv("GUNICORN_WORKERS"))
     cores = multiprocessing.cpu_count()
     # Use (2 x cores) + 1 for CPU-bound applications
     # For I/O-bound applications, use cores + 1
@@ -20,9 +22,29 @@ def get_workers():
 bind = "unix:/run/matrimony_backend/gunicorn.sock"
 backlog = 2048
 
+# Server mode
+# "wsgi": sync (or gthread) workers serving matrimony.wsgi
+# "asgi": uvicorn workers serving matrimony.asgi, with the read-only profile
+#         endpoints and login running as native async views
+#         (ASYNC_PROFILE_READS, ASYNC_LOGIN)
+server_mode = os.getenv("GUNICORN_SERVER_MODE", "wsgi")
+
 # Worker processes
 workers = get_workers()
-worker_class = "sync"
+if server_mode == "asgi":
+    wsgi_app = "matrimony.asgi:application"
+    worker_class = "uvicorn.workers.UvicornWorker"
+    # Every ASGI request runs in its own thread, so persistent connections
+    # would pile up; pool through pgbouncer (DB_PGBOUNCER) instead
+    raw_env = ["ASYNC_PROFILE_READS=true", "ASYNC_LOGIN=true", "DB_CONN_MAX_AGE=0"]
+else:
+    wsgi_app = "matrimony.wsgi:application"
+    worker_class = "sync"
+# Each thread holds one persistent database connection (CONN_MAX_AGE), so
+# threads is also the per-worker connection pool size. More than one thread
+# switches gunicorn to the gthread worker.
+threads = int(os.getenv("GUNICORN_THREADS", "1"))
+# Concurrent connections per async worker (ignored by sync workers)
 worker_connections = 1000
 max_requests = 1000
 max_requests_jitter = 50
@@ -30,6 +52,18 @@ preload_app = True
 timeout = 30
 keepalive = 2
 
+# Prometheus metrics (matrimony.metrics): every worker writes its samples to
+# memory-mapped files here, which /metrics adds up. gunicorn.service sets it
+# from metrics.env, shared with the Celery worker; this is for running
+# gunicorn by hand. Set before the app is imported, since prometheus_client
+# reads it then.
+os.environ.setdefault("PROMETHEUS_MULTIPROC_DIR", "/run/matrimony_metrics")
+
+# Seconds when_ready waits for PostgreSQL, Redis and S3 to answer
+# (matrimony.health) before spawning workers; requests queue on the socket
+# meanwhile. Workers are spawned anyway once it runs out.
+ready_timeout = int(os.getenv("GUNICORN_READY_TIMEOUT", "60"))
+
 # Logging
 accesslog = os.path.join(BASE_DIR, "logs", "gunicorn_access.log")
 errorlog = os.path.join(BASE_DIR, "logs", "gunicorn_error.log")
@@ -67,6 +101,10 @@ reload_engine = "auto"
 def on_starting(server):
     """Log when the server is starting"""
     server.log.info("Starting Umatrimony Backend server")
+    os.makedirs(os.environ["PROMETHEUS_MULTIPROC_DIR"], exist_ok=True)
+    # Fold in the metrics of workers of a previous run that didn't exit cleanly
+    from matrimony.metrics import archive_dead_processes
+    archive_dead_processes()
 
 def on_reload(server):
     """Log when the server is reloading"""
@@ -83,6 +121,9 @@ def pre_fork(server, worker):
 def post_fork(server, worker):
     """Log after forking a worker"""
     server.log.info("Worker spawned (pid: %s)", worker.pid)
+    # Never share a database socket opened by the preloaded master
+    from django.db import connections
+    connections.close_all()
 
 def post_worker_init(worker):
     """Log after a worker has been initialized"""
@@ -97,12 +138,27 @@ def pre_exec(server):
     server.log.info("Forked child, re-executing.")
 
 def when_ready(server):
-    """Log when the server is ready"""
+    """Wait for the dependencies to answer, then log when the server is ready"""
+    from matrimony.health import wait_until_ready
+    if not wait_until_ready(ready_timeout, log=server.log.warning):
+        server.log.error("Dependencies not ready after %ss, spawning workers anyway", ready_timeout)
     server.log.info("Server is ready. Spawning workers")
+    server.log.info(
+        "Database connections: up to %s (%s workers x %s threads)",
+        server.cfg.workers * server.cfg.threads, server.cfg.workers, server.cfg.threads,
+    )
 
 def worker_exit(server, worker):
     """Log when a worker exits"""
     server.log.info("Worker exited (pid: %s)", worker.pid)
+    # Keep its counts in the /metrics totals, without its files
+    from matrimony.metrics import mark_process_dead
+    mark_process_dead(worker.pid)
+
+def child_exit(server, worker):
+    """Archive the metrics of a worker killed before worker_exit could run"""
+    from matrimony.metrics import mark_process_dead
+    mark_process_dead(worker.pid)
 
 def on_exit(server):
     """Log when the server exits"""
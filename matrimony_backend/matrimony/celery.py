@@ -1,5 +1,11 @@
+import logging
 import os
+
 from celery import Celery
+from celery.signals import (
+    task_postrun, task_prerun, worker_process_init, worker_process_shutdown, worker_shutdown,
+)
+from django.db import transaction
 
 # Set the default Django settings module for the 'celery' program.
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'matrimony.settings')
@@ -15,6 +21,70 @@ app.config_from_object('django.conf:settings', namespace='CELERY')
 # Load task modules from all registered Django apps.
 app.autodiscover_tasks()
 
+logger = logging.getLogger(__name__)
+
+# Options of tasks that are safe to run more than once: redelivered if a
+# worker dies mid-task, retried with exponential backoff (up to 10 minutes
+# apart) on the errors they list in autoretry_for
+IDEMPOTENT_TASK = {
+    'acks_late': True,
+    'reject_on_worker_lost': True,
+    'retry_backoff': True,
+    'retry_backoff_max': 600,
+    'retry_jitter': True,
+    'max_retries': 5,
+}
+
+
+def enqueue_on_commit(signature):
+    """
+    Queue a task signature (or chain) once the current transaction commits,
+    so the worker sees the committed rows. A broker outage is logged rather
+    than failing the request; each caller has a way to catch up.
+    """
+    def enqueue():
+        try:
+            signature.apply_async()
+        except Exception:
+            logger.warning('Could not queue %r', signature, exc_info=True)
+
+    transaction.on_commit(enqueue)
+
+
+@task_prerun.connect
+def record_task_start(task_id=None, **kwargs):
+    from . import metrics
+    metrics.task_started(task_id)
+
+
+@task_postrun.connect
+def record_task_duration(task_id=None, task=None, state=None, **kwargs):
+    from . import metrics
+    metrics.task_finished(task_id, task.name, state)
+
+
+@worker_process_shutdown.connect
+def archive_process_metrics(pid=None, **kwargs):
+    # Keep the tasks a recycled pool process ran in the /metrics totals
+    from . import metrics
+    metrics.mark_process_dead(pid)
+
+
+@worker_process_init.connect
+def archive_killed_process_metrics(**kwargs):
+    # A pool process killed outright (time limit, out of memory) never sends
+    # worker_process_shutdown; the one replacing it archives its files
+    from . import metrics
+    metrics.archive_dead_processes()
+
+
+@worker_shutdown.connect
+def archive_pool_metrics(**kwargs):
+    # Pool processes that didn't get to shut down cleanly with the worker
+    from . import metrics
+    metrics.archive_dead_processes()
+
+
 @app.task(bind=True, ignore_result=True)
 def debug_task(self):
     print(f'Request: {self.request!r}')
@@ -0,0 +1,173 @@
+"""
+Readiness: whether PostgreSQL, the Celery broker (Redis) and S3 answer, and
+how fast.
+
+/health/ready/ runs one probe per dependency, concurrently, each bounded by
+HEALTH_CHECK_TIMEOUT seconds, and answers 503 unless all pass. Results are
+kept for HEALTH_CHECK_CACHE_SECONDS per process and only one request at a
+time probes, so however often nginx, deploy scripts or monitoring ask, each
+worker touches the dependencies at most once per period. gunicorn's
+when_ready hook calls wait_until_ready() before spawning workers.
+"""
+import logging
+import math
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from concurrent.futures import TimeoutError as FutureTimeoutError
+
+from django.conf import settings
+from django.db import connections, transaction
+from django.http import JsonResponse
+
+logger = logging.getLogger(__name__)
+
+TIMEOUT = getattr(settings, 'HEALTH_CHECK_TIMEOUT', 2)
+CACHE_SECONDS = getattr(settings, 'HEALTH_CHECK_CACHE_SECONDS', 5)
+
+DATABASE_PROBE = 'SELECT 1'
+
+_executor = None
+_lock = threading.Lock()
+_s3_client = None
+# (time.monotonic() of the probes, report)
+_last = None
+
+
+def _pool():
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(max_workers=len(CHECKS), thread_name_prefix='health-check')
+    return _executor
+
+
+def _forget_state():
+    # A forked worker doesn't inherit the pool's threads, nor the lock's
+    # owner, and mustn't share the S3 client's sockets
+    global _executor, _lock, _s3_client
+    _executor = None
+    _lock = threading.Lock()
+    _s3_client = None
+
+
+os.register_at_fork(after_in_child=_forget_state)
+
+
+def check_database():
+    connection = connections['default']
+    # Give up in the probe itself, not only in probe()'s wait for it: a hung
+    # connect or query would otherwise keep this pool thread busy. This
+    # thread's own copy of the settings; libpq counts connect_timeout in
+    # whole seconds, at least 2. SET LOCAL rather than a startup option,
+    # which pgbouncer drops.
+    options = {**connection.settings_dict['OPTIONS'], 'connect_timeout': max(2, math.ceil(TIMEOUT))}
+    connection.settings_dict = {**connection.settings_dict, 'OPTIONS': options}
+    try:
+        with transaction.atomic(using=connection.alias), connection.cursor() as cursor:
+            cursor.execute('SET LOCAL statement_timeout = %s', [max(1, int(TIMEOUT * 1000))])
+            cursor.execute(DATABASE_PROBE)
+    finally:
+        # Probe threads would otherwise each keep a persistent connection
+        connection.close()
+
+
+def check_broker():
+    if getattr(settings, 'CELERY_TASK_ALWAYS_EAGER', False):
+        return 'skipped'
+    import redis
+    client = redis.Redis.from_url(
+        settings.CELERY_BROKER_URL, socket_timeout=TIMEOUT, socket_connect_timeout=TIMEOUT,
+    )
+    try:
+        client.ping()
+    finally:
+        client.close()
+
+
+def _s3():
+    global _s3_client
+    if _s3_client is None:
+        import boto3
+        from botocore.config import Config
+        _s3_client = boto3.client(
+            's3',
+            aws_access_key_id=settings.AWS_ACCESS_KEY_ID,
+            aws_secret_access_key=settings.AWS_SECRET_ACCESS_KEY,
+            region_name=settings.AWS_S3_REGION_NAME,
+            endpoint_url=settings.AWS_S3_ENDPOINT_URL,
+            config=Config(connect_timeout=TIMEOUT, read_timeout=TIMEOUT, retries={'max_attempts': 1}),
+        )
+    return _s3_client
+
+
+def check_storage():
+    if not settings.DEFAULT_FILE_STORAGE.startswith('matrimony.storage.'):
+        return 'skipped'
+    _s3().head_bucket(Bucket=settings.AWS_STORAGE_BUCKET_NAME)
+
+
+CHECKS = {
+    'database': check_database,
+    'broker': check_broker,
+    'storage': check_storage,
+}
+
+
+def _timed(check):
+    started = time.perf_counter()
+    status = check() or 'ok'
+    return status, (time.perf_counter() - started) * 1000
+
+
+def probe():
+    """Run every check concurrently: {name: {status, latency_ms[, error]}}"""
+    futures = {name: _pool().submit(_timed, check) for name, check in CHECKS.items()}
+    deadline = time.monotonic() + TIMEOUT
+    results = {}
+    for name, future in futures.items():
+        try:
+            status, latency = future.result(timeout=max(deadline - time.monotonic(), 0))
+            results[name] = {'status': status}
+            if status != 'skipped':
+                results[name]['latency_ms'] = round(latency, 1)
+        except FutureTimeoutError:
+            results[name] = {'status': 'timeout', 'latency_ms': TIMEOUT * 1000}
+        except Exception as e:
+            # Only the exception type: the endpoint is public, messages name hosts
+            logger.warning('Health check %s failed', name, exc_info=True)
+            results[name] = {'status': 'error', 'error': type(e).__name__}
+    return results
+
+
+def readiness():
+    """The report of the last probes, probing again if older than CACHE_SECONDS"""
+    global _last
+    with _lock:
+        now = time.monotonic()
+        if _last is None or now - _last[0] >= CACHE_SECONDS:
+            checks = probe()
+            ready = all(result['status'] in ('ok', 'skipped') for result in checks.values())
+            _last = (time.monotonic(), {'status': 'ready' if ready else 'not_ready', 'checks': checks})
+        checked_at, report = _last
+    return {**report, 'age_seconds': round(time.monotonic() - checked_at, 1)}
+
+
+def wait_until_ready(timeout, log=None):
+    """Probe until every dependency answers or ``timeout`` seconds pass; whether it got ready"""
+    deadline = time.monotonic() + timeout
+    while True:
+        report = readiness()
+        if report['status'] == 'ready':
+            return True
+        if time.monotonic() >= deadline:
+            return False
+        if log:
+            log('Waiting for dependencies: %s', report['checks'])
+        time.sleep(CACHE_SECONDS)
+
+
+def readiness_check(request):
+    """Readiness endpoint for nginx, deploy scripts and monitoring"""
+    report = readiness()
+    return JsonResponse(report, status=200 if report['status'] == 'ready' else 503)
@@ -0,0 +1,111 @@
+"""
+Where a request's time goes: database queries, serialization, rendering and
+cache lookups, recorded for every request (PrometheusMetricsMiddleware keeps
+the query count) and reported for the ones ServerTimingMiddleware samples.
+
+The middleware start()s a RequestMetrics for the request; code that does
+the work adds to it through timed() and record_cache(), and every database
+query is timed by an execute wrapper installed on each connection. The
+metrics live in a context variable, so they follow the request into
+sync_to_async threads; outside a request all of this is a no-op.
+"""
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+
+from django.db.backends.signals import connection_created
+from rest_framework.serializers import ListSerializer
+
+_current = ContextVar('request_metrics', default=None)
+
+
+@dataclass
+class RequestMetrics:
+    queries: int = 0
+    cache_hits: int = 0
+    cache_misses: int = 0
+    # Seconds per timed() name, e.g. db, serialize, render
+    durations: dict = field(default_factory=dict)
+
+    def add(self, name, seconds):
+        self.durations[name] = self.durations.get(name, 0.0) + seconds
+
+
+def start():
+    """
+    Record metrics for the current request; returns (metrics, token for
+    stop()). Middleware nested in another that started shares its metrics.
+    """
+    metrics = _current.get()
+    if metrics is not None:
+        return metrics, None
+    metrics = RequestMetrics()
+    return metrics, _current.set(metrics)
+
+
+def stop(token):
+    if token is not None:
+        _current.reset(token)
+
+
+@contextmanager
+def timed(name):
+    """Add the time spent in the block to the current request's ``name``"""
+    metrics = _current.get()
+    if metrics is None:
+        yield
+        return
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        metrics.add(name, time.perf_counter() - started)
+
+
+def record_cache(hit):
+    metrics = _current.get()
+    if metrics is not None:
+        if hit:
+            metrics.cache_hits += 1
+        else:
+            metrics.cache_misses += 1
+
+
+def _time_query(execute, sql, params, many, context):
+    metrics = _current.get()
+    if metrics is None:
+        return execute(sql, params, many, context)
+    started = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        metrics.queries += 1
+        metrics.add('db', time.perf_counter() - started)
+
+
+def _instrument_connection(sender, connection, **kwargs):
+    # Fired again whenever the connection reconnects
+    if _time_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(_time_query)
+
+
+connection_created.connect(_instrument_connection)
+
+
+class TimedSerializerMixin:
+    """Counts rendering ``.data`` as the request's serialize time"""
+
+    @property
+    def data(self):
+        with timed('serialize'):
+            return super().data
+
+
+class TimedListSerializer(ListSerializer):
+    """ListSerializer timing ``.data`` like TimedSerializerMixin; set as Meta.list_serializer_class"""
+
+    @property
+    def data(self):
+        with timed('serialize'):
+            return super().data
@@ -0,0 +1,156 @@
+"""
+Prometheus metrics, served at /metrics.
+
+Under gunicorn every worker is its own process, so each one writes its
+samples to memory-mapped files in PROMETHEUS_MULTIPROC_DIR (set in
+metrics.env, which gunicorn.service and celery.service both load) and
+/metrics adds up the files of all workers, Celery's included. Workers are
+recycled every max_requests requests, so when one exits (gunicorn's
+worker_exit and child_exit hooks, Celery's worker_process_shutdown signal,
+or archive_dead_processes() for ones that were killed) its files are folded
+into one archive file per metric type: the totals keep its counts and the
+directory doesn't grow with every worker that ever ran. Without
+PROMETHEUS_MULTIPROC_DIR (runserver, management commands) the metrics are
+the current process's.
+"""
+import fcntl
+import glob
+import os
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+
+from django.http import HttpResponse
+from prometheus_client import (
+    CONTENT_TYPE_LATEST, REGISTRY, CollectorRegistry, Counter, Histogram, generate_latest, multiprocess,
+)
+from prometheus_client.mmap_dict import MmapedDict
+
+REQUESTS = Counter(
+    'http_requests_total', 'Requests answered, by view, method and status',
+    ['view', 'method', 'status'],
+)
+REQUEST_DURATION = Histogram(
+    'http_request_duration_seconds', 'Time to answer a request, by view and method',
+    ['view', 'method'],
+    buckets=(.005, .01, .025, .05, .075, .1, .25, .5, .75, 1, 2.5, 5, 10, 30),
+)
+REQUEST_QUERIES = Histogram(
+    'http_request_db_queries', 'Database queries run per request, by view',
+    ['view'],
+    buckets=(0, 1, 2, 3, 4, 5, 7, 10, 15, 20, 30, 50, 100),
+)
+TASK_DURATION = Histogram(
+    'celery_task_duration_seconds', 'Time a Celery task ran, by task and final state',
+    ['task', 'state'],
+    buckets=(.01, .05, .1, .25, .5, 1, 2.5, 5, 10, 30, 60, 120, 300),
+)
+PAGINATION_COUNTS = Counter(
+    'pagination_counts_total', 'Paginated counts, by count strategy and how they were answered',
+    ['strategy', 'outcome'],
+)
+
+# perf_counter() at task_prerun, by task id
+_task_started = {}
+
+
+def multiprocess_dir():
+    return os.environ.get('PROMETHEUS_MULTIPROC_DIR')
+
+
+def observe_request(view, method, status, seconds, queries):
+    view = view or 'unmatched'
+    REQUESTS.labels(view, method, status).inc()
+    REQUEST_DURATION.labels(view, method).observe(seconds)
+    REQUEST_QUERIES.labels(view).observe(queries)
+
+
+def task_started(task_id):
+    _task_started[task_id] = time.perf_counter()
+
+
+def task_finished(task_id, task_name, state):
+    started = _task_started.pop(task_id, None)
+    if started is not None:
+        TASK_DURATION.labels(task_name, state or 'UNKNOWN').observe(time.perf_counter() - started)
+
+
+@contextmanager
+def _files_lock(path, operation):
+    # Readers (metrics_view) share it; archiving, which replaces and removes
+    # files, takes it alone
+    with open(os.path.join(path, 'archive.lock'), 'a') as lock:
+        fcntl.flock(lock, operation)
+        try:
+            yield
+        finally:
+            fcntl.flock(lock, fcntl.LOCK_UN)
+
+
+def _archive(path, pid):
+    """Add the counters and histograms of a dead process to the archive files"""
+    for kind in ('counter', 'histogram'):
+        dead = os.path.join(path, f'{kind}_{pid}.db')
+        if not os.path.exists(dead):
+            continue
+        archive = os.path.join(path, f'{kind}_archive.db')
+        # Both kinds are sums across processes, sample by sample
+        totals = defaultdict(float)
+        for f in (archive, dead) if os.path.exists(archive) else (dead,):
+            for key, value, _, _ in MmapedDict.read_all_values_from_file(f):
+                totals[key] += value
+        merged_path = f'{archive}.tmp'
+        if os.path.exists(merged_path):
+            os.remove(merged_path)
+        merged = MmapedDict(merged_path)
+        for key, value in totals.items():
+            merged.write_value(key, value, 0.0)
+        merged.close()
+        os.replace(merged_path, archive)
+        os.remove(dead)
+
+
+def mark_process_dead(pid):
+    """Fold a dead process's files into the archive, keeping its counts in the totals"""
+    path = multiprocess_dir()
+    if not path:
+        return
+    with _files_lock(path, fcntl.LOCK_EX):
+        multiprocess.mark_process_dead(pid, path)
+        _archive(path, pid)
+
+
+def archive_dead_processes():
+    """mark_process_dead() for files left by processes no longer running, e.g. after a crash"""
+    path = multiprocess_dir()
+    if not path:
+        return
+    pids = set()
+    for f in glob.glob(os.path.join(path, '*_*.db')):
+        pid = os.path.basename(f)[:-3].rsplit('_', 1)[1]
+        if pid.isdigit() and not _running(int(pid)):
+            pids.add(int(pid))
+    for pid in pids:
+        mark_process_dead(pid)
+
+
+def _running(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
+def metrics_view(request):
+    """The metrics of every worker process, in Prometheus' text format"""
+    path = multiprocess_dir()
+    if not path:
+        return HttpResponse(generate_latest(REGISTRY), content_type=CONTENT_TYPE_LATEST)
+    registry = CollectorRegistry()
+    multiprocess.MultiProcessCollector(registry, path)
+    with _files_lock(path, fcntl.LOCK_SH):
+        output = generate_latest(registry)
+    return HttpResponse(output, content_type=CONTENT_TYPE_LATEST)
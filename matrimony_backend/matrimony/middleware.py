@@ -0,0 +1,142 @@
+import json
+import logging
+import random
+import time
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+
+from . import instrumentation, metrics
+
+logger = logging.getLogger('matrimony.performance')
+
+
+class PrometheusMetricsMiddleware:
+    """
+    Count every request, its duration and its database queries in the
+    Prometheus metrics (matrimony.metrics), labelled with the view and
+    action like the performance log. First in MIDDLEWARE, so the duration
+    covers the other middleware.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        started = time.perf_counter()
+        request_metrics, token = instrumentation.start()
+        try:
+            response = self.get_response(request)
+        finally:
+            instrumentation.stop(token)
+        self.observe(request, response, request_metrics, time.perf_counter() - started)
+        return response
+
+    async def __acall__(self, request):
+        started = time.perf_counter()
+        request_metrics, token = instrumentation.start()
+        try:
+            response = await self.get_response(request)
+        finally:
+            instrumentation.stop(token)
+        self.observe(request, response, request_metrics, time.perf_counter() - started)
+        return response
+
+    def observe(self, request, response, request_metrics, seconds):
+        metrics.observe_request(
+            view_name(request), request.method, response.status_code, seconds, request_metrics.queries,
+        )
+
+
+class ServerTimingMiddleware:
+    """
+    Report where the time of a sampled request went (see
+    matrimony.instrumentation) in a Server-Timing header, which browser dev
+    tools show, and a JSON line on the matrimony.performance logger, tagged
+    with the view and action. Times overlap: queries run while serializing
+    count as db and serialize time. PERF_SAMPLE_RATE is the share of
+    requests sampled. Put it first in MIDDLEWARE, after
+    PrometheusMetricsMiddleware, so the total covers the others.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.sample_rate = getattr(settings, 'PERF_SAMPLE_RATE', 0)
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        if not self.sampled():
+            return self.get_response(request)
+
+        started = time.perf_counter()
+        metrics, token = instrumentation.start()
+        try:
+            response = self.get_response(request)
+        finally:
+            instrumentation.stop(token)
+        return self.report(request, response, metrics, time.perf_counter() - started)
+
+    async def __acall__(self, request):
+        if not self.sampled():
+            return await self.get_response(request)
+
+        started = time.perf_counter()
+        metrics, token = instrumentation.start()
+        try:
+            response = await self.get_response(request)
+        finally:
+            instrumentation.stop(token)
+        return self.report(request, response, metrics, time.perf_counter() - started)
+
+    def sampled(self):
+        return self.sample_rate >= 1 or random.random() < self.sample_rate
+
+    def report(self, request, response, metrics, total):
+        durations = {name: seconds * 1000 for name, seconds in metrics.durations.items()}
+        queries = f'{metrics.queries} {"query" if metrics.queries == 1 else "queries"}'
+        timings = [
+            f'db;dur={durations.get("db", 0):.1f};desc="{queries}"',
+            *(f'{name};dur={ms:.1f}' for name, ms in durations.items() if name != 'db'),
+            f'cache;desc="{metrics.cache_hits} hits, {metrics.cache_misses} misses"',
+            f'total;dur={total * 1000:.1f}',
+        ]
+        response['Server-Timing'] = ', '.join(timings)
+
+        logger.info(json.dumps({
+            'view': view_name(request),
+            'method': request.method,
+            'path': request.path,
+            'status': response.status_code,
+            'total_ms': round(total * 1000, 2),
+            'queries': metrics.queries,
+            **{f'{name}_ms': round(ms, 2) for name, ms in durations.items()},
+            'cache_hits': metrics.cache_hits,
+            'cache_misses': metrics.cache_misses,
+        }))
+        return response
+
+
+def view_name(request):
+    """"<view class>.<action>" for DRF viewsets, the view class or function otherwise"""
+    match = getattr(request, 'resolver_match', None)
+    if match is None:
+        return None
+    func = match.func
+    view_class = getattr(func, 'cls', None) or getattr(func, 'view_class', None)
+    if view_class is None:
+        return match.view_name
+    # ViewSet.as_view(actions) and AsyncProfileView.as_view(actions=...)
+    actions = getattr(func, 'actions', None) or getattr(func, 'view_initkwargs', {}).get('actions') or {}
+    action = actions.get(request.method.lower())
+    return f'{view_class.__name__}.{action}' if action else view_class.__name__
@@ -1,5 +1,108 @@
+import base64
+import hashlib
+import json
+import logging
+from collections import Counter
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.exceptions import ValidationError
+from django.core.paginator import InvalidPage, Paginator
+from django.db import connections
+from django.db.models import Q
+from django.utils.functional import cached_property
+from rest_framework.exceptions import NotFound
 from rest_framework.pagination import PageNumberPagination
 from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param
+
+from .metrics import PAGINATION_COUNTS
+
+logger = logging.getLogger(__name__)
+
+# How each paginated count was answered, keyed by (strategy, outcome) where
+# outcome is one of: exact, cache_hit, estimate, skipped
+count_metrics = Counter()
+
+# Below this many estimated rows an exact COUNT(*) is cheap enough
+ESTIMATE_THRESHOLD = 10000
+
+
+def record_count(strategy, outcome):
+    count_metrics[(strategy, outcome)] += 1
+    PAGINATION_COUNTS.labels(strategy, outcome).inc()
+    logger.debug('Pagination count: strategy=%s outcome=%s', strategy, outcome)
+
+
+def get_count_metrics():
+    """Per-strategy tallies, with how often the exact COUNT(*) was avoided"""
+    total = sum(count_metrics.values())
+    exact = sum(n for (_, outcome), n in count_metrics.items() if outcome == 'exact')
+    return {
+        'total': total,
+        'exact': exact,
+        'skipped_ratio': (total - exact) / total if total else 0.0,
+        'by_strategy': {f'{strategy}.{outcome}': n for (strategy, outcome), n in count_metrics.items()},
+    }
+
+
+class CountStrategyPaginator(Paginator):
+    """
+    Django paginator whose ``count`` comes from a count strategy:
+
+    - ``exact``: SELECT COUNT(*) on every request
+    - ``cached``: exact count cached per distinct query for
+      PAGINATION_COUNT_CACHE_TIMEOUT seconds
+    - ``estimate``: the planner's row estimate for the query (EXPLAIN,
+      filters included) when it is large, an exact count otherwise; either
+      cached like ``cached``. ``count_is_estimate`` tells which.
+    """
+
+    def __init__(self, object_list, per_page, count_strategy='exact', **kwargs):
+        super().__init__(object_list, per_page, **kwargs)
+        self.count_strategy = count_strategy
+        self.count_is_estimate = False
+
+    @cached_property
+    def count(self):
+        if self.count_strategy in ('cached', 'estimate'):
+            return self.get_cached_count()
+        record_count(self.count_strategy, 'exact')
+        return super().count
+
+    def get_estimated_count(self):
+        """The planner's estimate of the query's rows, if large enough to be worth it"""
+        queryset = self.object_list
+        if connections[queryset.db].vendor != 'postgresql':
+            return None
+        plan = json.loads(queryset.order_by().explain(format='json'))
+        rows = plan[0]['Plan']['Plan Rows']
+        # Small results are cheap to count exactly, and estimates of them
+        # (e.g. before the table has been analyzed) the least reliable
+        if rows < ESTIMATE_THRESHOLD:
+            return None
+        return rows
+
+    def get_cached_count(self):
+        sql, params = self.object_list.query.sql_with_params()
+        digest = hashlib.md5(f'{sql}|{params!r}'.encode()).hexdigest()
+        key = f'pagination:counts:{digest}'
+
+        cached = cache.get(key)
+        if cached is not None:
+            record_count(self.count_strategy, 'cache_hit')
+            count, self.count_is_estimate = cached
+            return count
+
+        count = self.get_estimated_count() if self.count_strategy == 'estimate' else None
+        self.count_is_estimate = count is not None
+        if self.count_is_estimate:
+            record_count(self.count_strategy, 'estimate')
+        else:
+            record_count(self.count_strategy, 'exact')
+            count = super().count
+        cache.set(key, (count, self.count_is_estimate), getattr(settings, 'PAGINATION_COUNT_CACHE_TIMEOUT', 60))
+        return count
 
 
 class CustomPagination(PageNumberPagination):
@@ -11,15 +114,208 @@ class CustomPagination(PageNumberPagination):
     page_size_query_param = 'page_size'
     max_page_size = 100
     page_query_param = 'page'
-    
+    django_paginator_class = CountStrategyPaginator
+
+    # How the total count is obtained, see CountStrategyPaginator. Views can
+    # override it with a ``pagination_count_strategy`` attribute; the extra
+    # ``has_more`` strategy never counts and reports only whether a next
+    # page exists (count and total_pages are null). With ``estimate`` and
+    # ``has_more`` whether a next page exists comes from the rows, not the
+    # count, and page numbers aren't bounded by it.
+    count_strategy = 'exact'
+
+    def get_count_strategy(self, view):
+        return getattr(view, 'pagination_count_strategy', self.count_strategy)
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        self.count_strategy = self.get_count_strategy(view)
+        page_size = self.get_page_size(request)
+        if not page_size:
+            return None
+
+        if self.count_strategy in ('has_more', 'estimate'):
+            return self.paginate_without_count(queryset, page_size, request)
+
+        paginator = self.django_paginator_class(queryset, page_size, count_strategy=self.count_strategy)
+        page_number = self.get_page_number(request, paginator)
+        try:
+            self.page = paginator.page(page_number)
+        except InvalidPage as exc:
+            msg = self.invalid_page_message.format(page_number=page_number, message=str(exc))
+            raise NotFound(msg)
+        self.count, self.count_is_estimate = paginator.count, False
+
+        if paginator.num_pages > 1 and self.template is not None:
+            self.display_page_controls = True
+
+        return list(self.page)
+
+    def paginate_without_count(self, queryset, page_size, request):
+        page_number = request.query_params.get(self.page_query_param) or 1
+        try:
+            page_number = int(page_number)
+            if page_number < 1:
+                raise ValueError
+        except ValueError:
+            raise NotFound(self.invalid_page_message.format(page_number=page_number, message='Invalid page.'))
+
+        # One extra row tells whether a next page exists
+        offset = (page_number - 1) * page_size
+        rows = list(queryset[offset:offset + page_size + 1])
+        if not rows and page_number > 1:
+            raise NotFound(self.invalid_page_message.format(page_number=page_number, message='That page contains no results'))
+        self.count, self.count_is_estimate = self.get_unbounded_count(
+            queryset, page_size, offset + len(rows), has_next=len(rows) > page_size,
+        )
+
+        # The paginator's count is only a lower bound here, which is all
+        # has_next()/has_previous() need
+        paginator = self.django_paginator_class(queryset, page_size)
+        paginator.count = offset + len(rows)
+        self.page = paginator._get_page(rows[:page_size], page_number, paginator)
+        return list(self.page)
+
+    def get_unbounded_count(self, queryset, page_size, seen, has_next):
+        """
+        (count, whether estimated) for a page fetched without counting, where
+        ``seen`` is how many rows there are up to the page's extra one
+        """
+        if self.count_strategy == 'has_more':
+            record_count(self.count_strategy, 'skipped')
+            return None, False
+        if not has_next:
+            # The last page: the rows tell the count
+            record_count(self.count_strategy, 'skipped')
+            return seen, False
+        paginator = self.django_paginator_class(queryset, page_size, count_strategy=self.count_strategy)
+        # An estimate below what the rows show is known to be short
+        return max(paginator.count, seen), paginator.count_is_estimate
+
     # Custom response format
     def get_paginated_response(self, data):
+        page_size = self.get_page_size(self.request)
+        total_pages = None
+        if self.count is not None:
+            total_pages = max(-(-self.count // page_size), self.page.number)
         return Response({
-            'count': self.page.paginator.count,
+            'count': self.count,
+            'count_is_estimate': self.count_is_estimate,
             'next': self.get_next_link(),
             'previous': self.get_previous_link(),
             'results': data,
             'current_page': self.page.number,
-            'total_pages': self.page.paginator.num_pages,
-            'page_size': self.get_page_size(self.request)
+            'total_pages': total_pages,
+            'has_more': self.page.has_next(),
+            'page_size': page_size
+        })
+
+
+class KeysetPagination(CustomPagination):
+    """
+    Cursor (keyset) pagination for infinite-scrolling lists.
+    Pages are fetched with a WHERE on the ordering keys of the last row instead
+    of an OFFSET, so every page costs the same however deep the client scrolls,
+    and rows inserted meanwhile never shift the following pages.
+    Selected with ?pagination=cursor, or implicitly when a cursor is passed.
+    """
+    cursor_query_param = 'cursor'
+    mode_query_param = 'pagination'
+    invalid_cursor_message = 'Invalid cursor'
+
+    # Must be unique across rows; the last key breaks created_at ties. Views
+    # can order by another datetime first with ``pagination_keyset_ordering``.
+    ordering = ('-created_at', '-user_id')
+
+    @classmethod
+    def is_requested(cls, request):
+        params = request.query_params
+        return params.get(cls.mode_query_param) == 'cursor' or cls.cursor_query_param in params
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        self.page_size = self.get_page_size(request)
+        if not self.page_size:
+            return None
+
+        self.ordering = getattr(view, 'pagination_keyset_ordering', self.ordering)
+        self.query = queryset.query
+        queryset = queryset.order_by(*self.ordering)
+        position = self.decode_cursor(request)
+        if position is not None:
+            queryset = queryset.filter(self.get_position_filter(position))
+
+        # Fetch one extra row to know whether there is a next page without counting
+        results = list(queryset[:self.page_size + 1])
+        record_count('keyset', 'skipped')
+        self.has_next = len(results) > self.page_size
+        self.page = results[:self.page_size]
+        return self.page
+
+    def get_position_filter(self, position):
+        """Rows strictly after ``position`` in (lexicographic) ordering"""
+        condition = Q()
+        for index in reversed(range(len(self.ordering))):
+            name = self.ordering[index].lstrip('-')
+            lookup = 'lt' if self.ordering[index].startswith('-') else 'gt'
+            after = Q(**{f'{name}__{lookup}': position[index]})
+            if index < len(self.ordering) - 1:
+                after |= Q(**{name: position[index]}) & condition
+            condition = after
+        return condition
+
+    def get_position(self, instance):
+        return [getattr(instance, field.lstrip('-')) for field in self.ordering]
+
+    def encode_cursor(self, position):
+        created_at, *rest = position
+        payload = json.dumps([created_at.isoformat(), *rest], separators=(',', ':'))
+        return base64.urlsafe_b64encode(payload.encode()).decode().rstrip('=')
+
+    def decode_cursor(self, request):
+        encoded = request.query_params.get(self.cursor_query_param)
+        if not encoded:
+            return None
+        try:
+            payload = base64.urlsafe_b64decode(encoded + '=' * (-len(encoded) % 4))
+            position = json.loads(payload)
+            if not isinstance(position, list) or len(position) != len(self.ordering):
+                raise ValueError
+            # Each key as its field stores it, so a crafted cursor can't reach the query
+            position = [
+                self.get_key_field(name.lstrip('-')).to_python(value)
+                for name, value in zip(self.ordering, position)
+            ]
+        except (TypeError, ValueError, ValidationError):
+            raise NotFound(self.invalid_cursor_message)
+        if any(value is None for value in position):
+            raise NotFound(self.invalid_cursor_message)
+        return position
+
+    def get_key_field(self, name):
+        """The field an ordering key is compared as: an annotation's output field, or the model's"""
+        annotation = self.query.annotations.get(name)
+        if annotation is not None:
+            return annotation.output_field
+        return self.query.model._meta.get_field(name)
+
+    def get_next_cursor(self):
+        if not self.has_next or not self.page:
+            return None
+        return self.encode_cursor(self.get_position(self.page[-1]))
+
+    def get_next_link(self):
+        cursor = self.get_next_cursor()
+        if cursor is None:
+            return None
+        url = self.request.build_absolute_uri()
+        return replace_query_param(url, self.cursor_query_param, cursor)
+
+    def get_paginated_response(self, data):
+        return Response({
+            'next': self.get_next_link(),
+            'previous': None,
+            'next_cursor': self.get_next_cursor(),
+            'results': data,
+            'page_size': self.page_size,
         })
@@ -0,0 +1,45 @@
+"""
+JSON rendering with orjson, which encodes a page of profiles several times
+faster than the standard library encoder behind DRF's JSONRenderer.
+"""
+import orjson
+from rest_framework.renderers import JSONRenderer
+from rest_framework.utils.encoders import JSONEncoder
+
+from . import instrumentation
+
+# DRF's encoder handles the types orjson doesn't (Decimal, lazy strings,
+# querysets, ...) and formats datetimes the same way as JSONRenderer
+_encoder = JSONEncoder()
+
+OPTIONS = orjson.OPT_NON_STR_KEYS | orjson.OPT_PASSTHROUGH_DATETIME
+
+
+class ORJSONRenderer(JSONRenderer):
+    """
+    Drop-in JSONRenderer using orjson for compact output. Indented output
+    (the browsable API, ``; indent=`` in Accept) and anything orjson can't
+    encode go through JSONRenderer.
+    """
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        with instrumentation.timed('render'):
+            return self._render(data, accepted_media_type, renderer_context)
+
+    def _render(self, data, accepted_media_type, renderer_context):
+        if data is None:
+            return b''
+
+        if self.get_indent(accepted_media_type, renderer_context or {}):
+            return super().render(data, accepted_media_type, renderer_context)
+
+        try:
+            ret = orjson.dumps(data, default=_encoder.default, option=OPTIONS)
+        except orjson.JSONEncodeError:
+            return super().render(data, accepted_media_type, renderer_context)
+
+        # Escape the line separators JavaScript doesn't allow in strings,
+        # as JSONRenderer does
+        if b'\xe2\x80\xa8' in ret or b'\xe2\x80\xa9' in ret:
+            ret = ret.replace(b'\xe2\x80\xa8', b'\\u2028').replace(b'\xe2\x80\xa9', b'\\u2029')
+        return ret
@@ -12,6 +12,7 @@ https://docs.djangoproject.com/en/4.2/ref/settings/
 
 from pathlib import Path
 import os
+from celery.schedules import crontab
 from dotenv import load_dotenv
 
 # Load environment variables
@@ -42,6 +43,7 @@ INSTALLED_APPS = [
     'django.contrib.sessions',
     'django.contrib.messages',
     'django.contrib.staticfiles',
+    'django.contrib.postgres',
     
     # Third party apps
     'rest_framework',
@@ -52,10 +54,13 @@ INSTALLED_APPS = [
     # Local apps
     'authentication',
     'user_profile',
+    'notification',
     'django_filters',
 ]
 
 MIDDLEWARE = [
+    'matrimony.middleware.PrometheusMetricsMiddleware',
+    'matrimony.middleware.ServerTimingMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'whitenoise.middleware.WhiteNoiseMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
@@ -84,10 +89,31 @@ TEMPLATES = [
 
 WSGI_APPLICATION = 'matrimony.wsgi.application'
 
+# Serve the read-only profile endpoints with native async views
+# (user_profile.async_views). Only useful under ASGI; gunicorn.conf.py turns
+# it on in its asgi server mode.
+ASYNC_PROFILE_READS = os.getenv('ASYNC_PROFILE_READS', 'false').lower() == 'true'
+
+# Serve login with a native async view (authentication.async_views) that
+# awaits password hashing without holding a thread. ASGI only, like above.
+ASYNC_LOGIN = os.getenv('ASYNC_LOGIN', 'false').lower() == 'true'
+
+# Share of requests whose query count, DB, serialize and render times and
+# cache hits are reported in a Server-Timing header and logged to
+# logs/performance.log (matrimony.middleware). 1 samples every request.
+PERF_SAMPLE_RATE = float(os.getenv('PERF_SAMPLE_RATE', '0.05'))
+
 
 # Database
 # https://docs.djangoproject.com/en/4.2/ref/settings/#databases
 
+# Connections are persistent: each gunicorn worker thread keeps one open
+# connection for DB_CONN_MAX_AGE seconds and checks it is alive before reuse,
+# so the worker's threads (GUNICORN_THREADS) form its connection pool.
+# Set DB_PGBOUNCER=true when HOST/PORT point at pgbouncer in transaction
+# pooling mode; it disables server-side cursors, which need a session.
+DB_PGBOUNCER = os.getenv('DB_PGBOUNCER', 'false').lower() == 'true'
+
 DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.postgresql',
@@ -95,10 +121,38 @@ DATABASES = {
         'USER': os.getenv('DB_USER', 'matrimony_user'),
         'PASSWORD': os.getenv('DB_PASSWORD', 'matrimony_password'),
         'HOST': os.getenv('DB_HOST', 'localhost'),
-        'PORT': os.getenv('DB_PORT', '5432'),
+        'PORT': os.getenv('DB_PORT', '6432' if DB_PGBOUNCER else '5432'),
+        'CONN_MAX_AGE': int(os.getenv('DB_CONN_MAX_AGE', '600')),
+        'CONN_HEALTH_CHECKS': True,
+        'DISABLE_SERVER_SIDE_CURSORS': DB_PGBOUNCER,
+        'OPTIONS': {
+            'connect_timeout': int(os.getenv('DB_CONNECT_TIMEOUT', '5')),
+            'application_name': 'matrimony_backend',
+        },
+    }
+}
+
+
+# Cache
+# Shared Redis cache; set CACHE_BACKEND=django.core.cache.backends.locmem.LocMemCache
+# to run without Redis (local development and tests)
+CACHES = {
+    'default': {
+        'BACKEND': os.getenv('CACHE_BACKEND', 'django.core.cache.backends.redis.RedisCache'),
+        'LOCATION': os.getenv('CACHE_URL', 'redis://localhost:6379/1'),
     }
 }
 
+# Readiness probe (/health/ready/, see matrimony.health): seconds each
+# dependency check may take, and how long a worker reuses its results
+HEALTH_CHECK_TIMEOUT = float(os.getenv('HEALTH_CHECK_TIMEOUT', '2'))
+HEALTH_CHECK_CACHE_SECONDS = float(os.getenv('HEALTH_CHECK_CACHE_SECONDS', '5'))
+
+# Token authentication cache (see authentication.cache)
+AUTH_TOKEN_CACHE_TIMEOUT = int(os.getenv('AUTH_TOKEN_CACHE_TIMEOUT', '300'))
+AUTH_TOKEN_LOCAL_CACHE_TIMEOUT = int(os.getenv('AUTH_TOKEN_LOCAL_CACHE_TIMEOUT', '10'))
+AUTH_TOKEN_LOCAL_CACHE_SIZE = int(os.getenv('AUTH_TOKEN_LOCAL_CACHE_SIZE', '1024'))
+
 
 # Password validation
 # https://docs.djangoproject.com/en/4.2/ref/settings/#auth-password-validators
@@ -118,6 +172,11 @@ AUTH_PASSWORD_VALIDATORS = [
     },
 ]
 
+# Password hashing runs on a thread pool of this many threads per process
+# (authentication.hashing), so logins can't take every thread at once
+AUTHENTICATION_BACKENDS = ['authentication.backends.PooledHashingBackend']
+PASSWORD_HASHING_WORKERS = int(os.getenv('PASSWORD_HASHING_WORKERS', '1'))
+
 
 # Internationalization
 # https://docs.djangoproject.com/en/4.2/topics/i18n/
@@ -149,6 +208,8 @@ AWS_SECRET_ACCESS_KEY = os.getenv('AWS_SECRET_ACCESS_KEY')
 AWS_STORAGE_BUCKET_NAME = os.getenv('AWS_STORAGE_BUCKET_NAME')
 AWS_S3_REGION_NAME = os.getenv('AWS_S3_REGION_NAME', 'us-east-1')
 AWS_S3_CUSTOM_DOMAIN = os.getenv('AWS_S3_CUSTOM_DOMAIN')
+# S3-compatible service to use instead of AWS, e.g. a local MinIO
+AWS_S3_ENDPOINT_URL = os.getenv('AWS_S3_ENDPOINT_URL')
 
 # S3 Object Parameters
 AWS_S3_OBJECT_PARAMETERS = {
@@ -213,6 +274,13 @@ CELERY_TASK_SERIALIZER = 'json'
 CELERY_RESULT_SERIALIZER = 'json'
 CELERY_ENABLE_UTC = True
 CELERY_TIMEZONE = TIME_ZONE
+CELERY_BEAT_SCHEDULE = {
+    # Incremental refreshes follow profile edits; this rebuilds everything
+    'refresh-all-recommendations': {
+        'task': 'user_profile.tasks.refresh_all_recommendations',
+        'schedule': crontab(hour=3, minute=0),
+    },
+}
 
 # REST Framework Configuration
 REST_FRAMEWORK = {
@@ -223,7 +291,7 @@ REST_FRAMEWORK = {
         'rest_framework.permissions.IsAuthenticated',
     ),
     'DEFAULT_RENDERER_CLASSES': (
-        'rest_framework.renderers.JSONRenderer',
+        'matrimony.renderers.ORJSONRenderer',
     ),
     'DEFAULT_FILTER_BACKENDS': (
         'django_filters.rest_framework.DjangoFilterBackend',
@@ -232,6 +300,22 @@ REST_FRAMEWORK = {
     ),
 }
 
+# Seconds a paginated list's total count is reused (see matrimony.pagination)
+PAGINATION_COUNT_CACHE_TIMEOUT = int(os.getenv('PAGINATION_COUNT_CACHE_TIMEOUT', '60'))
+
+# Seconds serialized profiles and feed pages are cached (see user_profile.cache).
+# Writes invalidate them straight away; this only bounds memory use.
+PROFILE_CACHE_TIMEOUT = int(os.getenv('PROFILE_CACHE_TIMEOUT', '300'))
+
+# Limits of direct-to-S3 profile photo uploads (see user_profile.uploads)
+PROFILE_PHOTO_MAX_UPLOAD_SIZE = int(os.getenv('PROFILE_PHOTO_MAX_UPLOAD_SIZE', str(10 * 1024 * 1024)))
+PROFILE_PHOTO_UPLOAD_EXPIRY = int(os.getenv('PROFILE_PHOTO_UPLOAD_EXPIRY', '300'))
+
+# Matches stored per profile for the recommended feed (see user_profile.recommendations)
+RECOMMENDATIONS_PER_PROFILE = int(os.getenv('RECOMMENDATIONS_PER_PROFILE', '100'))
+# Seconds re-ranking a profile waits after an edit, so a burst of edits is re-ranked once
+RECOMMENDATIONS_REFRESH_DELAY = int(os.getenv('RECOMMENDATIONS_REFRESH_DELAY', '30'))
+
 # CORS Configuration
 CORS_ALLOWED_ORIGINS = [
     "http://0.0.0.0:8000",
@@ -280,6 +364,10 @@ LOGGING = {
             'format': '{levelname} {asctime} {module} {process:d} {thread:d} {message}',
             'style': '{',
         },
+        'json': {
+            'format': '{message}',
+            'style': '{',
+        },
     },
     'handlers': {
         'file': {
@@ -288,6 +376,12 @@ LOGGING = {
             'filename': LOGS_DIR / 's3_operations.log',
             'formatter': 'verbose',
         },
+        'performance': {
+            'level': 'INFO',
+            'class': 'logging.FileHandler',
+            'filename': LOGS_DIR / 'performance.log',
+            'formatter': 'json',
+        },
     },
     'loggers': {
         'boto3': {
@@ -300,6 +394,11 @@ LOGGING = {
             'level': 'INFO',
             'propagate': False,
         },
+        'matrimony.performance': {
+            'handlers': ['performance'],
+            'level': 'INFO',
+            'propagate': False,
+        },
     },
 }
 
@@ -1,5 +1,12 @@
+import mimetypes
+
+from django.conf import settings
 from storages.backends.s3boto3 import S3Boto3Storage
 
+# Not known to every Python/OS; S3 would serve them as binary/octet-stream
+mimetypes.add_type('image/avif', '.avif')
+mimetypes.add_type('image/webp', '.webp')
+
 
 class StaticStorage(S3Boto3Storage):
     location = 'static'
@@ -10,3 +17,11 @@ class MediaStorage(S3Boto3Storage):
     location = 'media'
     default_acl = None
     file_overwrite = True
+    # Files under here never change once written (see user_profile.photos)
+    immutable_prefix = 'profile_photos/variants/'
+
+    def get_object_parameters(self, name):
+        params = super().get_object_parameters(name)
+        if name.removeprefix(f'{self.location}/').startswith(self.immutable_prefix):
+            params['CacheControl'] = f'max-age={settings.AWS_S3_MAX_AGE_SECONDS}, immutable'
+        return params
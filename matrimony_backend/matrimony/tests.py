@@ -0,0 +1,25 @@
+import time
+from unittest import mock
+
+from django.db import OperationalError
+from django.test import TestCase
+
+from . import health
+
+
+class DatabaseCheckTests(TestCase):
+    def run_check(self):
+        # On a probe thread, as readiness() runs it
+        return health._pool().submit(health.check_database).result()
+
+    def test_answers(self):
+        self.assertIsNone(self.run_check())
+
+    def test_slow_query_is_cancelled_by_the_server(self):
+        with mock.patch.object(health, 'TIMEOUT', 0.2), \
+                mock.patch.object(health, 'DATABASE_PROBE', 'SELECT pg_sleep(5)'):
+            started = time.monotonic()
+            with self.assertRaises(OperationalError):
+                self.run_check()
+        # The probe thread is free again, not left waiting on the query
+        self.assertLess(time.monotonic() - started, 2)
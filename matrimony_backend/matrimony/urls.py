@@ -8,6 +8,9 @@ from django.urls import path, include
 from django.http import JsonResponse
 from django.contrib import admin
 
+from .health import readiness_check
+from .metrics import metrics_view
+
 
 def health_check(request):
     """Health check endpoint for monitoring."""
@@ -17,6 +20,9 @@ def health_check(request):
 urlpatterns = [
     # path('admin/', admin.site.urls),
     path('health/', health_check, name='health_check'),
+    path('health/ready/', readiness_check, name='readiness_check'),
+    path('metrics/', metrics_view, name='metrics'),
     path('api/auth/', include('authentication.urls')),
     path('api/', include('user_profile.urls')),
+    path('api/notification/', include('notification.urls')),
 ]
@@ -0,0 +1,20 @@
+from django.contrib.auth import get_user_model
+from django.db import models
+
+User = get_user_model()
+
+
+class Device(models.Model):
+    """A device that receives the user's push notifications through FCM"""
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='devices')
+    # A token belongs to one app install; it moves to whoever signs in there
+    token = models.CharField(max_length=255, unique=True, help_text="FCM registration token")
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        verbose_name = 'Device'
+        verbose_name_plural = 'Devices'
+
+    def __str__(self):
+        return f"Device of {self.user_id}"
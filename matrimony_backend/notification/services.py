@@ -0,0 +1,85 @@
+import functools
+import logging
+
+import firebase_admin
+from firebase_admin import credentials, exceptions, messaging
+from django.conf import settings
+
+from .models import Device
+
+logger = logging.getLogger(__name__)
+
+# Worth trying again later; anything else won't get better
+TRANSIENT_ERRORS = (
+    exceptions.UnavailableError,
+    exceptions.InternalError,
+    exceptions.DeadlineExceededError,
+    messaging.QuotaExceededError,
+)
+
+# The token no longer reaches the app (uninstalled, another project, ...)
+STALE_TOKEN_ERRORS = (messaging.UnregisteredError, messaging.SenderIdMismatchError)
+
+
+@functools.lru_cache(maxsize=None)
+def firebase_app():
+    """The Firebase app, or None when FIREBASE_SERVICE_ACCOUNT_PATH isn't set"""
+    if not settings.FIREBASE_SERVICE_ACCOUNT_PATH:
+        return None
+    return firebase_admin.initialize_app(
+        credentials.Certificate(settings.FIREBASE_SERVICE_ACCOUNT_PATH), name='matrimony'
+    )
+
+
+class FirebaseNotificationService:
+    """
+    Push notifications through Firebase Cloud Messaging to the devices
+    registered in Device. Nothing is sent when Firebase isn't configured.
+    """
+
+    def __init__(self):
+        self.app = firebase_app()
+
+    def register_device(self, user, token):
+        Device.objects.update_or_create(token=token, defaults={'user': user})
+
+    def unregister_user_devices(self, user):
+        Device.objects.filter(user=user).delete()
+
+    def send_to_user(self, user, title, body, data=None, tokens=None):
+        """
+        Notify every device of ``user`` (or just ``tokens`` of them). Returns
+        the tokens that failed for now and may be retried; tokens FCM no
+        longer knows are unregistered.
+        """
+        devices = Device.objects.filter(user=user)
+        if tokens is not None:
+            devices = devices.filter(token__in=tokens)
+        tokens = list(devices.values_list('token', flat=True))
+        if not tokens:
+            return []
+        if self.app is None:
+            logger.info('Firebase is not configured; not notifying user %s', user.pk)
+            return []
+
+        response = messaging.send_each_for_multicast(
+            messaging.MulticastMessage(
+                tokens=tokens,
+                notification=messaging.Notification(title=title, body=body),
+                data=data or {},
+            ),
+            app=self.app,
+        )
+        failed, stale = [], []
+        for token, result in zip(tokens, response.responses):
+            if result.success:
+                continue
+            if isinstance(result.exception, STALE_TOKEN_ERRORS):
+                stale.append(token)
+            elif isinstance(result.exception, TRANSIENT_ERRORS):
+                failed.append(token)
+            else:
+                logger.warning('Could not notify device of user %s', user.pk, exc_info=result.exception)
+        if stale:
+            Device.objects.filter(token__in=stale).delete()
+        return failed
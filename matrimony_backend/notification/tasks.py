@@ -0,0 +1,49 @@
+from celery import shared_task
+from django.contrib.auth import get_user_model
+from django.db import DatabaseError
+
+from matrimony.celery import IDEMPOTENT_TASK
+
+from .models import Device
+from .services import FirebaseNotificationService
+
+User = get_user_model()
+
+
+@shared_task(ignore_result=True, autoretry_for=(DatabaseError,), **IDEMPOTENT_TASK)
+def register_device(user_id, token):
+    """Point ``token`` at the user; running it again changes nothing"""
+    if User.objects.filter(pk=user_id).exists():
+        Device.objects.update_or_create(token=token, defaults={'user_id': user_id})
+
+
+@shared_task(ignore_result=True, autoretry_for=(DatabaseError,), **IDEMPOTENT_TASK)
+def unregister_user_devices(user_id):
+    Device.objects.filter(user_id=user_id).delete()
+
+
+@shared_task(bind=True, ignore_result=True, autoretry_for=(DatabaseError,), **IDEMPOTENT_TASK)
+def send_welcome_notification(self, user_id, tokens=None, device_token=None):
+    """
+    Greet a new user on their devices. Retries only go to the devices that
+    failed, so nobody is greeted twice. ``device_token``, given at
+    registration, is registered first, so the greeting doesn't depend on
+    register_device having run.
+    """
+    user = User.objects.filter(pk=user_id).first()
+    if user is None:
+        return
+    if device_token:
+        register_device(user_id, device_token)
+
+    failed = FirebaseNotificationService().send_to_user(
+        user,
+        title='Welcome!',
+        body=f'Hi {user.first_name or user.username}, your profile is ready. Start exploring your matches.',
+        data={'type': 'welcome'},
+        tokens=tokens,
+    )
+    if failed:
+        raise self.retry(
+            args=[user_id], kwargs={'tokens': failed}, countdown=min(600, 10 * 2 ** self.request.retries)
+        )
@@ -0,0 +1,8 @@
+from django.urls import path
+
+from .views import DeviceView
+
+
+urlpatterns = [
+    path('devices/', DeviceView.as_view(), name='notification-devices'),
+]
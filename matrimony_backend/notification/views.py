@@ -0,0 +1,26 @@
+from rest_framework import status
+from rest_framework.permissions import IsAuthenticated
+from rest_framework.response import Response
+from rest_framework.views import APIView
+
+from .models import Device
+from .services import FirebaseNotificationService
+
+
+class DeviceView(APIView):
+    """Register (POST) or unregister (DELETE) this device's FCM token"""
+    permission_classes = [IsAuthenticated]
+
+    def post(self, request):
+        token = request.data.get('device_token')
+        if not token:
+            return Response({'detail': 'device_token is required'}, status=status.HTTP_400_BAD_REQUEST)
+        FirebaseNotificationService().register_device(request.user, token)
+        return Response(status=status.HTTP_204_NO_CONTENT)
+
+    def delete(self, request):
+        token = request.data.get('device_token')
+        if not token:
+            return Response({'detail': 'device_token is required'}, status=status.HTTP_400_BAD_REQUEST)
+        Device.objects.filter(user=request.user, token=token).delete()
+        return Response(status=status.HTTP_204_NO_CONTENT)
@@ -10,6 +10,10 @@ echo "🚀 Deploying Celery Configuration..."
 # Configuration
 PROJECT_DIR="/home/matrimony/matrimony_backend"
 
+# Environment shared by the gunicorn and celery services
+echo "📁 Installing shared environment..."
+sudo install -D -m 644 metrics.env /etc/matrimony_backend/metrics.env
+
 # Copy systemd service file
 echo "📁 Setting up systemd service..."
 sudo cp celery.service /etc/systemd/system/
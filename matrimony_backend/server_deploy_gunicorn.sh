@@ -19,6 +19,10 @@ sudo mkdir -p "$SOCKET_DIR"
 sudo chown matrimonyuser:matrimonyuser "$SOCKET_DIR"
 sudo chmod 755 "$SOCKET_DIR"
 
+# Environment shared by the gunicorn and celery services
+echo "📁 Installing shared environment..."
+sudo install -D -m 644 metrics.env /etc/matrimony_backend/metrics.env
+
 # Copy configuration
 echo "📁 Copying gunicorn configuration..."
 sudo chown matrimonyuser:matrimonyuser "$PROJECT_DIR/$GUNICORN_CONFIG_FILE"
@@ -64,3 +68,4 @@ sudo systemctl reload nginx
 echo "✅ Gunicorn deployment complete!"
 echo "Socket: $SOCKET_FILE"
 echo "Test: curl -I http://matrimony.coreaxissolutions.in/health/"
+echo "Dependencies: curl http://matrimony.coreaxissolutions.in/health/ready/"
@@ -1,7 +1,12 @@
+from contextlib import contextmanager
+
 from django.contrib.auth import get_user_model
 from django.contrib.auth.models import Group, Permission
+from django.db import IntegrityError, transaction
 from rest_framework import serializers
 
+from user_profile import constraints
+
 User = get_user_model()
 
 class PermissionSerializer(serializers.ModelSerializer):
@@ -47,10 +52,12 @@ class UserSerializer(serializers.ModelSerializer):
         password = validated_data.pop('password', None)
         groups = validated_data.pop('groups', [])
         
-        user = User.objects.create(**validated_data)
+        user = User(**validated_data)
         
         if password:
             user.set_password(password)
+            
+        with self.unique_details():
             user.save()
             
         if groups:
@@ -68,13 +75,26 @@ class UserSerializer(serializers.ModelSerializer):
         if password:
             instance.set_password(password)
             
-        instance.save()
+        with self.unique_details():
+            instance.save()
         
         if groups is not None:
             instance.groups.set(groups)
             
         return instance
 
+    @contextmanager
+    def unique_details(self):
+        """Email uniqueness is enforced by the database (see user_profile.constraints)"""
+        try:
+            with transaction.atomic():
+                yield
+        except IntegrityError as e:
+            field = constraints.duplicate_field(e)
+            if field not in constraints.MESSAGES:
+                raise
+            raise serializers.ValidationError({field: constraints.MESSAGES[field]})
+
     def get_permissions(self, obj):
         permissions = Permission.objects.filter(group__user=obj).distinct()
         return PermissionSerializer(permissions, many=True).data
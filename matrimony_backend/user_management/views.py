@@ -89,6 +89,8 @@ class UserViewSet(viewsets.ModelViewSet):
         Delete all auth tokens for the user before deleting the user.
         """
         from rest_framework.authtoken.models import Token
+        from authentication.cache import invalidate_user_tokens
+        invalidate_user_tokens(instance)
         Token.objects.filter(user=instance).delete()
         instance.delete()
 
@@ -102,6 +104,10 @@ class UserViewSet(viewsets.ModelViewSet):
         
         user = serializer.save()
         
+        # Cached credentials carry the user's fields, so drop them on any change
+        from authentication.cache import invalidate_user_tokens
+        invalidate_user_tokens(user)
+
         if password_updated:
             from rest_framework.authtoken.models import Token
             Token.objects.filter(user=user).delete()
@@ -4,3 +4,6 @@ from django.apps import AppConfig
 class UserProfileConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'user_profile'
+
+    def ready(self):
+        from . import lookups, signals  # noqa: F401
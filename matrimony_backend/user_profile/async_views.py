@@ -0,0 +1,136 @@
+"""
+Native async serving of the read-heavy profile endpoints under ASGI.
+
+AsyncProfileView runs UserProfileViewSet's request pipeline (authentication,
+permissions, filtering, pagination, serialization, rendering) but awaits the
+database work with Django's async ORM instead of tying up a worker thread.
+Write actions on the same routes are delegated to the regular viewset.
+Enabled with ASYNC_PROFILE_READS, which the gunicorn config sets in ASGI mode.
+"""
+from asgiref.sync import sync_to_async
+from django.http import Http404, HttpResponseNotAllowed
+from django.urls import URLPattern
+from django.views import View
+from rest_framework import status
+from rest_framework.response import Response
+
+from . import cache as profile_cache
+from .views import UserProfileViewSet
+
+
+class AsyncProfileView(View):
+    """Async front for one UserProfileViewSet route (list or detail)"""
+    async_actions = ('list', 'retrieve', 'me', 'my_interests')
+
+    # HTTP method -> viewset action, as given to ViewSet.as_view()
+    actions = None
+
+    async def get(self, request, *args, **kwargs):
+        method = request.method.lower()
+        if method not in self.actions:
+            return HttpResponseNotAllowed([name.upper() for name in self.actions])
+
+        action = self.actions[method]
+        if action not in self.async_actions:
+            view = UserProfileViewSet.as_view({method: action})
+            return await sync_to_async(view)(request, *args, **kwargs)
+
+        viewset = UserProfileViewSet(action_map={method: action})
+        viewset.args = args
+        viewset.kwargs = kwargs
+        request = viewset.initialize_request(request, *args, **kwargs)
+        viewset.request = request
+        viewset.headers = viewset.default_response_headers
+
+        try:
+            # Authentication may need the token cache or the database
+            await sync_to_async(viewset.initial)(request, *args, **kwargs)
+            # The viewset reads the viewer's profile while building querysets,
+            # and lazy queries are not allowed on the event loop
+            await viewset.viewer.aload_profile()
+            response = await getattr(self, action)(viewset, request, *args, **kwargs)
+        except Exception as exc:
+            response = viewset.handle_exception(exc)
+
+        # Django renders the response (off the event loop) after we return it
+        return viewset.finalize_response(request, response, *args, **kwargs)
+
+    post = put = patch = delete = get
+
+    async def paginated_response(self, viewset, queryset):
+        # Counting and page fetching happen inside the paginator
+        page = await sync_to_async(viewset.paginate_queryset)(queryset)
+        if page is not None:
+            serializer = viewset.get_serializer(page, many=True)
+            return viewset.get_paginated_response(serializer.data)
+
+        serializer = viewset.get_serializer([profile async for profile in queryset], many=True)
+        return Response(serializer.data)
+
+    async def list(self, viewset, request, *args, **kwargs):
+        key = await sync_to_async(profile_cache.feed_cache_key)(request, viewset.get_cache_scope())
+        response = await sync_to_async(viewset.get_cached_feed_page)(key)
+        if response is None:
+            queryset = viewset.filter_queryset(viewset.get_queryset())
+            response = await self.paginated_response(viewset, queryset)
+            await sync_to_async(viewset.cache_feed_page)(key, response)
+        return response
+
+    async def retrieve(self, viewset, request, *args, **kwargs):
+        key = await sync_to_async(profile_cache.profile_cache_key)(kwargs['pk'])
+        data = await sync_to_async(profile_cache.get_data)(key)
+        if data is None:
+            queryset = viewset.filter_queryset(viewset.get_queryset())
+            try:
+                instance = await queryset.filter(pk=kwargs['pk']).afirst()
+            except (TypeError, ValueError):
+                instance = None
+            if instance is None:
+                raise Http404
+            viewset.check_object_permissions(request, instance)
+            response = Response(viewset.get_serializer(instance).data)
+            data = (await sync_to_async(viewset.cache_response)(key, response)).data
+        elif not viewset.can_view(data):
+            raise Http404
+        response = await sync_to_async(viewset.get_cached_response)(key, data)
+        return response if response is not None else Response(data)
+
+    async def me(self, viewset, request, *args, **kwargs):
+        key = await sync_to_async(profile_cache.profile_cache_key)(request.user.pk)
+        response = await sync_to_async(viewset.get_cached_response)(key)
+        if response is not None:
+            return response
+
+        profile = viewset.viewer.profile
+        if profile is None:
+            return Response(
+                {'detail': 'Profile not found'},
+                status=status.HTTP_404_NOT_FOUND
+            )
+        # Rendering the profile's interests is a query
+        serializer = viewset.get_serializer(profile)
+        response = Response(await sync_to_async(lambda: serializer.data)())
+        return await sync_to_async(viewset.cache_response)(key, response)
+
+    async def my_interests(self, viewset, request, *args, **kwargs):
+        user_profile = viewset.viewer.profile
+        if user_profile is None:
+            return Response([], status=status.HTTP_200_OK)
+        interests = viewset.with_eager_loading(user_profile.interests.order_by('-created_at', '-user_id'))
+        return await self.paginated_response(viewset, interests)
+
+
+def use_async_reads(patterns):
+    """Swap AsyncProfileView into router patterns whose GET action it serves"""
+    swapped = []
+    for pattern in patterns:
+        actions = getattr(pattern.callback, 'actions', None) or {}
+        if actions.get('get') in AsyncProfileView.async_actions:
+            pattern = URLPattern(
+                pattern.pattern,
+                AsyncProfileView.as_view(actions=actions),
+                pattern.default_args,
+                pattern.name,
+            )
+        swapped.append(pattern)
+    return swapped
@@ -0,0 +1,208 @@
+"""
+Versioned response cache for profile reads.
+
+Each profile has a version counter, and feed pages share one more that
+counts changes to which profiles the feed lists and in what order (profiles
+created, deleted, or with a filtered or searched field changed). Writes bump
+the counters rather than deleting entries: keys embed the current versions,
+so outdated entries are never read again and simply expire. A feed page also
+records the versions of the profiles it shows and is only served while none
+of them changed, so editing or liking one profile retires the pages showing
+it, not every page. Because the versions change whenever the content may
+have, they double as the response's ETag, and a matching If-None-Match is
+answered before anything is serialized. Cache errors are logged and the
+response is built as if nothing was cached.
+"""
+import hashlib
+import logging
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.utils.http import parse_etags
+
+from matrimony.instrumentation import record_cache
+
+logger = logging.getLogger(__name__)
+
+TIMEOUT = getattr(settings, 'PROFILE_CACHE_TIMEOUT', 300)
+VERSION_TIMEOUT = 24 * 60 * 60
+
+FEED_VERSION_KEY = 'profiles:feed:version'
+
+
+def _profile_version_key(pk):
+    return f'profiles:profile:{pk}:version'
+
+
+def _new_version():
+    # Time based, so a counter that expired never restarts at a value whose
+    # entries may still be cached
+    return time.time_ns() // 1000
+
+
+def _get_version(key):
+    version = cache.get(key)
+    if version is None:
+        version = _new_version()
+        if not cache.add(key, version, VERSION_TIMEOUT):
+            version = cache.get(key, version)
+    return version
+
+
+def _bump_version(key):
+    try:
+        cache.incr(key)
+    except ValueError:
+        cache.set(key, _new_version(), VERSION_TIMEOUT)
+
+
+def profile_cache_key(pk):
+    """Key of the serialized profile ``pk``, or None when it can't be cached"""
+    if not str(pk).isdigit():
+        return None
+    try:
+        version = _get_version(_profile_version_key(pk))
+    except Exception:
+        logger.warning('Profile cache unavailable', exc_info=True)
+        return None
+    return f'profiles:profile:{pk}:{version}'
+
+
+def _profile_versions(pks):
+    """The current versions of the profiles ``pks``, as {version key: version}"""
+    version_keys = [_profile_version_key(pk) for pk in pks]
+    versions = cache.get_many(version_keys)
+    for version_key in version_keys:
+        if version_key not in versions:
+            versions[version_key] = _get_version(version_key)
+    return versions
+
+
+def profile_cache_keys(pks):
+    """profile_cache_key() of several profiles at once, as {pk: key}"""
+    pks = [pk for pk in pks if str(pk).isdigit()]
+    try:
+        versions = _profile_versions(pks)
+    except Exception:
+        logger.warning('Profile cache unavailable', exc_info=True)
+        return {}
+    return {pk: f'profiles:profile:{pk}:{versions[_profile_version_key(pk)]}' for pk in pks}
+
+
+def feed_cache_key(request, scope):
+    """
+    Key of a feed page for viewers in ``scope`` (viewers who are shown the
+    same profiles), the query string and the host (used in pagination links)
+    """
+    try:
+        version = _get_version(FEED_VERSION_KEY)
+    except Exception:
+        logger.warning('Profile cache unavailable', exc_info=True)
+        return None
+    query = sorted(request.query_params.lists())
+    digest = hashlib.md5(f'{request.get_host()}{request.path}{query}'.encode()).hexdigest()
+    return f'profiles:feed:page:{scope}:{version}:{digest}'
+
+
+def _feed_page_etag(key, versions):
+    return etag_for(f'{key}:{sorted(versions.items())}')
+
+
+def get_feed_page(key):
+    """(data, ETag) of the feed page ``key`` if cached and none of its profiles changed since"""
+    entry = get_data(key)
+    if entry is None:
+        return None
+    try:
+        current = cache.get_many(list(entry['versions']))
+    except Exception:
+        logger.warning('Profile cache unavailable', exc_info=True)
+        return None
+    if current != entry['versions']:
+        return None
+    return entry['data'], _feed_page_etag(key, entry['versions'])
+
+
+def set_feed_page(key, data, pks):
+    """
+    Cache the feed page ``key`` showing the profiles ``pks``; returns its
+    ETag. The versions are read after the page was built, so a change
+    committed in between can be served until its TIMEOUT.
+    """
+    if key is None:
+        return None
+    try:
+        versions = _profile_versions(pks)
+    except Exception:
+        logger.warning('Profile cache unavailable', exc_info=True)
+        return None
+    set_data(key, {'data': data, 'versions': versions})
+    return _feed_page_etag(key, versions)
+
+
+def etag_for(key):
+    return '"%s"' % hashlib.md5(key.encode()).hexdigest()
+
+
+def is_not_modified(request, etag):
+    etags = parse_etags(request.headers.get('If-None-Match', ''))
+    return etag in etags or '*' in etags
+
+
+def get_data(key):
+    if key is None:
+        return None
+    try:
+        data = cache.get(key)
+    except Exception:
+        logger.warning('Profile cache unavailable', exc_info=True)
+        return None
+    record_cache(data is not None)
+    return data
+
+
+def set_data(key, data):
+    if key is None:
+        return
+    try:
+        cache.set(key, data, TIMEOUT)
+    except Exception:
+        logger.warning('Profile cache unavailable', exc_info=True)
+
+
+def get_many_data(keys):
+    keys = list(keys)
+    try:
+        found = cache.get_many(keys)
+    except Exception:
+        logger.warning('Profile cache unavailable', exc_info=True)
+        return {}
+    for key in keys:
+        record_cache(key in found)
+    return found
+
+
+def set_many_data(entries):
+    try:
+        cache.set_many(entries, TIMEOUT)
+    except Exception:
+        logger.warning('Profile cache unavailable', exc_info=True)
+
+
+def invalidate_profile(pk, feed=False):
+    """
+    Retire the cached profile (and the feed pages showing it) once the change
+    commits; ``feed`` when the change may add or remove it from feeds or move
+    it within them, which retires every feed page
+    """
+    def bump():
+        try:
+            _bump_version(_profile_version_key(pk))
+            if feed:
+                _bump_version(FEED_VERSION_KEY)
+        except Exception:
+            logger.warning('Profile cache unavailable', exc_info=True)
+
+    transaction.on_commit(bump)
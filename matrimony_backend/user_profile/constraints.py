@@ -0,0 +1,33 @@
+"""
+Unique constraints enforced by the database on registration details.
+
+Registration and profile updates insert or update directly and let the
+database reject duplicates, rather than checking first: a check and an
+insert race, and each check is a round-trip. duplicate_field() tells which
+constraint an IntegrityError violated.
+"""
+
+# Case-insensitive, created in migration 0011; blank emails are allowed
+EMAIL_INDEX = 'auth_user_email_ci_uniq'
+# UserProfile.Meta.constraints; phone numbers are stored in E.164
+PHONE_CONSTRAINT = 'unique_profile_phone'
+# auth.User.username (unique=True)
+USERNAME_CONSTRAINT = 'auth_user_username_key'
+
+FIELDS = {
+    EMAIL_INDEX: 'email',
+    PHONE_CONSTRAINT: 'phone_number',
+    USERNAME_CONSTRAINT: 'username',
+}
+
+# Error messages shown to clients, as returned before the constraints existed
+MESSAGES = {
+    'email': 'Email already exists',
+    'phone_number': 'Phone number already registered',
+}
+
+
+def duplicate_field(exc):
+    """Field whose unique constraint the IntegrityError ``exc`` violated, or None"""
+    diag = getattr(exc.__cause__, 'diag', None)
+    return FIELDS.get(getattr(diag, 'constraint_name', None))
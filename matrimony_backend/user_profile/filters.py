@@ -0,0 +1,44 @@
+from django.db import connections
+from django.db.models import Q
+from django_filters import rest_framework as filters
+
+from .models import UserProfile
+
+
+def fuzzy_location_filter(queryset, field, value):
+    """
+    Substring or trigram-similar matches on ``field``. On PostgreSQL both
+    conditions are served by the field's gin_trgm_ops index, and similarity
+    also catches misspellings ("Chicgo").
+    """
+    if connections[queryset.db].vendor != 'postgresql':
+        return queryset.filter(**{f'{field}__icontains': value})
+    return queryset.filter(
+        Q(**{f'{field}__trgm_icontains': value}) | Q(**{f'{field}__trigram_similar': value})
+    )
+
+
+class UserProfileFilterSet(filters.FilterSet):
+    """Profile feed filters; location substring filters are trigram-indexed"""
+    city__icontains = filters.CharFilter(field_name='city', method='filter_location')
+    state__icontains = filters.CharFilter(field_name='state', method='filter_location')
+    country__icontains = filters.CharFilter(field_name='country', method='filter_location')
+
+    class Meta:
+        model = UserProfile
+        fields = {
+            'gender': ['exact'],
+            'city': ['exact'],
+            'state': ['exact'],
+            'country': ['exact'],
+            'family_type': ['exact'],
+            'family_status': ['exact'],
+            'height': ['gte', 'lte'],
+            'weight': ['gte', 'lte'],
+            'siblings': ['exact', 'gte', 'lte'],
+        }
+
+    def filter_location(self, queryset, name, value):
+        if not value:
+            return queryset
+        return fuzzy_location_filter(queryset, name, value)
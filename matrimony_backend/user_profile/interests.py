@@ -0,0 +1,206 @@
+"""
+Interests between profiles and what is derived from them: Match rows for
+mutual interest (one per side) and the counters on UserProfile. Everything
+that changes interests goes through here so the three stay consistent.
+"""
+from django.db import transaction
+from django.db.models import Count, Exists, F, OuterRef, Q, Subquery, Value
+from django.db.models.functions import Coalesce
+
+from .cache import invalidate_profile
+from .models import Interest, Match, UserProfile
+
+
+# Toggle one interest and everything derived from it in a single statement.
+# All parts see the same snapshot, so callers serialize toggles on a pair
+# first (see toggle_interest). %(a)s is the profile, %(b)s the target.
+TOGGLE_SQL = """
+    WITH profiles AS (
+        SELECT user_id FROM {profile_table} WHERE user_id IN (%(a)s, %(b)s)
+    ), removed AS (
+        DELETE FROM {interest_table}
+        WHERE from_userprofile_id = %(a)s AND to_userprofile_id = %(b)s
+        RETURNING 1
+    ), added AS (
+        INSERT INTO {interest_table} (from_userprofile_id, to_userprofile_id, created_at)
+        SELECT %(a)s, %(b)s, now()
+        WHERE NOT EXISTS (SELECT 1 FROM removed) AND (SELECT count(*) FROM profiles) = 2
+        ON CONFLICT (from_userprofile_id, to_userprofile_id) DO NOTHING
+        RETURNING 1
+    ), mutual AS (
+        SELECT 1 FROM {interest_table}
+        WHERE from_userprofile_id = %(b)s AND to_userprofile_id = %(a)s
+    ), unmatched AS (
+        DELETE FROM {match_table}
+        WHERE EXISTS (SELECT 1 FROM removed)
+            AND ((profile_id = %(a)s AND matched_id = %(b)s) OR (profile_id = %(b)s AND matched_id = %(a)s))
+        RETURNING 1
+    ), matched AS (
+        INSERT INTO {match_table} (profile_id, matched_id, created_at)
+        SELECT pair.profile_id, pair.matched_id, now()
+        FROM (VALUES (%(a)s, %(b)s), (%(b)s, %(a)s)) AS pair (profile_id, matched_id)
+        WHERE EXISTS (SELECT 1 FROM added) AND EXISTS (SELECT 1 FROM mutual)
+        ON CONFLICT (profile_id, matched_id) DO NOTHING
+        RETURNING 1
+    ), delta AS (
+        SELECT
+            (SELECT count(*) FROM added) - (SELECT count(*) FROM removed) AS interests,
+            ((SELECT count(*) FROM matched) - (SELECT count(*) FROM unmatched)) / 2 AS matches
+    ), counted AS (
+        UPDATE {profile_table} AS p SET
+            interests_sent_count = p.interests_sent_count
+                + CASE WHEN p.user_id = %(a)s THEN delta.interests ELSE 0 END,
+            interests_received_count = p.interests_received_count
+                + CASE WHEN p.user_id = %(b)s THEN delta.interests ELSE 0 END,
+            mutual_matches_count = p.mutual_matches_count + delta.matches
+        FROM delta
+        WHERE p.user_id IN (%(a)s, %(b)s)
+        RETURNING p.user_id, p.interests_sent_count, p.interests_received_count, p.mutual_matches_count
+    )
+    SELECT
+        counted.*,
+        EXISTS (SELECT 1 FROM added) OR (
+            NOT EXISTS (SELECT 1 FROM removed) AND (SELECT count(*) FROM profiles) = 2
+        ) AS is_interested,
+        (EXISTS (SELECT 1 FROM added) AND EXISTS (SELECT 1 FROM mutual)) OR (
+            NOT EXISTS (SELECT 1 FROM added) AND NOT EXISTS (SELECT 1 FROM removed) AND EXISTS (
+                SELECT 1 FROM {match_table} WHERE profile_id = %(a)s AND matched_id = %(b)s
+            )
+        ) AS is_match
+    FROM counted
+"""
+
+COUNT_FIELDS = ['interests_sent_count', 'interests_received_count', 'mutual_matches_count']
+
+
+def _increment(pks, delta, *fields):
+    UserProfile.objects.filter(pk__in=pks).update(
+        **{field: F(field) + delta for field in fields}
+    )
+
+
+def toggle_interest(profile_id, target_id):
+    """
+    Flip a profile's interest in a target, creating or removing their match
+    and adjusting the counters. Returns (is_interested, is_match, counts)
+    where counts are the profile's new counters. Raises
+    UserProfile.DoesNotExist if either profile is missing.
+    """
+    with transaction.atomic():
+        connection = transaction.get_connection()
+        if connection.vendor == 'postgresql':
+            result = _toggle_interest_sql(connection, profile_id, target_id)
+        else:
+            result = _toggle_interest_orm(profile_id, target_id)
+
+    # Both render changed counters (and the profile its interests)
+    invalidate_profile(profile_id)
+    invalidate_profile(target_id)
+    return result
+
+
+def _toggle_interest_sql(connection, profile_id, target_id):
+    sql = TOGGLE_SQL.format(
+        profile_table=UserProfile._meta.db_table,
+        interest_table=Interest._meta.db_table,
+        match_table=Match._meta.db_table,
+    )
+    with connection.cursor() as cursor:
+        # Concurrent toggles on the same pair, from either side, queue here
+        # so the statement below sees the other's committed interest
+        cursor.execute(
+            'SELECT pg_advisory_xact_lock(%s, %s)',
+            [min(profile_id, target_id), max(profile_id, target_id)],
+        )
+        cursor.execute(sql, {'a': profile_id, 'b': target_id})
+        rows = cursor.fetchall()
+
+    if len(rows) != 2:
+        raise UserProfile.DoesNotExist
+    row = next(row for row in rows if row[0] == profile_id)
+    return row[4], row[5], dict(zip(COUNT_FIELDS, row[1:4]))
+
+
+def _toggle_interest_orm(profile_id, target_id):
+    # Lock both profiles (in a fixed order) so concurrent toggles on the
+    # same pair, from either side, are applied one at a time
+    locked = list(
+        UserProfile.objects.select_for_update()
+        .filter(pk__in=[profile_id, target_id])
+        .order_by('pk')
+        .values_list('pk', flat=True)
+    )
+    if len(locked) != 2:
+        raise UserProfile.DoesNotExist
+
+    removed, _ = Interest.objects.filter(from_profile=profile_id, to_profile=target_id).delete()
+    is_match = False
+    if removed:
+        _increment([profile_id], -1, 'interests_sent_count')
+        _increment([target_id], -1, 'interests_received_count')
+        unmatched, _ = Match.objects.filter(
+            Q(profile=profile_id, matched=target_id) | Q(profile=target_id, matched=profile_id)
+        ).delete()
+        if unmatched:
+            _increment([profile_id, target_id], -1, 'mutual_matches_count')
+    else:
+        Interest.objects.create(from_profile_id=profile_id, to_profile_id=target_id)
+        _increment([profile_id], 1, 'interests_sent_count')
+        _increment([target_id], 1, 'interests_received_count')
+        if Interest.objects.filter(from_profile=target_id, to_profile=profile_id).exists():
+            Match.objects.bulk_create([
+                Match(profile_id=profile_id, matched_id=target_id),
+                Match(profile_id=target_id, matched_id=profile_id),
+            ])
+            _increment([profile_id, target_id], 1, 'mutual_matches_count')
+            is_match = True
+
+    counts = UserProfile.objects.filter(pk=profile_id).values(*COUNT_FIELDS).get()
+    return not removed, is_match, counts
+
+
+def release_interests(profile):
+    """Take a profile that is about to be deleted out of everyone's counters"""
+    _increment(
+        Interest.objects.filter(from_profile=profile).values('to_profile'), -1, 'interests_received_count'
+    )
+    _increment(
+        Interest.objects.filter(to_profile=profile).values('from_profile'), -1, 'interests_sent_count'
+    )
+    _increment(
+        Match.objects.filter(profile=profile).values('matched'), -1, 'mutual_matches_count'
+    )
+
+
+def refresh_interest_counts(profile_model=UserProfile, interest_model=Interest, match_model=Match):
+    """
+    Rebuild matches and counters from the interests table.
+    Migrations pass their historical models.
+    """
+    def count(queryset, field):
+        counted = queryset.filter(**{field: OuterRef('pk')}).order_by().values(field).annotate(n=Count('pk'))
+        return Coalesce(Subquery(counted.values('n')), Value(0))
+
+    with transaction.atomic():
+        mutual = interest_model.objects.filter(
+            Exists(interest_model.objects.filter(
+                from_profile=OuterRef('to_profile'), to_profile=OuterRef('from_profile')
+            ))
+        )
+        match_model.objects.bulk_create(
+            [
+                match_model(profile_id=from_id, matched_id=to_id)
+                for from_id, to_id in mutual.values_list('from_profile', 'to_profile').iterator()
+            ],
+            ignore_conflicts=True,
+            batch_size=1000,
+        )
+        match_model.objects.exclude(
+            Exists(mutual.filter(from_profile=OuterRef('profile'), to_profile=OuterRef('matched')))
+        ).delete()
+
+        profile_model.objects.update(
+            interests_sent_count=count(interest_model.objects, 'from_profile'),
+            interests_received_count=count(interest_model.objects, 'to_profile'),
+            mutual_matches_count=count(match_model.objects, 'profile'),
+        )
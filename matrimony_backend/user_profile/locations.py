@@ -0,0 +1,47 @@
+from django.db import transaction
+from django.db.models import Count
+
+from .models import Location, UserProfile
+
+LOCATION_KINDS = [kind for kind, _ in Location.KIND_CHOICES]
+
+
+def record_locations(profile):
+    """Make the profile's location values available as suggestions"""
+    Location.objects.bulk_create(
+        [
+            Location(kind=kind, value=getattr(profile, kind), profile_count=1)
+            for kind in LOCATION_KINDS
+            if getattr(profile, kind)
+        ],
+        ignore_conflicts=True,
+    )
+
+
+def refresh_locations(profile_model=UserProfile, location_model=Location):
+    """
+    Rebuild the distinct location values and their profile counts.
+    Migrations pass their historical models.
+    """
+    with transaction.atomic():
+        for kind in LOCATION_KINDS:
+            counts = (
+                profile_model.objects.exclude(**{kind: ''})
+                .order_by()
+                .values_list(kind)
+                .annotate(profile_count=Count('pk'))
+            )
+            locations = [
+                location_model(kind=kind, value=value, profile_count=profile_count)
+                for value, profile_count in counts
+            ]
+            location_model.objects.bulk_create(
+                locations,
+                update_conflicts=True,
+                unique_fields=['kind', 'value'],
+                update_fields=['profile_count'],
+                batch_size=1000,
+            )
+            location_model.objects.filter(kind=kind).exclude(
+                value__in=[location.value for location in locations]
+            ).delete()
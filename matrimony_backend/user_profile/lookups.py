@@ -0,0 +1,21 @@
+from django.db.models import CharField, TextField
+from django.db.models.lookups import IContains
+
+
+@CharField.register_lookup
+@TextField.register_lookup
+class TrigramIContains(IContains):
+    """
+    Case-insensitive containment compiled to a plain ``ILIKE``.
+    Django's ``icontains`` wraps both sides in UPPER() on PostgreSQL, which a
+    ``gin_trgm_ops`` index on the bare column cannot serve; ILIKE can.
+    """
+    lookup_name = 'trgm_icontains'
+
+    def as_sql(self, compiler, connection):
+        if connection.vendor != 'postgresql':
+            lookup = IContains(self.lhs, self.rhs)
+            return lookup.as_sql(compiler, connection)
+        lhs_sql, lhs_params = self.process_lhs(compiler, connection)
+        rhs_sql, rhs_params = self.process_rhs(compiler, connection)
+        return f'{lhs_sql} ILIKE {rhs_sql}', (*lhs_params, *rhs_params)
@@ -0,0 +1,31 @@
+from django.core.management.base import CommandError
+from rest_framework.request import Request
+from rest_framework.test import APIRequestFactory
+
+from user_profile.models import UserProfile
+from user_profile.views import UserProfileViewSet
+
+
+def get_viewer(user_id=None):
+    """The profile to run the feed as, defaulting to the newest one"""
+    profiles = UserProfile.objects.select_related('user')
+    profile = profiles.filter(pk=user_id).first() if user_id else profiles.first()
+    if profile is None:
+        raise CommandError('No profiles found, run seed_profiles first')
+    return profile
+
+
+def build_feed_view(viewer, params, action='list', filter_backends=None):
+    """A UserProfileViewSet bound to a GET request made by ``viewer``"""
+    request = Request(APIRequestFactory().get('/api/profiles/', params))
+    request.user = viewer.user
+    view = UserProfileViewSet(request=request, action=action, format_kwarg=None, kwargs={})
+    if filter_backends is not None:
+        view.filter_backends = filter_backends
+    return view
+
+
+def build_feed_queryset(viewer, params, filter_backends=None):
+    """The feed queryset exactly as UserProfileViewSet.list builds it"""
+    view = build_feed_view(viewer, params, filter_backends=filter_backends)
+    return view.filter_queryset(view.get_queryset())
@@ -0,0 +1,64 @@
+import statistics
+import time
+
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django_filters.rest_framework import DjangoFilterBackend
+from rest_framework.filters import OrderingFilter, SearchFilter
+
+from user_profile.models import UserProfile
+from user_profile.search import ProfileSearchFilter
+
+from ._feed import build_feed_queryset, get_viewer
+
+BACKENDS = {
+    'icontains': [DjangoFilterBackend, SearchFilter, OrderingFilter],
+    'fulltext': [DjangoFilterBackend, ProfileSearchFilter, OrderingFilter],
+}
+
+
+class Command(BaseCommand):
+    """
+    Compare feed search latency of DRF's icontains SearchFilter against the
+    full-text ProfileSearchFilter, seeding the table up to each size in turn.
+    Each run fetches the first page and its count, as the list endpoint does.
+    """
+    help = 'Benchmark profile search backends (PostgreSQL only)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--sizes', type=int, nargs='+', default=[100000, 1000000])
+        parser.add_argument('--terms', nargs='+', default=['olivia', 'chic', 'hiking', 'smith@example'])
+        parser.add_argument('--runs', type=int, default=5)
+        parser.add_argument('--page-size', type=int, default=20)
+
+    def handle(self, *args, **options):
+        if connection.vendor != 'postgresql':
+            raise CommandError('benchmark_profile_search requires PostgreSQL')
+
+        for size in options['sizes']:
+            call_command('seed_profiles', count=size, stdout=self.stdout)
+            viewer = get_viewer()
+            self.stdout.write(self.style.MIGRATE_HEADING(
+                f'{UserProfile.objects.count()} profiles, median of {options["runs"]} runs'
+            ))
+            for term in options['terms']:
+                timings = {
+                    name: self.time_search(viewer, term, backends, options['runs'], options['page_size'])
+                    for name, backends in BACKENDS.items()
+                }
+                self.stdout.write(
+                    f'  {term!r:>18}: '
+                    + ', '.join(f'{name} {ms:.1f} ms' for name, ms in timings.items())
+                    + f' ({timings["icontains"] / max(timings["fulltext"], 0.001):.1f}x)'
+                )
+
+    def time_search(self, viewer, term, backends, runs, page_size):
+        samples = []
+        for _ in range(runs):
+            queryset = build_feed_queryset(viewer, {'search': term}, filter_backends=backends)
+            started = time.perf_counter()
+            list(queryset[:page_size])
+            queryset.count()
+            samples.append((time.perf_counter() - started) * 1000)
+        return statistics.median(samples)
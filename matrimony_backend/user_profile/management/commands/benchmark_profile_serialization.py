@@ -0,0 +1,86 @@
+import json
+import statistics
+import time
+
+from django.core.management.base import BaseCommand
+from rest_framework.renderers import JSONRenderer
+
+from matrimony.renderers import ORJSONRenderer
+from user_profile.serializers import UserProfileReadSerializer, UserProfileSerializer
+
+from ._feed import build_feed_view, get_viewer
+
+# Query params of each representation compared
+REPRESENTATIONS = {
+    'full': {},
+    'card': {'view': 'card'},
+    'no_text': {'exclude': 'address_line1,address_line2,father_name,mother_name,bio,interests'},
+}
+
+# Serializer and renderer of each rendering path compared
+PIPELINES = {
+    'drf': (UserProfileSerializer, JSONRenderer),
+    'compiled': (UserProfileReadSerializer, ORJSONRenderer),
+}
+
+
+class Command(BaseCommand):
+    """
+    Compare feed pages rendered in full against sparse representations, and
+    DRF's serializer and renderer against the compiled serializer and orjson:
+    time to load the rows, serialize them and render JSON, and the payload
+    size. Seed enough profiles (seed_profiles) for the largest page first.
+    """
+    help = 'Benchmark profile list serialization and payload size per representation'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--page-sizes', type=int, nargs='+', default=[20, 100])
+        parser.add_argument('--runs', type=int, default=20)
+        parser.add_argument('--user-id', type=int, help='Profile to view the feed as')
+
+    def handle(self, *args, **options):
+        viewer = get_viewer(options['user_id'])
+
+        for page_size in options['page_sizes']:
+            self.stdout.write(self.style.MIGRATE_HEADING(
+                f'Page of {page_size}, median of {options["runs"]} runs'
+            ))
+            for name, params in REPRESENTATIONS.items():
+                view = build_feed_view(viewer, params)
+                fields, exclude = view.get_sparse_fields()
+                context = view.get_serializer_context()
+
+                load = []
+                timings = {pipeline: ([], []) for pipeline in PIPELINES}
+                payloads = {}
+                for _ in range(options['runs']):
+                    queryset = view.filter_queryset(view.get_queryset())[:page_size]
+                    started = time.perf_counter()
+                    rows = list(queryset)
+                    load.append((time.perf_counter() - started) * 1000)
+
+                    for pipeline, (serializer_class, renderer_class) in PIPELINES.items():
+                        serialize, render = timings[pipeline]
+                        started = time.perf_counter()
+                        data = serializer_class(
+                            rows, many=True, fields=fields, exclude=exclude, context=context
+                        ).data
+                        serialized = time.perf_counter()
+                        payloads[pipeline] = renderer_class().render(data)
+                        rendered = time.perf_counter()
+                        serialize.append((serialized - started) * 1000)
+                        render.append((rendered - serialized) * 1000)
+
+                self.stdout.write(
+                    f'  {name}: {len(rows)} rows, load {statistics.median(load):.2f} ms'
+                )
+                for pipeline, (serialize, render) in timings.items():
+                    self.stdout.write(
+                        f'    {pipeline:>8}: {len(payloads[pipeline]) / 1024:.1f} KiB, '
+                        f'serialize {statistics.median(serialize):.2f} ms, '
+                        f'render {statistics.median(render):.2f} ms'
+                    )
+
+                rendered = [json.loads(payload) for payload in payloads.values()]
+                if any(other != rendered[0] for other in rendered[1:]):
+                    self.stdout.write(self.style.WARNING(f'    {name}: pipelines rendered different output'))
@@ -0,0 +1,68 @@
+import json
+import time
+from urllib.parse import parse_qsl
+
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+
+from user_profile.models import UserProfile
+
+from ._feed import build_feed_queryset, get_viewer
+
+
+def iter_plan_nodes(node):
+    yield node
+    for child in node.get('Plans', []):
+        yield from iter_plan_nodes(child)
+
+
+class Command(BaseCommand):
+    """
+    EXPLAIN ANALYZE the profile discovery feed exactly as UserProfileViewSet
+    builds it, and report which scan each table uses.
+    """
+    help = 'Benchmark the profile feed query plan (PostgreSQL only)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--seed', type=int, default=0, help='Seed synthetic profiles up to this count first')
+        parser.add_argument('--viewer', type=int, help='User id to run the feed as (defaults to the newest profile)')
+        parser.add_argument('--query', default='', help='Feed query string, e.g. "city=Chicago&height__gte=160"')
+        parser.add_argument('--page-size', type=int, default=20)
+        parser.add_argument('--assert-index', action='store_true', help='Fail if the profile table is sequentially scanned')
+
+    def handle(self, *args, **options):
+        if connection.vendor != 'postgresql':
+            raise CommandError('explain_profile_feed requires PostgreSQL')
+
+        if options['seed']:
+            call_command('seed_profiles', count=options['seed'], stdout=self.stdout)
+
+        viewer_profile = get_viewer(options['viewer'])
+        queryset = build_feed_queryset(viewer_profile, dict(parse_qsl(options['query'])))
+
+        self.stdout.write(f'Profiles: {UserProfile.objects.count()}')
+        self.stdout.write(f'Viewer: {viewer_profile.pk} ({viewer_profile.gender})')
+
+        started = time.perf_counter()
+        plan = json.loads(queryset[:options['page_size']].explain(analyze=True, buffers=True, format='json'))[0]
+        self.stdout.write(f'Explain wall time: {(time.perf_counter() - started) * 1000:.1f} ms')
+        self.stdout.write(f"Execution time: {plan['Execution Time']:.1f} ms")
+
+        profile_table = UserProfile._meta.db_table
+        sequential = False
+        for node in iter_plan_nodes(plan['Plan']):
+            if 'Relation Name' not in node:
+                continue
+            index = f" using {node['Index Name']}" if 'Index Name' in node else ''
+            self.stdout.write(f"  {node['Node Type']} on {node['Relation Name']}{index}")
+            if node['Relation Name'] == profile_table and node['Node Type'] == 'Seq Scan':
+                sequential = True
+
+        if sequential:
+            message = f'{profile_table} is sequentially scanned'
+            if options['assert_index']:
+                raise CommandError(message)
+            self.stdout.write(self.style.WARNING(message))
+        else:
+            self.stdout.write(self.style.SUCCESS(f'{profile_table} is read through an index'))
@@ -0,0 +1,117 @@
+import statistics
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+
+import requests
+from django.core.management.base import BaseCommand, CommandError
+
+
+def percentile(samples, pct):
+    ordered = sorted(samples)
+    index = min(len(ordered) - 1, max(0, round(pct / 100 * len(ordered)) - 1))
+    return ordered[index]
+
+
+class Command(BaseCommand):
+    """
+    Fire concurrent authenticated requests at a running server and report
+    latency percentiles. Run it once per server configuration (e.g. with
+    DB_CONN_MAX_AGE=0 and then the default, or GUNICORN_SERVER_MODE=wsgi and
+    then asgi) to compare them. Several --concurrency levels show how
+    throughput holds up as open connections grow. With --login-storm, each
+    level is run again while that many clients log in back to back, to show
+    how much password hashing slows reads down.
+    """
+    help = 'Load test a profile API endpoint against a running server'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--url', default='http://localhost:8000/api/profiles/')
+        parser.add_argument('--token', help='Auth token to send as "Authorization: Token <token>"')
+        parser.add_argument('--requests', type=int, default=1000)
+        parser.add_argument('--concurrency', type=int, nargs='+', default=[16])
+        parser.add_argument('--warmup', type=int, default=20)
+        parser.add_argument('--label', default='', help='Name printed with the results')
+        parser.add_argument('--login-storm', type=int, default=0, help='Clients logging in during a second run')
+        parser.add_argument('--login-url', default='http://localhost:8000/api/auth/login/')
+        parser.add_argument('--login-username', help='Credentials the storm logs in with')
+        parser.add_argument('--login-password')
+
+    def handle(self, *args, **options):
+        headers = {'Authorization': f"Token {options['token']}"} if options['token'] else {}
+        local = threading.local()
+
+        def fetch(_):
+            # One keep-alive session per thread, like a real client
+            if not hasattr(local, 'session'):
+                local.session = requests.Session()
+                local.session.headers.update(headers)
+            started = time.perf_counter()
+            try:
+                ok = local.session.get(options['url'], timeout=30).status_code < 400
+            except requests.RequestException:
+                ok = False
+            return (time.perf_counter() - started) * 1000, ok
+
+        for concurrency in options['concurrency']:
+            self.run(fetch, concurrency, options)
+            if options['login_storm']:
+                with self.login_storm(options) as logins:
+                    self.run(fetch, concurrency, options, note='during login storm')
+                self.stdout.write(
+                    f"  {options['login_storm']} clients logging in: {logins['ok']} logins, {logins['failed']} failed"
+                )
+
+    @contextmanager
+    def login_storm(self, options):
+        """Clients logging in back to back until the block exits; yields their counts"""
+        if not options['login_username'] or not options['login_password']:
+            raise CommandError('--login-storm needs --login-username and --login-password')
+        credentials = {'username': options['login_username'], 'password': options['login_password']}
+        counts = {'ok': 0, 'failed': 0}
+        counts_lock = threading.Lock()
+        stop = threading.Event()
+
+        def log_in():
+            session = requests.Session()
+            while not stop.is_set():
+                try:
+                    ok = session.post(options['login_url'], json=credentials, timeout=30).status_code == 200
+                except requests.RequestException:
+                    ok = False
+                with counts_lock:
+                    counts['ok' if ok else 'failed'] += 1
+
+        clients = [threading.Thread(target=log_in, daemon=True) for _ in range(options['login_storm'])]
+        for client in clients:
+            client.start()
+        try:
+            yield counts
+        finally:
+            stop.set()
+            for client in clients:
+                client.join()
+
+    def run(self, fetch, concurrency, options, note=''):
+        with ThreadPoolExecutor(max_workers=concurrency) as pool:
+            list(pool.map(fetch, range(options['warmup'])))
+            started = time.perf_counter()
+            results = list(pool.map(fetch, range(options['requests'])))
+            elapsed = time.perf_counter() - started
+
+        latencies = [ms for ms, ok in results if ok]
+        errors = len(results) - len(latencies)
+        if not latencies:
+            raise CommandError(f'All {errors} requests failed')
+
+        label = f"[{options['label']}] " if options['label'] else ''
+        note = f', {note}' if note else ''
+        self.stdout.write(
+            f"{label}{options['url']}: {len(results)} requests, concurrency {concurrency}{note}, "
+            f"{len(results) / elapsed:.1f} req/s, {errors} errors"
+        )
+        self.stdout.write(
+            f'  p50 {percentile(latencies, 50):.1f} ms  p90 {percentile(latencies, 90):.1f} ms  '
+            f'p99 {percentile(latencies, 99):.1f} ms  mean {statistics.mean(latencies):.1f} ms'
+        )
@@ -0,0 +1,36 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from user_profile.models import UserProfile
+from user_profile.photos import is_current, is_stored, process_photo
+from user_profile.tasks import process_profile_photo
+
+
+class Command(BaseCommand):
+    help = 'Make the resized copies of profile photos that have none yet'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--queue', action='store_true', help='Hand the photos to Celery instead of processing them here'
+        )
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+        pending = [
+            profile.pk
+            for profile in UserProfile.objects.exclude(photo='').exclude(photo__isnull=True)
+            .only('photo', 'photo_variants').iterator()
+            if is_stored(profile) and not is_current(profile)
+        ]
+
+        for pk in pending:
+            if options['queue']:
+                process_profile_photo.delay(pk)
+            else:
+                process_photo(pk)
+
+        action = 'Queued' if options['queue'] else 'Processed'
+        self.stdout.write(self.style.SUCCESS(
+            f'{action} {len(pending)} photos in {time.perf_counter() - started:.2f}s'
+        ))
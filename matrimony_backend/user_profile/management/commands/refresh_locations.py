@@ -0,0 +1,12 @@
+from django.core.management.base import BaseCommand
+
+from user_profile.locations import refresh_locations
+from user_profile.models import Location
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the location autocomplete table from profiles'
+
+    def handle(self, *args, **options):
+        refresh_locations()
+        self.stdout.write(self.style.SUCCESS(f'{Location.objects.count()} locations indexed'))
@@ -0,0 +1,21 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from user_profile.models import ProfileRecommendation
+from user_profile.recommendations import ProfileMatrix, refresh_all
+
+
+class Command(BaseCommand):
+    help = 'Recompute every profile\'s recommended matches'
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+        matrix = ProfileMatrix.load()
+        loaded = time.perf_counter()
+        refresh_all(matrix)
+        finished = time.perf_counter()
+        self.stdout.write(self.style.SUCCESS(
+            f'{ProfileRecommendation.objects.count()} recommendations for {len(matrix)} profiles '
+            f'(load {loaded - started:.2f}s, score and store {finished - loaded:.2f}s)'
+        ))
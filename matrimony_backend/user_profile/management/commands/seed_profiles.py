@@ -0,0 +1,138 @@
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+
+from user_profile.models import UserProfile
+from user_profile.search import refresh_search_vectors
+
+User = get_user_model()
+
+SEED_PREFIX = 'seed_'
+
+CITIES = [
+    'New York', 'Los Angeles', 'Chicago', 'Houston', 'Phoenix',
+    'Philadelphia', 'San Antonio', 'San Diego', 'Dallas', 'San Jose',
+    'Austin', 'Jacksonville', 'Fort Worth', 'Columbus', 'Charlotte',
+]
+STATES = ['California', 'New York', 'Texas', 'Florida', 'Washington', 'Illinois', 'Georgia']
+COUNTRIES = ['USA', 'India', 'Canada', 'United Kingdom', 'Australia']
+FIRST_NAMES = ['Emma', 'Olivia', 'Ava', 'Isabella', 'Sophia', 'Liam', 'Noah', 'Oliver', 'Elijah', 'William']
+LAST_NAMES = ['Smith', 'Johnson', 'Williams', 'Brown', 'Jones', 'Garcia', 'Miller', 'Davis', 'Wilson', 'Taylor']
+BIOS = [
+    'Software engineer by day, amateur painter by night.',
+    'Passionate traveler and foodie looking for a partner for the next adventure.',
+    'Nature lover who enjoys hiking and weekend camping trips.',
+    'Lifelong learner and bookworm, always curious about the world.',
+    'Musician and dog lover who spends free time exploring local parks.',
+]
+
+
+def _sql_array(values):
+    return 'ARRAY[%s]' % ', '.join("'%s'" % value.replace("'", "''") for value in values)
+
+
+def _pick(values):
+    """SQL expression picking a random element of ``values``"""
+    return '(%s)[1 + floor(random() * %d)::int]' % (_sql_array(values), len(values))
+
+
+class Command(BaseCommand):
+    """
+    Generate synthetic users and profiles for load and query-plan testing.
+    Seeded accounts use a ``seed_`` username prefix and can be removed with --clear.
+    """
+    help = 'Seed synthetic user profiles (PostgreSQL only)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--count', type=int, default=100000, help='Total number of seeded profiles to reach')
+        parser.add_argument('--batch-size', type=int, default=50000)
+        parser.add_argument('--clear', action='store_true', help='Delete previously seeded profiles and exit')
+
+    def handle(self, *args, **options):
+        if connection.vendor != 'postgresql':
+            raise CommandError('seed_profiles uses generate_series and requires PostgreSQL')
+
+        seeded_users = User.objects.filter(username__startswith=SEED_PREFIX)
+
+        if options['clear']:
+            deleted, _ = seeded_users.delete()
+            self.stdout.write(self.style.SUCCESS(f'Deleted {deleted} seeded rows'))
+            return
+
+        existing = seeded_users.count()
+        target = options['count']
+        if existing >= target:
+            self.stdout.write(f'{existing} seeded profiles already present, nothing to do')
+            return
+
+        # One shared unusable password keeps seeding fast and the accounts locked
+        password = make_password(None)
+        batch_size = options['batch_size']
+
+        for start in range(existing + 1, target + 1, batch_size):
+            end = min(start + batch_size - 1, target)
+            with transaction.atomic():
+                self._insert_batch(start, end, password)
+            self.stdout.write(f'Seeded profiles {start}-{end}')
+
+        with connection.cursor() as cursor:
+            cursor.execute(f'ANALYZE {User._meta.db_table}')
+            cursor.execute(f'ANALYZE {UserProfile._meta.db_table}')
+
+        self.stdout.write(self.style.SUCCESS(f'Seeded profiles up to {target}'))
+
+    def _insert_batch(self, start, end, password):
+        user_table = User._meta.db_table
+        profile_table = UserProfile._meta.db_table
+
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f"""
+                INSERT INTO {user_table}
+                    (password, is_superuser, username, first_name, last_name,
+                     email, is_staff, is_active, date_joined)
+                SELECT %s, false, %s || n, {_pick(FIRST_NAMES)}, {_pick(LAST_NAMES)},
+                       %s || n || '@example.com', false, true, now()
+                FROM generate_series(%s, %s) AS n
+                ON CONFLICT (username) DO NOTHING
+                """,
+                [password, SEED_PREFIX, SEED_PREFIX, start, end],
+            )
+            cursor.execute(
+                f"""
+                INSERT INTO {profile_table}
+                    (user_id, gender, phone_number, height, weight,
+                     address_line1, address_line2, city, state, country, postal_code,
+                     father_name, mother_name, siblings, family_type, family_status,
+                     bio, interests_sent_count, interests_received_count,
+                     mutual_matches_count, created_at, updated_at)
+                SELECT u.id,
+                       CASE WHEN random() < 0.5 THEN 'Male' ELSE 'Female' END,
+                       '+1' || (2000000000 + u.id)::text,
+                       round((150 + random() * 40)::numeric, 2),
+                       round((45 + random() * 50)::numeric, 2),
+                       '', '',
+                       {_pick(CITIES)}, {_pick(STATES)}, {_pick(COUNTRIES)},
+                       lpad((floor(random() * 100000))::int::text, 5, '0'),
+                       '', '',
+                       floor(random() * 5)::int,
+                       {_pick(['nuclear', 'joint'])},
+                       {_pick(['middle_class', 'upper_middle_class', 'rich'])},
+                       {_pick(BIOS)},
+                       0, 0, 0,
+                       now() - random() * interval '730 days',
+                       now()
+                FROM {user_table} u
+                WHERE u.username IN (SELECT %s || n FROM generate_series(%s, %s) AS n)
+                ON CONFLICT (user_id) DO NOTHING
+                """,
+                [SEED_PREFIX, start, end],
+            )
+
+        # Raw inserts bypass the post_save signals that maintain search vectors
+        refresh_search_vectors(
+            User.objects.filter(
+                username__in=[f'{SEED_PREFIX}{n}' for n in range(start, end + 1)]
+            ).values_list('id', flat=True)
+        )
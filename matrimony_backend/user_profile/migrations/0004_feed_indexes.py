@@ -0,0 +1,45 @@
+# Generated by Django 4.2.23 on 2026-10-18 10:01
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('user_profile', '0003_userprofile_interests'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='userprofile',
+            index=models.Index(fields=['gender', '-created_at'], include=('user',), name='profile_feed_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='userprofile',
+            index=models.Index(condition=models.Q(('city', ''), _negated=True), fields=['gender', 'city'], name='profile_city_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='userprofile',
+            index=models.Index(condition=models.Q(('state', ''), _negated=True), fields=['gender', 'state'], name='profile_state_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='userprofile',
+            index=models.Index(condition=models.Q(('country', ''), _negated=True), fields=['gender', 'country'], name='profile_country_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='userprofile',
+            index=models.Index(fields=['gender', 'family_type', 'family_status'], name='profile_family_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='userprofile',
+            index=models.Index(condition=models.Q(('height__isnull', False)), fields=['gender', 'height'], name='profile_height_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='userprofile',
+            index=models.Index(condition=models.Q(('weight__isnull', False)), fields=['gender', 'weight'], name='profile_weight_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='userprofile',
+            index=models.Index(condition=models.Q(('siblings__isnull', False)), fields=['gender', 'siblings'], name='profile_siblings_idx'),
+        ),
+    ]
@@ -0,0 +1,21 @@
+# Generated by Django 4.2.23 on 2026-10-18 10:02
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('user_profile', '0004_feed_indexes'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='userprofile',
+            name='profile_feed_idx',
+        ),
+        migrations.AddIndex(
+            model_name='userprofile',
+            index=models.Index(fields=['gender', '-created_at', '-user'], name='profile_feed_keyset_idx'),
+        ),
+    ]
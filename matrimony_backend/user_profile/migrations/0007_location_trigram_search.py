@@ -0,0 +1,63 @@
+# Generated by Django 4.2.23 on 2026-10-18 10:04
+
+import django.contrib.postgres.indexes
+from django.contrib.postgres.operations import TrigramExtension
+from django.db import migrations, models
+
+
+def build_locations(apps, schema_editor):
+    from user_profile.locations import refresh_locations
+
+    refresh_locations(
+        apps.get_model('user_profile', 'UserProfile'),
+        apps.get_model('user_profile', 'Location'),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('user_profile', '0006_profile_search_vector'),
+    ]
+
+    operations = [
+        TrigramExtension(),
+        migrations.CreateModel(
+            name='Location',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(choices=[('city', 'City'), ('state', 'State'), ('country', 'Country')], max_length=10)),
+                ('value', models.CharField(max_length=100)),
+                ('profile_count', models.PositiveIntegerField(default=0, help_text='Profiles using this value, refreshed by refresh_locations')),
+            ],
+            options={
+                'verbose_name': 'Location',
+                'verbose_name_plural': 'Locations',
+            },
+        ),
+        migrations.AddIndex(
+            model_name='userprofile',
+            index=django.contrib.postgres.indexes.GinIndex(fields=['city'], name='profile_city_trgm_idx', opclasses=['gin_trgm_ops']),
+        ),
+        migrations.AddIndex(
+            model_name='userprofile',
+            index=django.contrib.postgres.indexes.GinIndex(fields=['state'], name='profile_state_trgm_idx', opclasses=['gin_trgm_ops']),
+        ),
+        migrations.AddIndex(
+            model_name='userprofile',
+            index=django.contrib.postgres.indexes.GinIndex(fields=['country'], name='profile_country_trgm_idx', opclasses=['gin_trgm_ops']),
+        ),
+        migrations.AddIndex(
+            model_name='location',
+            index=models.Index(fields=['kind', '-profile_count'], name='location_popular_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='location',
+            index=django.contrib.postgres.indexes.GinIndex(fields=['value'], name='location_value_trgm_idx', opclasses=['gin_trgm_ops']),
+        ),
+        migrations.AddConstraint(
+            model_name='location',
+            constraint=models.UniqueConstraint(fields=('kind', 'value'), name='unique_location_value'),
+        ),
+        migrations.RunPython(build_locations, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,32 @@
+# Generated by Django 4.2.23 on 2026-10-18 10:15
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('user_profile', '0007_location_trigram_search'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ProfileRecommendation',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('score', models.FloatField(help_text='Compatibility between 0 and 1')),
+                ('candidate', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='recommended_to', to='user_profile.userprofile')),
+                ('viewer', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='recommendations', to='user_profile.userprofile')),
+            ],
+            options={
+                'verbose_name': 'Profile Recommendation',
+                'verbose_name_plural': 'Profile Recommendations',
+                'indexes': [models.Index(fields=['viewer', '-score'], name='recommendation_viewer_idx')],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='profilerecommendation',
+            constraint=models.UniqueConstraint(fields=('viewer', 'candidate'), name='unique_recommendation'),
+        ),
+    ]
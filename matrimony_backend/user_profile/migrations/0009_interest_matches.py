@@ -0,0 +1,94 @@
+# Generated by Django 4.2.23 on 2026-10-18 10:17
+
+from django.db import migrations, models
+import django.db.models.deletion
+import django.utils.timezone
+
+
+def backfill_matches(apps, schema_editor):
+    from user_profile.interests import refresh_interest_counts
+
+    refresh_interest_counts(
+        apps.get_model('user_profile', 'UserProfile'),
+        apps.get_model('user_profile', 'Interest'),
+        apps.get_model('user_profile', 'Match'),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('user_profile', '0008_profile_recommendations'),
+    ]
+
+    operations = [
+        # Take over the auto-created interests table as an explicit model
+        migrations.SeparateDatabaseAndState(
+            state_operations=[
+                migrations.CreateModel(
+                    name='Interest',
+                    fields=[
+                        ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                        ('from_profile', models.ForeignKey(db_column='from_userprofile_id', on_delete=django.db.models.deletion.CASCADE, related_name='interests_sent', to='user_profile.userprofile')),
+                        ('to_profile', models.ForeignKey(db_column='to_userprofile_id', on_delete=django.db.models.deletion.CASCADE, related_name='interests_received', to='user_profile.userprofile')),
+                    ],
+                    options={
+                        'verbose_name': 'Interest',
+                        'verbose_name_plural': 'Interests',
+                        'db_table': 'user_profile_userprofile_interests',
+                        'unique_together': {('from_profile', 'to_profile')},
+                    },
+                ),
+                migrations.AlterField(
+                    model_name='userprofile',
+                    name='interests',
+                    field=models.ManyToManyField(blank=True, help_text='Profiles this user is interested in', related_name='interested_by', through='user_profile.Interest', through_fields=('from_profile', 'to_profile'), to='user_profile.userprofile'),
+                ),
+            ],
+            database_operations=[],
+        ),
+        migrations.AddField(
+            model_name='interest',
+            name='created_at',
+            field=models.DateTimeField(auto_now_add=True, default=django.utils.timezone.now),
+            preserve_default=False,
+        ),
+        migrations.AddIndex(
+            model_name='interest',
+            index=models.Index(fields=['to_profile', '-created_at', '-from_profile'], name='interest_received_idx'),
+        ),
+        migrations.AddField(
+            model_name='userprofile',
+            name='interests_received_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='userprofile',
+            name='interests_sent_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='userprofile',
+            name='mutual_matches_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.CreateModel(
+            name='Match',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('matched', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='matched_with', to='user_profile.userprofile')),
+                ('profile', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='matches', to='user_profile.userprofile')),
+            ],
+            options={
+                'verbose_name': 'Match',
+                'verbose_name_plural': 'Matches',
+                'indexes': [models.Index(fields=['profile', '-created_at', '-matched'], name='match_profile_idx')],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='match',
+            constraint=models.UniqueConstraint(fields=('profile', 'matched'), name='unique_match'),
+        ),
+        migrations.RunPython(backfill_matches, migrations.RunPython.noop),
+    ]
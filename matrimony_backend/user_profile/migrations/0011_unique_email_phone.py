@@ -0,0 +1,88 @@
+# Generated by Django 4.2.23 on 2026-10-18 10:39
+
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count
+from django.db.models.functions import Upper
+
+
+def check_duplicates(apps, schema_editor):
+    """
+    Stop before building anything if existing accounts share an email
+    (case-insensitively) or a phone number, listing them to merge or fix.
+    Which account to keep is not ours to guess.
+    """
+    User = apps.get_model(settings.AUTH_USER_MODEL)
+    UserProfile = apps.get_model('user_profile', 'UserProfile')
+
+    duplicates = []
+    emails = (
+        User.objects.exclude(email='').annotate(key=Upper('email'))
+        .values('key').annotate(n=Count('pk')).filter(n__gt=1).values_list('key', flat=True)
+    )
+    for email in emails:
+        ids = User.objects.annotate(key=Upper('email')).filter(key=email).values_list('pk', flat=True)
+        duplicates.append(f'email {email.lower()}: users {sorted(ids)}')
+    phones = (
+        UserProfile.objects.values('phone_number').annotate(n=Count('pk')).filter(n__gt=1)
+        .values_list('phone_number', flat=True)
+    )
+    for phone in phones:
+        ids = UserProfile.objects.filter(phone_number=phone).values_list('user_id', flat=True)
+        duplicates.append(f'phone number {phone or "(blank)"}: users {sorted(ids)}')
+
+    if duplicates:
+        raise RuntimeError(
+            'Accounts share details that are about to become unique; merge or fix them '
+            'and migrate again:\n  ' + '\n  '.join(duplicates)
+        )
+
+
+class Migration(migrations.Migration):
+    # CREATE INDEX CONCURRENTLY can't run in a transaction. Building the
+    # indexes concurrently doesn't block registrations, logins or profile
+    # updates meanwhile; a failed build leaves an invalid index, dropped
+    # before trying again.
+    atomic = False
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('user_profile', '0010_profile_photo_variants'),
+    ]
+
+    operations = [
+        migrations.RunPython(check_duplicates, migrations.RunPython.noop),
+        # The same constraint AddConstraint would create, attached to an
+        # index built beforehand so the table is only locked for the ALTER
+        migrations.SeparateDatabaseAndState(
+            state_operations=[
+                migrations.AddConstraint(
+                    model_name='userprofile',
+                    constraint=models.UniqueConstraint(fields=('phone_number',), name='unique_profile_phone'),
+                ),
+            ],
+            database_operations=[
+                migrations.RunSQL(
+                    [
+                        # Left by an earlier attempt that failed later on
+                        'ALTER TABLE user_profile_userprofile DROP CONSTRAINT IF EXISTS unique_profile_phone',
+                        'DROP INDEX CONCURRENTLY IF EXISTS unique_profile_phone',
+                        'CREATE UNIQUE INDEX CONCURRENTLY unique_profile_phone '
+                        'ON user_profile_userprofile (phone_number)',
+                        'ALTER TABLE user_profile_userprofile '
+                        'ADD CONSTRAINT unique_profile_phone UNIQUE USING INDEX unique_profile_phone',
+                    ],
+                    'ALTER TABLE user_profile_userprofile DROP CONSTRAINT IF EXISTS unique_profile_phone',
+                ),
+            ],
+        ),
+        # auth_user isn't ours to add constraints to in Meta. UPPER matches
+        # what __iexact lookups compare; blank emails may repeat.
+        migrations.RunSQL(
+            [
+                'DROP INDEX CONCURRENTLY IF EXISTS auth_user_email_ci_uniq',
+                "CREATE UNIQUE INDEX CONCURRENTLY auth_user_email_ci_uniq ON auth_user (UPPER(email)) WHERE email <> ''",
+            ],
+            'DROP INDEX CONCURRENTLY IF EXISTS auth_user_email_ci_uniq',
+        ),
+    ]
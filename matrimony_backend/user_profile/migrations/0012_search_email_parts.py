@@ -0,0 +1,21 @@
+# Generated by Django 4.2.23 on 2026-10-18 12:10
+
+from django.db import migrations
+
+
+def backfill_search_vectors(apps, schema_editor):
+    from user_profile.search import refresh_search_vectors
+
+    refresh_search_vectors(using=schema_editor.connection.alias)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('user_profile', '0011_unique_email_phone'),
+    ]
+
+    operations = [
+        # Index the parts of emails as words (see SEARCH_VECTOR_SQL)
+        migrations.RunPython(backfill_search_vectors, migrations.RunPython.noop),
+    ]
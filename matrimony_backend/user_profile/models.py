@@ -1,5 +1,7 @@
 from django.db import models
 from django.contrib.auth import get_user_model
+from django.contrib.postgres.indexes import GinIndex
+from django.contrib.postgres.search import SearchVectorField
 from phonenumber_field.modelfields import PhoneNumberField
 
 User = get_user_model()
@@ -24,6 +26,8 @@ class UserProfile(models.Model):
         blank=True,
         help_text="User profile photo"
     )
+    # Resized copies of photo, maintained by user_profile.photos
+    photo_variants = models.JSONField(null=True, blank=True, editable=False)
     
     # Gender
     gender = models.CharField(
@@ -96,12 +100,22 @@ class UserProfile(models.Model):
     # Interests - ManyToMany relation to self
     interests = models.ManyToManyField(
         'self',
+        through='Interest',
+        through_fields=('from_profile', 'to_profile'),
         symmetrical=False,
         related_name='interested_by',
         blank=True,
         help_text="Profiles this user is interested in"
     )
     
+    # Interest counters, maintained by user_profile.interests
+    interests_sent_count = models.PositiveIntegerField(default=0)
+    interests_received_count = models.PositiveIntegerField(default=0)
+    mutual_matches_count = models.PositiveIntegerField(default=0)
+    
+    # Full-text search document, maintained by user_profile.search
+    search_vector = SearchVectorField(null=True, editable=False)
+    
     # Timestamps
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
@@ -110,6 +124,212 @@ class UserProfile(models.Model):
         verbose_name = 'User Profile'
         verbose_name_plural = 'User Profiles'
         ordering = ['-created_at']
+        constraints = [
+            # See user_profile.constraints
+            models.UniqueConstraint(fields=['phone_number'], name='unique_profile_phone'),
+        ]
+        indexes = [
+            # Discovery feed: opposite gender, newest first. The primary key
+            # breaks created_at ties for keyset pagination and lets page
+            # counts be answered from the index.
+            models.Index(
+                fields=['gender', '-created_at', '-user'],
+                name='profile_feed_keyset_idx',
+            ),
+            # Filter columns, scoped by gender since the feed always is.
+            # Blank/null values are never filtered on, so keep them out.
+            models.Index(
+                fields=['gender', 'city'],
+                condition=~models.Q(city=''),
+                name='profile_city_idx',
+            ),
+            models.Index(
+                fields=['gender', 'state'],
+                condition=~models.Q(state=''),
+                name='profile_state_idx',
+            ),
+            models.Index(
+                fields=['gender', 'country'],
+                condition=~models.Q(country=''),
+                name='profile_country_idx',
+            ),
+            models.Index(
+                fields=['gender', 'family_type', 'family_status'],
+                name='profile_family_idx',
+            ),
+            models.Index(
+                fields=['gender', 'height'],
+                condition=models.Q(height__isnull=False),
+                name='profile_height_idx',
+            ),
+            models.Index(
+                fields=['gender', 'weight'],
+                condition=models.Q(weight__isnull=False),
+                name='profile_weight_idx',
+            ),
+            models.Index(
+                fields=['gender', 'siblings'],
+                condition=models.Q(siblings__isnull=False),
+                name='profile_siblings_idx',
+            ),
+            GinIndex(fields=['search_vector'], name='profile_search_idx'),
+            # Substring/similarity matching for the *__icontains filters
+            GinIndex(fields=['city'], opclasses=['gin_trgm_ops'], name='profile_city_trgm_idx'),
+            GinIndex(fields=['state'], opclasses=['gin_trgm_ops'], name='profile_state_trgm_idx'),
+            GinIndex(fields=['country'], opclasses=['gin_trgm_ops'], name='profile_country_trgm_idx'),
+        ]
     
     def __str__(self):
         return f"Profile of {self.user.username}"
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Field values as loaded, so saves can tell what changed
+        instance._loaded_values = dict(zip(field_names, values))
+        return instance
+
+    def save(self, *args, **kwargs):
+        super().save(*args, **kwargs)
+        self._loaded_values = {field.attname: getattr(self, field.attname) for field in self._meta.concrete_fields}
+
+    def changed_fields(self, fields, update_fields=None):
+        """
+        Which of ``fields`` a save changed (or may have, when the profile
+        wasn't loaded from the database); for post_save receivers
+        """
+        if update_fields is not None:
+            return set(fields) & set(update_fields)
+        loaded = getattr(self, '_loaded_values', None)
+        if loaded is None:
+            return set(fields)
+        return {name for name in fields if name not in loaded or loaded[name] != getattr(self, name)}
+
+
+class Interest(models.Model):
+    """One profile's interest in another (the UserProfile.interests table)"""
+    from_profile = models.ForeignKey(
+        UserProfile,
+        on_delete=models.CASCADE,
+        related_name='interests_sent',
+        db_column='from_userprofile_id'
+    )
+    to_profile = models.ForeignKey(
+        UserProfile,
+        on_delete=models.CASCADE,
+        related_name='interests_received',
+        db_column='to_userprofile_id'
+    )
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        db_table = 'user_profile_userprofile_interests'
+        verbose_name = 'Interest'
+        verbose_name_plural = 'Interests'
+        unique_together = [('from_profile', 'to_profile')]
+        indexes = [
+            # "Interested in me", newest first
+            models.Index(
+                fields=['to_profile', '-created_at', '-from_profile'],
+                name='interest_received_idx',
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.from_profile_id} -> {self.to_profile_id}"
+
+
+class Match(models.Model):
+    """
+    Mutual interest between two profiles, stored once for each side so a
+    profile's matches are a single index range. Maintained by
+    user_profile.interests.
+    """
+    profile = models.ForeignKey(
+        UserProfile,
+        on_delete=models.CASCADE,
+        related_name='matches'
+    )
+    matched = models.ForeignKey(
+        UserProfile,
+        on_delete=models.CASCADE,
+        related_name='matched_with'
+    )
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        verbose_name = 'Match'
+        verbose_name_plural = 'Matches'
+        constraints = [
+            models.UniqueConstraint(fields=['profile', 'matched'], name='unique_match'),
+        ]
+        indexes = [
+            models.Index(fields=['profile', '-created_at', '-matched'], name='match_profile_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.profile_id} <-> {self.matched_id}"
+
+
+class Location(models.Model):
+    """
+    Distinct city/state/country values across profiles, used for location
+    autocomplete so suggestions never scan UserProfile.
+    """
+    KIND_CHOICES = [
+        ('city', 'City'),
+        ('state', 'State'),
+        ('country', 'Country'),
+    ]
+
+    kind = models.CharField(max_length=10, choices=KIND_CHOICES)
+    value = models.CharField(max_length=100)
+    profile_count = models.PositiveIntegerField(
+        default=0,
+        help_text="Profiles using this value, refreshed by refresh_locations"
+    )
+
+    class Meta:
+        verbose_name = 'Location'
+        verbose_name_plural = 'Locations'
+        constraints = [
+            models.UniqueConstraint(fields=['kind', 'value'], name='unique_location_value'),
+        ]
+        indexes = [
+            models.Index(fields=['kind', '-profile_count'], name='location_popular_idx'),
+            GinIndex(fields=['value'], opclasses=['gin_trgm_ops'], name='location_value_trgm_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.get_kind_display()}: {self.value}"
+
+
+class ProfileRecommendation(models.Model):
+    """
+    A viewer's top compatibility matches, precomputed by
+    user_profile.recommendations so the recommended feed is one indexed read.
+    """
+    viewer = models.ForeignKey(
+        UserProfile,
+        on_delete=models.CASCADE,
+        related_name='recommendations'
+    )
+    candidate = models.ForeignKey(
+        UserProfile,
+        on_delete=models.CASCADE,
+        related_name='recommended_to'
+    )
+    score = models.FloatField(help_text="Compatibility between 0 and 1")
+
+    class Meta:
+        verbose_name = 'Profile Recommendation'
+        verbose_name_plural = 'Profile Recommendations'
+        constraints = [
+            models.UniqueConstraint(fields=['viewer', 'candidate'], name='unique_recommendation'),
+        ]
+        indexes = [
+            models.Index(fields=['viewer', '-score'], name='recommendation_viewer_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.candidate_id} for {self.viewer_id} ({self.score:.2f})"
@@ -0,0 +1,182 @@
+"""
+Resized copies of profile photos.
+
+Uploads are stored as-is; process_photo() then makes a copy of each photo
+at every size in SIZES and in every format in FORMATS, with EXIF (camera
+details, GPS position) stripped, and records their keys in
+UserProfile.photo_variants. Keys derive from the profile and the original
+bytes, so reprocessing a photo overwrites the same files and a new photo
+gets new URLs that can be cached forever.
+"""
+import hashlib
+import io
+import logging
+import posixpath
+
+from PIL import Image, ImageOps, UnidentifiedImageError
+
+from .cache import invalidate_profile
+from .models import UserProfile
+
+logger = logging.getLogger(__name__)
+
+# Longest edge in pixels; photos are never enlarged
+SIZES = {
+    'thumb': 160,
+    'small': 320,
+    'medium': 640,
+    'large': 1280,
+}
+
+# Encoder options per format, best compression first. AVIF needs a Pillow
+# built with it; JPEG is the fallback every client decodes.
+ENCODERS = {
+    'avif': {'format': 'AVIF', 'quality': 60},
+    'webp': {'format': 'WEBP', 'quality': 80, 'method': 4},
+    'jpeg': {'format': 'JPEG', 'quality': 82, 'optimize': True, 'progressive': True},
+}
+
+Image.init()
+FORMATS = [name for name, options in ENCODERS.items() if options['format'] in Image.SAVE]
+
+VARIANTS_DIR = 'profile_photos/variants'
+
+
+def is_current(profile):
+    """Whether the profile's variants were made from its current photo"""
+    variants = profile.photo_variants
+    if not profile.photo:
+        return not variants
+    return bool(variants) and variants.get('source') == profile.photo.name
+
+
+def is_stored(profile):
+    """
+    Whether the photo is a file in storage rather than a link to an image
+    hosted elsewhere (as the sample profiles have), which is left alone
+    """
+    return bool(profile.photo) and '://' not in profile.photo.name
+
+
+def variant_key(profile_id, digest, size, fmt):
+    return posixpath.join(VARIANTS_DIR, str(profile_id), digest, f'{size}.{fmt}')
+
+
+def _rgb(image):
+    """Upright RGB copy, transparent areas on white"""
+    image = ImageOps.exif_transpose(image)
+    if image.mode in ('RGBA', 'LA', 'PA') or (image.mode == 'P' and 'transparency' in image.info):
+        rgba = image.convert('RGBA')
+        image = Image.new('RGB', rgba.size, 'white')
+        image.paste(rgba, mask=rgba.getchannel('A'))
+        return image
+    return image.convert('RGB')
+
+
+def render_variants(data):
+    """
+    Encode the image ``data`` at every size and format:
+    {size: (width, height, {format: bytes})}
+    """
+    image = Image.open(io.BytesIO(data))
+    # Let JPEGs decode at a reduced scale; much faster for camera photos
+    largest = max(SIZES.values())
+    image.draft('RGB', (largest, largest))
+    icc_profile = image.info.get('icc_profile')
+    image = _rgb(image)
+
+    rendered = {}
+    # Largest first, each size resized from the previous one
+    for size, edge in sorted(SIZES.items(), key=lambda item: -item[1]):
+        image.thumbnail((edge, edge), Image.LANCZOS)
+        files = {}
+        for fmt in FORMATS:
+            buffer = io.BytesIO()
+            # Pillow only writes EXIF when given it; keep the colour profile
+            image.save(buffer, icc_profile=icc_profile, **ENCODERS[fmt])
+            files[fmt] = buffer.getvalue()
+        rendered[size] = (image.width, image.height, files)
+    return rendered
+
+
+def forget_variants(profile):
+    """
+    Drop the variants of a photo that was replaced or removed, so they
+    aren't served for the new one. Returns their keys, to delete once the
+    new variants are made.
+    """
+    keys = keys_of(profile.photo_variants)
+    if profile.photo_variants:
+        UserProfile.objects.filter(pk=profile.pk).update(photo_variants=None)
+        profile.photo_variants = None
+    return keys
+
+
+def process_photo(profile_id, stale_keys=()):
+    """
+    Make and store the variants of a profile's current photo, then delete
+    ``stale_keys`` (see forget_variants). Returns False when there was
+    nothing to make.
+    """
+    storage = UserProfile._meta.get_field('photo').storage
+    profile = UserProfile.objects.only('photo', 'photo_variants').filter(pk=profile_id).first()
+    current = keys_of(profile.photo_variants) if profile is not None else set()
+    made = False
+
+    if profile is not None and is_stored(profile) and not is_current(profile):
+        try:
+            variants = make_variants(profile, storage)
+        except (UnidentifiedImageError, Image.DecompressionBombError):
+            # Not an image Pillow can read, or absurdly large; nothing to retry
+            logger.warning('Could not process photo of profile %s', profile_id, exc_info=True)
+            return False
+        # The photo may have been replaced while this one was processed;
+        # the replacement queues its own run
+        made = bool(
+            UserProfile.objects.filter(pk=profile_id, photo=variants['source']).update(photo_variants=variants)
+        )
+        if made:
+            invalidate_profile(profile_id)
+            stale_keys = set(stale_keys) | current
+            current = keys_of(variants)
+
+    # An identical photo uploaded again reuses the same keys
+    _delete(storage, set(stale_keys) - current)
+    return made
+
+
+def make_variants(profile, storage):
+    """Store every variant of the profile's photo; returns photo_variants"""
+    source = profile.photo.name
+    with profile.photo.open('rb') as photo:
+        data = photo.read()
+    digest = hashlib.sha256(data).hexdigest()[:16]
+
+    variants = {'source': source, 'sizes': {}}
+    for size, (width, height, files) in render_variants(data).items():
+        keys = {}
+        for fmt, content in files.items():
+            key = variant_key(profile.pk, digest, size, fmt)
+            if not storage.exists(key):
+                storage.save(key, io.BytesIO(content))
+            keys[fmt] = key
+        variants['sizes'][size] = {'width': width, 'height': height, 'files': keys}
+    return variants
+
+
+def keys_of(variants):
+    """Storage keys of every file in ``variants``"""
+    return {
+        key
+        for info in (variants or {}).get('sizes', {}).values()
+        for key in info['files'].values()
+    }
+
+
+def _delete(storage, keys):
+    for key in keys:
+        try:
+            storage.delete(key)
+        except Exception:
+            # An orphaned variant only costs storage
+            logger.warning('Could not delete photo variant %s', key, exc_info=True)
@@ -0,0 +1,335 @@
+"""
+Compatibility scoring for the recommended feed.
+
+Profiles are turned into NumPy feature columns once per run and scored in
+bulk: each block of viewers is compared against every candidate they may see
+in a handful of vectorised operations, and only the top
+RECOMMENDATIONS_PER_PROFILE candidates per viewer are stored in
+ProfileRecommendation. refresh_all() rebuilds everything; refresh_profile()
+updates the rows affected by one profile's change.
+
+refresh_all() also caches its matrix, with the codes and scaling it encoded
+the columns with, so refresh_profile() only reads the changed profile and
+scores it against the cached rows instead of loading every profile again.
+Other profiles' rows are as of the last refresh_all() or refresh_profile()
+that touched them.
+"""
+import numpy as np
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Count, Min, Window
+from django.db.models.functions import RowNumber
+
+from .models import ProfileRecommendation, UserProfile
+
+TOP_K = getattr(settings, 'RECOMMENDATIONS_PER_PROFILE', 100)
+
+MATRIX_CACHE_KEY = 'recommendations:matrix'
+# Rebuilt by the nightly refresh_all(); the margin covers a missed night
+MATRIX_CACHE_TIMEOUT = 2 * 24 * 60 * 60
+
+# Viewers re-ranked per transaction (and per IN list) by refresh_profile()
+VIEWER_CHUNK = 1000
+
+# Relative weight of each attribute in the overall score
+WEIGHTS = {
+    'height': 1.0,
+    'weight': 1.0,
+    'siblings': 0.5,
+    'family_type': 1.0,
+    'family_status': 1.5,
+    'location': 2.0,
+}
+
+# Score of a comparison where either side left the attribute blank
+UNKNOWN = 0.5
+
+# Matching on a broader location is worth less
+LOCATION_SCORES = {'city': 1.0, 'state': 0.6, 'country': 0.3}
+
+FAMILY_STATUS_LEVELS = {'middle_class': 0, 'upper_middle_class': 1, 'rich': 2}
+
+# Upper bound on viewer x candidate cells scored at once (float32)
+BLOCK_CELLS = 2 ** 24
+
+
+def _normalized(value):
+    return (value or '').strip().lower()
+
+
+def _vocabulary(values):
+    """Code per distinct non-blank value"""
+    return {value: code for code, value in enumerate(sorted({_normalized(value) for value in values} - {''}))}
+
+
+def _codes(values, vocabulary):
+    """Integer code per value, -1 for blanks; values new to ``vocabulary`` are added to it"""
+    codes = np.empty(len(values), dtype=np.int32)
+    for i, value in enumerate(values):
+        value = _normalized(value)
+        codes[i] = vocabulary.setdefault(value, len(vocabulary)) if value else -1
+    return codes
+
+
+def _scale(values):
+    """(mean, standard deviation) of a numeric column's non-blank values"""
+    column = np.array([value for value in values if value is not None], dtype=np.float32)
+    if not len(column):
+        return 0.0, 1.0
+    std = float(np.std(column))
+    return float(np.mean(column)), std if std > 0 else 1.0
+
+
+def _standardized(values, scale):
+    """Numeric column scaled to unit variance, NaN where blank"""
+    column = np.array([np.nan if value is None else float(value) for value in values], dtype=np.float32)
+    mean, std = scale
+    return (column - mean) / std
+
+
+class ProfileMatrix:
+    """
+    Feature columns of every profile, one row per profile. ``encoding``
+    holds the codes of text values and the scaling of numeric ones; rows
+    added later with update() are encoded the same way.
+    """
+
+    fields = [
+        'pk', 'gender', 'height', 'weight', 'siblings',
+        'family_type', 'family_status', 'city', 'state', 'country',
+    ]
+    numeric_fields = ('height', 'weight', 'siblings')
+    coded_fields = ('gender', 'family_type', *LOCATION_SCORES)
+
+    def __init__(self, rows, encoding=None):
+        columns = dict(zip(self.fields, zip(*rows))) if rows else {field: () for field in self.fields}
+        if encoding is None:
+            encoding = {
+                'vocabularies': {field: _vocabulary(columns[field]) for field in self.coded_fields},
+                'scales': {field: _scale(columns[field]) for field in self.numeric_fields},
+            }
+        self.encoding = encoding
+        coded = {field: _codes(columns[field], encoding['vocabularies'][field]) for field in self.coded_fields}
+
+        self.ids = np.array(columns['pk'], dtype=np.int64)
+        self.genders = coded['gender']
+        self.numeric = {
+            field: _standardized(columns[field], encoding['scales'][field]) for field in self.numeric_fields
+        }
+        self.family_type = coded['family_type']
+        self.family_status = np.array(
+            [FAMILY_STATUS_LEVELS.get(value, np.nan) for value in columns['family_status']],
+            dtype=np.float32,
+        )
+        self.locations = {kind: coded[kind] for kind in LOCATION_SCORES}
+        self.index = {pk: i for i, pk in enumerate(self.ids.tolist())}
+
+    @classmethod
+    def load(cls):
+        return cls(list(UserProfile.objects.order_by().values_list(*cls.fields)))
+
+    @classmethod
+    def cached(cls):
+        """The matrix last stored with store(), loading and storing it if there is none"""
+        matrix = cache.get(MATRIX_CACHE_KEY)
+        if matrix is None:
+            matrix = cls.load()
+            matrix.store()
+        return matrix
+
+    def store(self):
+        cache.set(MATRIX_CACHE_KEY, self, MATRIX_CACHE_TIMEOUT)
+
+    def update(self, rows):
+        """Replace or add the rows of these profiles (values_list rows of ``fields``)"""
+        changed = ProfileMatrix(rows, self.encoding)
+        existing = [self.index.get(pk) for pk in changed.ids.tolist()]
+        new = np.array([i for i, row in enumerate(existing) if row is None], dtype=np.int64)
+        old = np.array([i for i, row in enumerate(existing) if row is not None], dtype=np.int64)
+        targets = np.array([row for row in existing if row is not None], dtype=np.int64)
+
+        def merge(column, changed_column):
+            column[targets] = changed_column[old]
+            return np.concatenate([column, changed_column[new]])
+
+        self.ids = merge(self.ids, changed.ids)
+        self.genders = merge(self.genders, changed.genders)
+        self.numeric = {field: merge(column, changed.numeric[field]) for field, column in self.numeric.items()}
+        self.family_type = merge(self.family_type, changed.family_type)
+        self.family_status = merge(self.family_status, changed.family_status)
+        self.locations = {kind: merge(column, changed.locations[kind]) for kind, column in self.locations.items()}
+        self.index = {pk: i for i, pk in enumerate(self.ids.tolist())}
+
+    def __len__(self):
+        return len(self.ids)
+
+    def candidates_for(self, viewer):
+        """Row mask of the profiles a viewer row may be shown (see get_queryset)"""
+        if self.genders[viewer] == -1:
+            mask = np.ones(len(self), dtype=bool)
+        else:
+            mask = (self.genders != self.genders[viewer]) & (self.genders != -1)
+        mask[viewer] = False
+        return mask
+
+    def viewers_of(self, candidate):
+        """Row mask of the viewers a candidate row may be shown to"""
+        if self.genders[candidate] == -1:
+            mask = self.genders == -1
+        else:
+            mask = self.genders != self.genders[candidate]
+        mask[candidate] = False
+        return mask
+
+    def score(self, viewers, candidates):
+        """Compatibility of every viewer row with every candidate row, in [0, 1]"""
+        total = np.zeros((len(viewers), len(candidates)), dtype=np.float32)
+
+        for field, column in self.numeric.items():
+            # Closer is better; one standard deviation apart scores ~0.37
+            distance = np.abs(column[viewers][:, None] - column[candidates][None, :])
+            total += WEIGHTS[field] * np.nan_to_num(np.exp(-distance), nan=UNKNOWN)
+
+        total += WEIGHTS['family_type'] * self._match(self.family_type, viewers, candidates)
+
+        levels = np.abs(self.family_status[viewers][:, None] - self.family_status[candidates][None, :])
+        total += WEIGHTS['family_status'] * np.nan_to_num(1 - levels / 2, nan=UNKNOWN)
+
+        location = np.zeros_like(total)
+        for kind, value in LOCATION_SCORES.items():
+            same = self._match(self.locations[kind], viewers, candidates, unknown=0) == 1
+            location = np.where((location == 0) & same, value, location)
+        total += WEIGHTS['location'] * location
+
+        return total / sum(WEIGHTS.values())
+
+    @staticmethod
+    def _match(codes, viewers, candidates, unknown=UNKNOWN):
+        left, right = codes[viewers][:, None], codes[candidates][None, :]
+        known = (left != -1) & (right != -1)
+        return np.where(known, (left == right).astype(np.float32), np.float32(unknown))
+
+    def top_candidates(self, viewers, candidates, k=None):
+        """(candidate rows, scores) of each viewer's k best, best first"""
+        scores = self.score(viewers, candidates)
+        k = min(k or TOP_K, len(candidates))
+        if k == 0:
+            empty = np.empty((len(viewers), 0))
+            return empty.astype(np.int64), empty
+        best = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+        best_scores = np.take_along_axis(scores, best, axis=1)
+        order = np.argsort(-best_scores, axis=1, kind='stable')
+        return (
+            candidates[np.take_along_axis(best, order, axis=1)],
+            np.take_along_axis(best_scores, order, axis=1),
+        )
+
+
+def _store(matrix, viewers, top_rows, top_scores):
+    """Replace the stored recommendations of ``viewers``"""
+    viewer_ids = matrix.ids[viewers].tolist()
+    recommendations = [
+        ProfileRecommendation(viewer_id=viewer_id, candidate_id=candidate_id, score=score)
+        for viewer_id, rows, scores in zip(viewer_ids, top_rows, top_scores)
+        for candidate_id, score in zip(matrix.ids[rows].tolist(), scores.tolist())
+    ]
+    with transaction.atomic():
+        ProfileRecommendation.objects.filter(viewer_id__in=viewer_ids).delete()
+        ProfileRecommendation.objects.bulk_create(recommendations, batch_size=5000)
+
+
+def refresh_all(matrix=None):
+    """Recompute every profile's recommendations; returns the number of viewers"""
+    if matrix is None:
+        matrix = ProfileMatrix.load()
+    # For refresh_profile() from now on
+    matrix.store()
+    all_rows = np.arange(len(matrix))
+
+    # Viewers of one gender share their candidate set
+    for gender in np.unique(matrix.genders):
+        viewers = all_rows[matrix.genders == gender]
+        if gender == -1:
+            # No gender: everyone else is a candidate, so score one at a time
+            for viewer in viewers:
+                candidates = all_rows[matrix.candidates_for(viewer)]
+                _store(matrix, np.array([viewer]), *matrix.top_candidates(np.array([viewer]), candidates))
+            continue
+
+        candidates = all_rows[matrix.candidates_for(viewers[0])]
+        block = max(1, BLOCK_CELLS // max(1, len(candidates)))
+        for start in range(0, len(viewers), block):
+            chunk = viewers[start:start + block]
+            _store(matrix, chunk, *matrix.top_candidates(chunk, candidates))
+
+    return len(matrix)
+
+
+def refresh_profile(profile_id, matrix=None):
+    """
+    Update recommendations after one profile changed: its own list is
+    recomputed, and it is re-ranked in the lists of everyone who may see it,
+    VIEWER_CHUNK lists at a time. Lists it drops out of shrink by one until
+    the next refresh_all().
+    """
+    rows = list(UserProfile.objects.filter(pk=profile_id).values_list(*ProfileMatrix.fields))
+    if not rows:
+        # Deleted; its recommendations went with it
+        return
+    if matrix is None:
+        matrix = ProfileMatrix.cached()
+    matrix.update(rows)
+    # Concurrent refreshes may each store their own row only; the next
+    # refresh_all() brings any row that was lost back
+    matrix.store()
+    row = matrix.index[profile_id]
+
+    all_rows = np.arange(len(matrix))
+    candidates = all_rows[matrix.candidates_for(row)]
+    # Some candidates may have been deleted since the matrix was loaded
+    top_rows, top_scores = matrix.top_candidates(np.array([row]), candidates, k=2 * TOP_K)
+    existing = set(UserProfile.objects.filter(pk__in=matrix.ids[top_rows[0]].tolist()).values_list('pk', flat=True))
+    keep = np.array([pk in existing for pk in matrix.ids[top_rows[0]].tolist()], dtype=bool)
+    _store(matrix, np.array([row]), [top_rows[0][keep][:TOP_K]], [top_scores[0][keep][:TOP_K]])
+
+    viewers = all_rows[matrix.viewers_of(row)]
+    scores = matrix.score(viewers, np.array([row]))[:, 0]
+    viewer_ids = matrix.ids[viewers].tolist()
+
+    ProfileRecommendation.objects.filter(candidate_id=profile_id).delete()
+    for start in range(0, len(viewer_ids), VIEWER_CHUNK):
+        _rank_candidate(
+            profile_id, viewer_ids[start:start + VIEWER_CHUNK], scores[start:start + VIEWER_CHUNK].tolist()
+        )
+
+
+def _rank_candidate(profile_id, viewer_ids, scores):
+    """Add the candidate to those viewers' lists it makes the top TOP_K of"""
+    with transaction.atomic():
+        # Only lists that are not full yet or whose worst entry it beats; a
+        # viewer deleted since the matrix was loaded isn't returned
+        current = {
+            viewer_id: (worst, count)
+            for viewer_id, worst, count in UserProfile.objects.filter(pk__in=viewer_ids)
+            .order_by()
+            .annotate(worst=Min('recommendations__score'), count=Count('recommendations'))
+            .values_list('pk', 'worst', 'count')
+        }
+        entries = []
+        for viewer_id, score in zip(viewer_ids, scores):
+            if viewer_id not in current:
+                continue
+            worst, count = current[viewer_id]
+            if count < TOP_K or score > worst:
+                entries.append(ProfileRecommendation(viewer_id=viewer_id, candidate_id=profile_id, score=score))
+        ProfileRecommendation.objects.bulk_create(entries, batch_size=5000)
+
+        # Lists that were full now hold one too many
+        overflow = (
+            ProfileRecommendation.objects.filter(viewer_id__in=[entry.viewer_id for entry in entries])
+            .annotate(rank=Window(RowNumber(), partition_by='viewer_id', order_by='-score'))
+            .filter(rank__gt=TOP_K)
+            .values_list('pk', flat=True)
+        )
+        ProfileRecommendation.objects.filter(pk__in=list(overflow)).delete()
@@ -0,0 +1,87 @@
+import re
+
+from django.contrib.auth import get_user_model
+from django.contrib.postgres.search import SearchQuery, SearchRank
+from django.db import connections
+from django.db.models import F
+from rest_framework.filters import SearchFilter
+
+from .models import UserProfile
+
+User = get_user_model()
+
+# Text search configuration for both the stored vectors and the queries.
+# 'simple' skips stemming, which suits names and places and keeps prefix
+# matching predictable.
+SEARCH_CONFIG = 'simple'
+
+# The parser keeps an email as one lexeme, while queries are split into
+# words (see ProfileSearchFilter), so its local part and domain parts are
+# indexed as words too.
+
+SEARCH_VECTOR_SQL = """
+    UPDATE {profile_table} AS p
+    SET search_vector =
+        setweight(to_tsvector('{config}', coalesce(u.first_name, '') || ' ' || coalesce(u.last_name, '')), 'A') ||
+        setweight(to_tsvector('{config}', coalesce(u.email, '')), 'A') ||
+        setweight(to_tsvector('{config}', regexp_replace(coalesce(u.email, ''), '[@.]', ' ', 'g')), 'A') ||
+        setweight(to_tsvector('{config}', p.city || ' ' || p.state), 'B') ||
+        setweight(to_tsvector('{config}', p.bio), 'C')
+    FROM {user_table} AS u
+    WHERE u.id = p.user_id
+"""
+
+
+def refresh_search_vectors(user_ids=None, using='default'):
+    """
+    Recompute UserProfile.search_vector from the profile and its user.
+    Refreshes every profile when no user ids are given.
+    """
+    connection = connections[using]
+    if connection.vendor != 'postgresql':
+        return
+
+    sql = SEARCH_VECTOR_SQL.format(
+        profile_table=UserProfile._meta.db_table,
+        user_table=User._meta.db_table,
+        config=SEARCH_CONFIG,
+    )
+    params = []
+    if user_ids is not None:
+        user_ids = list(user_ids)
+        if not user_ids:
+            return
+        sql += ' AND p.user_id = ANY(%s)'
+        params.append(user_ids)
+
+    with connection.cursor() as cursor:
+        cursor.execute(sql, params)
+
+
+class ProfileSearchFilter(SearchFilter):
+    """
+    Full-text search over UserProfile.search_vector (GIN indexed).
+    Every term is prefix-matched and results are ranked with names and email
+    above location, and location above bio. Falls back to DRF's SearchFilter
+    on databases without full-text search.
+    """
+    word_re = re.compile(r'\w+')
+
+    def get_search_query(self, terms):
+        words = [word for term in terms for word in self.word_re.findall(term)]
+        if not words:
+            return None
+        raw = ' & '.join(f'{word}:*' for word in words)
+        return SearchQuery(raw, search_type='raw', config=SEARCH_CONFIG)
+
+    def filter_queryset(self, request, queryset, view):
+        if connections[queryset.db].vendor != 'postgresql':
+            return super().filter_queryset(request, queryset, view)
+
+        query = self.get_search_query(self.get_search_terms(request))
+        if query is None:
+            return queryset
+
+        return queryset.filter(search_vector=query).annotate(
+            search_rank=SearchRank(F('search_vector'), query)
+        ).order_by('-search_rank', *queryset.query.order_by)
@@ -1,21 +1,202 @@
+from operator import attrgetter
+
 from rest_framework import serializers
-from .models import UserProfile
+from rest_framework.fields import SkipField
+from rest_framework.relations import PKOnlyObject
+from .models import Location, UserProfile
 from django.contrib.auth import get_user_model
+from django.core.exceptions import FieldDoesNotExist
+from django.db.models import Prefetch
+from matrimony.instrumentation import TimedListSerializer, TimedSerializerMixin
 
 User = get_user_model()
 
 
-class UserProfileSerializer(serializers.ModelSerializer):
+class EagerLoadingMixin:
+    """
+    Builds select_related/prefetch_related calls from the serializer's declared
+    field sources, so a page of rows is loaded in a constant number of queries.
+    """
+
+    def setup_eager_loading(self, queryset, required_fields=()):
+        """
+        ``required_fields`` are loaded even if not rendered, e.g. pagination
+        keys; they only matter when the serializer renders a subset of fields.
+        """
+        model = self.Meta.model
+        select_related = set()
+        prefetch_related = []
+        loaded = set(required_fields)
+
+        for field in self.fields.values():
+            if isinstance(field, serializers.ManyRelatedField):
+                # Only primary keys are rendered for to-many relations
+                related_model = model._meta.get_field(field.source).related_model
+                prefetch_related.append(
+                    Prefetch(field.source, queryset=related_model.objects.only('pk'))
+                )
+                continue
+            if len(field.source_attrs) > 1:
+                select_related.add('__'.join(field.source_attrs[:-1]))
+            loaded.add('__'.join(field.source_attrs))
+
+        if select_related:
+            queryset = queryset.select_related(*sorted(select_related))
+        if prefetch_related:
+            queryset = queryset.prefetch_related(*prefetch_related)
+        if getattr(self, 'sparse', False):
+            # Don't fetch the columns of fields that were left out
+            queryset = queryset.only(*sorted(loaded))
+        return queryset
+
+
+class SparseFieldsMixin:
+    """
+    Renders only some fields when given ``fields`` (names to keep) and/or
+    ``exclude`` (names to drop). ``representations`` names commonly used
+    field sets.
+    """
+    representations = {}
+
+    def __init__(self, *args, fields=None, exclude=None, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.sparse = fields is not None or bool(exclude)
+        if fields is not None:
+            for name in set(self.fields) - set(fields):
+                self.fields.pop(name)
+        for name in exclude or ():
+            self.fields.pop(name, None)
+
+
+class CompiledRepresentationMixin:
+    """
+    Renders instances through a plan compiled once per serializer instead of
+    DRF's generic get_attribute/to_representation dispatch for every field of
+    every row. Model fields and primary-key relations are read directly;
+    anything else falls back to the field's own methods, so the output is
+    the same as ModelSerializer's.
+    """
+    # Field classes whose to_representation is just this conversion
+    simple_conversions = {
+        serializers.CharField: str,
+        serializers.EmailField: str,
+        serializers.IntegerField: int,
+    }
+
+    def to_representation(self, instance):
+        plan = self.__dict__.get('_representation_plan')
+        if plan is None:
+            plan = self._representation_plan = self.compile_representation()
+
+        ret = {}
+        for name, get, convert in plan:
+            try:
+                value = get(instance)
+            except SkipField:
+                continue
+            ret[name] = value if value is None or convert is None else convert(value)
+        return ret
+
+    def compile_representation(self):
+        """(field name, getter, converter) per readable field"""
+        return [
+            (field.field_name, *self._compile_field(field))
+            for field in self._readable_fields
+        ]
+
+    def _compile_field(self, field):
+        model = self.Meta.model
+        if isinstance(field, serializers.ManyRelatedField):
+            child = field.child_relation
+            if (type(child) is serializers.PrimaryKeyRelatedField and child.pk_field is None
+                    and len(field.source_attrs) == 1):
+                source = field.source_attrs[0]
+
+                def get_pks(instance):
+                    if instance.pk is None:
+                        return []
+                    return [related.pk for related in getattr(instance, source).all()]
+                return get_pks, None
+        elif type(field) is serializers.PrimaryKeyRelatedField and field.pk_field is None:
+            model_field = self._model_field(model, field.source_attrs)
+            if model_field is not None and model_field.is_relation and model_field.concrete:
+                # Read the foreign key column instead of the related object
+                path = field.source_attrs[:-1] + [model_field.attname]
+                return attrgetter('.'.join(path)), None
+        elif not isinstance(field, serializers.RelatedField):
+            model_field = self._model_field(model, field.source_attrs)
+            if model_field is not None and model_field.concrete and not model_field.is_relation:
+                convert = self.simple_conversions.get(type(field), field.to_representation)
+                return attrgetter('.'.join(field.source_attrs)), convert
+
+        def get(instance):
+            attribute = field.get_attribute(instance)
+            if isinstance(attribute, PKOnlyObject) and attribute.pk is None:
+                return None
+            return attribute
+        return get, field.to_representation
+
+    @staticmethod
+    def _model_field(model, source_attrs):
+        """
+        The model field ``source_attrs`` ends on, if every step before it is
+        a required forward relation (so can't be None); otherwise None.
+        """
+        field = None
+        for name in source_attrs:
+            if field is not None:
+                if not (field.many_to_one or field.one_to_one) or field.null or field.auto_created:
+                    return None
+                model = field.related_model
+            try:
+                field = model._meta.get_field(name)
+            except FieldDoesNotExist:
+                return None
+            if field.many_to_many or field.one_to_many:
+                return None
+        return field
+
+
+class PhotoVariantsField(serializers.Field):
+    """
+    URLs of the resized copies of the profile photo (see user_profile.photos)
+    by size and format, with each size's dimensions
+    """
+
+    def __init__(self, **kwargs):
+        kwargs['read_only'] = True
+        super().__init__(**kwargs)
+
+    def to_representation(self, value):
+        storage = UserProfile._meta.get_field('photo').storage
+        request = self.context.get('request')
+        ret = {}
+        for size, info in value.get('sizes', {}).items():
+            ret[size] = {'width': info['width'], 'height': info['height']}
+            for fmt, key in info['files'].items():
+                url = storage.url(key)
+                ret[size][fmt] = request.build_absolute_uri(url) if request is not None else url
+        return ret
+
+
+class UserProfileSerializer(TimedSerializerMixin, SparseFieldsMixin, EagerLoadingMixin, serializers.ModelSerializer):
     """Serializer for UserProfile model"""
     
+    representations = {
+        # What a feed card shows
+        'card': ['user', 'first_name', 'last_name', 'photo', 'photo_variants', 'gender', 'city'],
+    }
+    
     # Read-only fields from User model
     username = serializers.CharField(source='user.username', read_only=True)
     email = serializers.EmailField(source='user.email', read_only=True)
     first_name = serializers.CharField(source='user.first_name', read_only=True)
     last_name = serializers.CharField(source='user.last_name', read_only=True)
+    photo_variants = PhotoVariantsField()
     
     class Meta:
         model = UserProfile
+        list_serializer_class = TimedListSerializer
         fields = [
             'user',
             'username',
@@ -23,6 +204,7 @@ class UserProfileSerializer(serializers.ModelSerializer):
             'first_name',
             'last_name',
             'photo',
+            'photo_variants',
             'gender',
             'phone_number',
             'height',
@@ -40,10 +222,24 @@ class UserProfileSerializer(serializers.ModelSerializer):
             'family_status',
             'bio',
             'interests',
+            'interests_sent_count',
+            'interests_received_count',
+            'mutual_matches_count',
             'created_at',
             'updated_at',
         ]
-        read_only_fields = ['user', 'created_at', 'updated_at']
+        read_only_fields = [
+            'user',
+            'interests_sent_count',
+            'interests_received_count',
+            'mutual_matches_count',
+            'created_at',
+            'updated_at',
+        ]
+
+
+class UserProfileReadSerializer(CompiledRepresentationMixin, UserProfileSerializer):
+    """UserProfileSerializer with compiled rendering, for read-only endpoints"""
 
 
 class UserProfileCreateUpdateSerializer(serializers.ModelSerializer):
@@ -70,3 +266,11 @@ class UserProfileCreateUpdateSerializer(serializers.ModelSerializer):
             'family_status',
             'bio',
         ]
+
+
+class LocationSerializer(serializers.ModelSerializer):
+    """Serializer for location autocomplete suggestions"""
+
+    class Meta:
+        model = Location
+        fields = ['kind', 'value', 'profile_count']
@@ -0,0 +1,117 @@
+from django.contrib.auth import get_user_model
+from django.db import transaction
+from django.db.models.signals import m2m_changed, post_delete, post_save, pre_delete
+from django.dispatch import receiver
+
+from matrimony.celery import enqueue_on_commit
+
+from .cache import invalidate_profile
+from .interests import release_interests
+from .locations import LOCATION_KINDS, record_locations
+from .photos import forget_variants, is_current, is_stored
+from .models import UserProfile
+from .search import refresh_search_vectors
+from .tasks import process_profile_photo, queue_profile_recommendations
+
+User = get_user_model()
+
+PROFILE_SEARCH_FIELDS = {'city', 'state', 'bio'}
+USER_SEARCH_FIELDS = {'first_name', 'last_name', 'email'}
+USER_PROFILE_FIELDS = USER_SEARCH_FIELDS | {'username'}
+# Fields the feed filters, searches or orders on: changing one can move a
+# profile in or out of feed pages, or within them
+FEED_FIELDS = {
+    'gender', 'city', 'state', 'country', 'family_type', 'family_status', 'height', 'weight', 'siblings', 'bio',
+}
+RECOMMENDATION_FIELDS = {
+    'gender', 'height', 'weight', 'siblings', 'family_type', 'family_status', 'city', 'state', 'country',
+}
+
+
+@receiver(post_save, sender=UserProfile)
+def update_profile_search_vector(sender, instance, raw=False, update_fields=None, **kwargs):
+    """Keep the profile's search document in sync with its text fields"""
+    if raw or (update_fields and not PROFILE_SEARCH_FIELDS & set(update_fields)):
+        return
+    refresh_search_vectors([instance.pk])
+
+
+@receiver(post_save, sender=UserProfile)
+def update_profile_locations(sender, instance, raw=False, update_fields=None, **kwargs):
+    """New location values become autocomplete suggestions straight away"""
+    if raw or (update_fields and not set(LOCATION_KINDS) & set(update_fields)):
+        return
+    record_locations(instance)
+
+
+@receiver(post_save, sender=User)
+def update_user_search_vector(sender, instance, raw=False, update_fields=None, **kwargs):
+    """Names and email are searchable too, and live on the User"""
+    if raw or (update_fields and not USER_SEARCH_FIELDS & set(update_fields)):
+        return
+    refresh_search_vectors([instance.pk])
+
+
+@receiver(post_save, sender=UserProfile)
+def update_profile_recommendations(sender, instance, raw=False, update_fields=None, **kwargs):
+    """Re-rank the profile in the background once its attributes are saved"""
+    if raw or (update_fields and not RECOMMENDATION_FIELDS & set(update_fields)):
+        return
+
+    # If it can't be queued, the nightly full refresh catches up
+    profile_id = instance.pk
+    transaction.on_commit(lambda: queue_profile_recommendations(profile_id))
+
+
+@receiver(post_save, sender=UserProfile)
+def resize_profile_photo(sender, instance, raw=False, update_fields=None, **kwargs):
+    """Make the resized copies of a new photo in the background"""
+    if raw or (update_fields and 'photo' not in update_fields) or is_current(instance):
+        return
+    stale_keys = sorted(forget_variants(instance))
+    if not stale_keys and not is_stored(instance):
+        return
+
+    # If it can't be queued, process_profile_photos catches up; the
+    # original is served until then
+    enqueue_on_commit(process_profile_photo.si(instance.pk, stale_keys))
+
+
+@receiver(pre_delete, sender=UserProfile)
+def release_profile_interests(sender, instance, **kwargs):
+    """Its interests and matches cascade away; the counters elsewhere don't"""
+    release_interests(instance)
+
+
+# Cached profile responses: profile saves cover update_me, register and the
+# viewset's create/update; toggle_interest invalidates in user_profile.interests
+
+
+@receiver(post_save, sender=UserProfile)
+def invalidate_cached_profile(sender, instance, created=False, raw=False, update_fields=None, **kwargs):
+    if raw:
+        return
+    feed = created or bool(instance.changed_fields(FEED_FIELDS, update_fields))
+    invalidate_profile(instance.pk, feed=feed)
+
+
+@receiver(post_delete, sender=UserProfile)
+def invalidate_deleted_profile(sender, instance, **kwargs):
+    invalidate_profile(instance.pk, feed=True)
+
+
+@receiver(m2m_changed, sender=UserProfile.interests.through)
+def invalidate_cached_interests(sender, instance, action, reverse, pk_set, **kwargs):
+    """The profile whose interests changed renders them"""
+    if action not in ('post_add', 'post_remove', 'post_clear'):
+        return
+    for pk in (pk_set or ()) if reverse else [instance.pk]:
+        invalidate_profile(pk)
+
+
+@receiver(post_save, sender=User)
+def invalidate_cached_user_profile(sender, instance, created=False, raw=False, update_fields=None, **kwargs):
+    """Profiles render their user's name, username and email; the feed searches all but the username"""
+    if raw or created or (update_fields and not USER_PROFILE_FIELDS & set(update_fields)):
+        return
+    invalidate_profile(instance.pk, feed=not update_fields or bool(USER_SEARCH_FIELDS & set(update_fields)))
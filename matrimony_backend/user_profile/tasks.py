@@ -0,0 +1,51 @@
+from botocore.exceptions import BotoCoreError, ClientError
+from celery import shared_task
+from django.conf import settings
+from django.core.cache import cache
+from django.db import DatabaseError
+
+from matrimony.celery import IDEMPOTENT_TASK, enqueue_on_commit
+
+from . import photos, recommendations
+
+# Seconds a profile's re-ranking waits after an edit, so that a burst of
+# edits (e.g. filling in a profile field by field) is re-ranked once
+RECOMMENDATIONS_REFRESH_DELAY = getattr(settings, 'RECOMMENDATIONS_REFRESH_DELAY', 30)
+
+
+def _pending_key(profile_id):
+    return f'recommendations:pending:{profile_id}'
+
+
+def queue_profile_recommendations(profile_id):
+    """
+    Queue refresh_profile_recommendations for a committed edit, unless one
+    is already waiting to run for the profile: that one reads the profile
+    when it starts, so it covers this edit too.
+    """
+    # Expires in case the task was lost; the nightly refresh catches up
+    if cache.add(_pending_key(profile_id), True, RECOMMENDATIONS_REFRESH_DELAY + 600):
+        enqueue_on_commit(
+            refresh_profile_recommendations.si(profile_id).set(countdown=RECOMMENDATIONS_REFRESH_DELAY)
+        )
+
+
+@shared_task(ignore_result=True, autoretry_for=(DatabaseError,), **IDEMPOTENT_TASK)
+def refresh_profile_recommendations(profile_id):
+    """Re-rank one changed profile, for itself and everyone who may see it"""
+    # Edits from now on queue another run
+    cache.delete(_pending_key(profile_id))
+    recommendations.refresh_profile(profile_id)
+
+
+@shared_task(ignore_result=True)
+def refresh_all_recommendations():
+    """Rebuild every profile's recommendations from scratch"""
+    recommendations.refresh_all()
+
+
+# Storage hiccups; photos Pillow can't read are skipped in process_photo
+@shared_task(ignore_result=True, autoretry_for=(OSError, BotoCoreError, ClientError, DatabaseError), **IDEMPOTENT_TASK)
+def process_profile_photo(profile_id, stale_keys=()):
+    """Make the resized copies of a profile's current photo"""
+    photos.process_photo(profile_id, stale_keys)
@@ -0,0 +1,30 @@
+from itertools import count
+
+from django.contrib.auth import get_user_model
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+
+from user_profile.models import UserProfile
+
+User = get_user_model()
+
+_numbers = count(1)
+
+
+def make_profile(gender='Female', **fields):
+    """A user with a profile; the username, email and phone number are unique"""
+    n = next(_numbers)
+    user = User.objects.create_user(
+        username=f'test_user_{n}', email=f'test_user_{n}@example.com', password='password123',
+        first_name='Test', last_name=f'User {n}',
+    )
+    fields.setdefault('phone_number', f'+9190000{n:05d}')
+    return UserProfile.objects.create(user=user, gender=gender, **fields)
+
+
+def client_for(profile):
+    """An API client authenticated as the profile's user"""
+    token, _ = Token.objects.get_or_create(user=profile.user)
+    client = APIClient()
+    client.credentials(HTTP_AUTHORIZATION=f'Token {token.key}')
+    return client
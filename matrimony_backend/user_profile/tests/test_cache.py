@@ -0,0 +1,85 @@
+from unittest import mock
+
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from user_profile.models import UserProfile
+
+from .factories import client_for, make_profile
+
+LOCAL_CACHE = {'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'profile-cache-tests'}}
+
+
+@override_settings(CACHES=LOCAL_CACHE)
+class FeedPageCacheTests(TestCase):
+    """A cached feed page is retired by changes to the profiles it shows, not by any write"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.viewer = make_profile('Male')
+        # Newest first: a page of two shows c and b
+        cls.a, cls.b, cls.c = (make_profile('Female', city='Testville') for _ in range(3))
+
+    def setUp(self):
+        cache.clear()
+        self.client = client_for(self.viewer)
+
+    def page(self, etag=None):
+        headers = {'HTTP_IF_NONE_MATCH': etag} if etag else {}
+        return self.client.get(reverse('userprofile-list'), {'city': 'Testville', 'page_size': 2}, **headers)
+
+    def test_page_is_revalidated(self):
+        first = self.page()
+        self.assertEqual([row['user'] for row in first.data['results']], [self.c.pk, self.b.pk])
+        self.assertEqual(self.page(first['ETag']).status_code, 304)
+
+    def test_change_to_another_profile_keeps_page(self):
+        etag = self.page()['ETag']
+        with self.captureOnCommitCallbacks(execute=True):
+            self.a.interests.add(self.viewer)
+        self.assertEqual(self.page(etag).status_code, 304)
+
+    def test_change_to_a_shown_profile_retires_page(self):
+        etag = self.page()['ETag']
+        with self.captureOnCommitCallbacks(execute=True):
+            self.c.interests.add(self.viewer)
+        response = self.page(etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+        self.assertEqual(response.data['results'][0]['interests'], [self.viewer.pk])
+
+
+class FeedInvalidationTests(TestCase):
+    """Which saves retire every feed page: those that can change which profiles it lists"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.profile = make_profile('Female', city='Testville')
+
+    def assertInvalidates(self, save, feed):
+        with mock.patch('user_profile.signals.invalidate_profile') as invalidate:
+            save()
+        invalidate.assert_called_once_with(self.profile.pk, feed=feed)
+
+    def test_profile_saves(self):
+        profile = UserProfile.objects.get(pk=self.profile.pk)
+        profile.photo_variants = {'webp': {}}
+        self.assertInvalidates(profile.save, feed=False)
+        profile.city = 'Elsewhere'
+        self.assertInvalidates(profile.save, feed=True)
+        # Compared with the values saved last
+        self.assertInvalidates(profile.save, feed=False)
+        self.assertInvalidates(lambda: profile.save(update_fields=['mutual_matches_count']), feed=False)
+        self.assertInvalidates(lambda: profile.save(update_fields=['height']), feed=True)
+
+    def test_user_saves(self):
+        user = self.profile.user
+        self.assertInvalidates(lambda: user.save(update_fields=['username']), feed=False)
+        self.assertInvalidates(lambda: user.save(update_fields=['last_name']), feed=True)
+
+    def test_delete(self):
+        pk = self.profile.pk
+        with mock.patch('user_profile.signals.invalidate_profile') as invalidate:
+            self.profile.delete()
+        invalidate.assert_any_call(pk, feed=True)
@@ -0,0 +1,59 @@
+import threading
+
+from django.db import connection
+from django.test import TransactionTestCase, override_settings
+from django.urls import reverse
+
+from user_profile.models import Interest, UserProfile
+
+from .factories import client_for, make_profile
+
+LOCAL_CACHE = {'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'interest-tests'}}
+
+
+@override_settings(CACHES=LOCAL_CACHE)
+class ConcurrentBulkToggleTests(TransactionTestCase):
+    """Bulk toggles committed concurrently, over the same profiles in other orders"""
+
+    rounds = 5
+
+    def setUp(self):
+        self.x, self.y, self.z = (make_profile(gender) for gender in ('Male', 'Female', 'Male'))
+
+    def toggle_concurrently(self, batches):
+        barrier = threading.Barrier(len(batches))
+        responses = {}
+
+        def run(profile, targets):
+            client = client_for(profile)
+            try:
+                barrier.wait()
+                responses[profile.pk] = client.post(
+                    reverse('userprofile-toggle-interests'), {'profile_ids': targets}, format='json'
+                )
+            finally:
+                connection.close()
+
+        threads = [threading.Thread(target=run, args=batch) for batch in batches]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        return responses
+
+    def test_overlapping_batches(self):
+        x, y, z = self.x, self.y, self.z
+        batches = [(x, [y.pk, z.pk]), (z, [y.pk, x.pk]), (y, [z.pk, x.pk])]
+        for round_number in range(self.rounds):
+            responses = self.toggle_concurrently(batches)
+            for response in responses.values():
+                self.assertEqual(response.status_code, 200)
+                self.assertEqual([result['status'] for result in response.data['results']], [200, 200])
+
+            # Every toggle applied: each round adds or removes all six interests
+            expected = 6 if round_number % 2 == 0 else 0
+            self.assertEqual(Interest.objects.count(), expected)
+            for profile in UserProfile.objects.filter(pk__in=[x.pk, y.pk, z.pk]):
+                self.assertEqual(profile.interests_sent_count, expected // 3)
+                self.assertEqual(profile.interests_received_count, expected // 3)
+                self.assertEqual(profile.mutual_matches_count, expected // 3)
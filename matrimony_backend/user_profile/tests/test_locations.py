@@ -0,0 +1,36 @@
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from user_profile.models import Location
+
+from .factories import client_for, make_profile
+
+NO_CACHE = {'default': {'BACKEND': 'django.core.cache.backends.dummy.DummyCache'}}
+
+
+@override_settings(CACHES=NO_CACHE)
+class LocationSuggestionTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.viewer = make_profile('Male')
+        Location.objects.bulk_create(
+            Location(kind='city', value=f'Test City {n}', profile_count=n) for n in range(60)
+        )
+
+    def setUp(self):
+        self.client = client_for(self.viewer)
+
+    def get(self, **params):
+        return self.client.get(reverse('userprofile-locations'), params)
+
+    def test_limit_is_clamped(self):
+        for limit, expected in (('-1', 1), ('0', 1), ('3', 3), ('500', 50)):
+            with self.subTest(limit=limit):
+                response = self.get(limit=limit)
+                self.assertEqual(response.status_code, 200)
+                self.assertEqual(len(response.data['results']), expected)
+
+    def test_non_numeric_limit_is_rejected(self):
+        response = self.get(limit='abc')
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.data['detail'], 'limit must be a number')
@@ -0,0 +1,145 @@
+import base64
+import json
+from unittest import mock
+
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from matrimony import pagination
+from user_profile.models import Match
+
+from .factories import client_for, make_profile
+
+NO_CACHE = {'default': {'BACKEND': 'django.core.cache.backends.dummy.DummyCache'}}
+
+
+def encode(position):
+    return base64.urlsafe_b64encode(json.dumps(position).encode()).decode().rstrip('=')
+
+
+@override_settings(CACHES=NO_CACHE)
+class KeysetPaginationTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.viewer = make_profile('Male')
+        for _ in range(3):
+            make_profile('Female')
+
+    def setUp(self):
+        self.client = client_for(self.viewer)
+
+    def get(self, **params):
+        return self.client.get(reverse('userprofile-list'), params)
+
+    def test_next_cursor_continues_the_feed(self):
+        first = self.get(pagination='cursor', page_size=2)
+        self.assertEqual(first.status_code, 200)
+        second = self.get(cursor=first.data['next_cursor'], page_size=2)
+        self.assertEqual(second.status_code, 200)
+        seen = [profile['user'] for profile in first.data['results']]
+        self.assertFalse(set(seen) & {profile['user'] for profile in second.data['results']})
+
+    def test_next_link_continues_matches(self):
+        # Ordered by an annotation (matched_at) rather than a model field
+        for other in make_profile('Female'), make_profile('Female'), make_profile('Female'):
+            Match.objects.create(profile=self.viewer, matched=other)
+        first = self.client.get(reverse('userprofile-matches'), {'page_size': 2})
+        self.assertEqual(first.status_code, 200)
+        second = self.client.get(first.data['next'])
+        self.assertEqual(second.status_code, 200)
+        self.assertEqual(len(second.data['results']), 1)
+        self.assertIsNone(second.data['next'])
+        seen = {profile['user'] for profile in first.data['results'] + second.data['results']}
+        self.assertEqual(seen, set(Match.objects.filter(profile=self.viewer).values_list('matched', flat=True)))
+
+    def test_malformed_cursor_is_not_found(self):
+        cursors = {
+            'not base64 json': 'not-a-cursor',
+            'not a list': encode({'created_at': '2020-01-01T00:00:00+00:00'}),
+            'too short': encode(['2020-01-01T00:00:00+00:00']),
+            'bad datetime': encode(['yesterday', 1]),
+            'bad id': encode(['2020-01-01T00:00:00+00:00', 'x']),
+            'null key': encode(['2020-01-01T00:00:00+00:00', None]),
+            'nested key': encode(['2020-01-01T00:00:00+00:00', [1]]),
+        }
+        for name, cursor in cursors.items():
+            with self.subTest(name):
+                response = self.get(cursor=cursor)
+                self.assertEqual(response.status_code, 404)
+                self.assertEqual(response.data['detail'], 'Invalid cursor')
+
+
+@override_settings(CACHES=NO_CACHE)
+class CountStrategyTests(TestCase):
+    """Which count strategy each list uses, and how its counts are answered"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.viewer = make_profile('Male')
+        cls.others = [make_profile('Female') for _ in range(3)]
+        cls.viewer.interests.add(cls.others[0])
+
+    def setUp(self):
+        self.client = client_for(self.viewer)
+        pagination.count_metrics.clear()
+
+    def get(self, route, **params):
+        response = self.client.get(reverse(route), params)
+        self.assertEqual(response.status_code, 200)
+        return response
+
+    def feed_size(self):
+        return len(self.get('userprofile-list', page_size=100).data['results'])
+
+    def test_filtered_feed_is_estimated_when_large(self):
+        # The feed is always filtered (other gender, not the viewer); the
+        # planner's estimate of it is used once it passes the threshold
+        with mock.patch.object(pagination, 'ESTIMATE_THRESHOLD', 1):
+            response = self.get('userprofile-list', page_size=1)
+        self.assertEqual(dict(pagination.count_metrics), {('estimate', 'estimate'): 1})
+        self.assertTrue(response.data['count_is_estimate'])
+        self.assertTrue(response.data['has_more'])
+        self.assertGreaterEqual(response.data['count'], 2)
+
+    def test_empty_feed_is_not_estimated(self):
+        with mock.patch.object(pagination, 'ESTIMATE_THRESHOLD', 1):
+            response = self.get('userprofile-list', city='Nowhere')
+        self.assertEqual(response.data['results'], [])
+        self.assertEqual(response.data['count'], 0)
+        self.assertFalse(response.data['count_is_estimate'])
+        self.assertFalse(response.data['has_more'])
+        self.assertIsNone(response.data['next'])
+
+    def test_pages_past_an_underestimate_exist(self):
+        with mock.patch.object(pagination.CountStrategyPaginator, 'get_estimated_count', return_value=1):
+            response = self.get('userprofile-list', page_size=1, page=3)
+        self.assertEqual(len(response.data['results']), 1)
+        self.assertGreaterEqual(response.data['count'], 3)
+        self.assertGreaterEqual(response.data['total_pages'], 3)
+
+    def test_overestimate_ends_at_the_last_row(self):
+        size = self.feed_size()
+        pagination.count_metrics.clear()
+        with mock.patch.object(pagination.CountStrategyPaginator, 'get_estimated_count', return_value=1000):
+            response = self.get('userprofile-list', page_size=size - 1, page=2)
+        self.assertEqual(len(response.data['results']), 1)
+        self.assertFalse(response.data['has_more'])
+        self.assertIsNone(response.data['next'])
+        # The last page's rows tell the count; nothing was estimated
+        self.assertEqual(response.data['count'], size)
+        self.assertFalse(response.data['count_is_estimate'])
+        self.assertEqual(dict(pagination.count_metrics), {('estimate', 'skipped'): 1})
+
+    def test_small_feed_is_counted_exactly(self):
+        size = self.feed_size()
+        pagination.count_metrics.clear()
+        response = self.get('userprofile-list', page_size=1)
+        self.assertEqual(dict(pagination.count_metrics), {('estimate', 'exact'): 1})
+        self.assertEqual(response.data['count'], size)
+        self.assertFalse(response.data['count_is_estimate'])
+
+    def test_own_interests_are_counted_exactly(self):
+        with mock.patch.object(pagination, 'ESTIMATE_THRESHOLD', 1):
+            response = self.get('userprofile-my-interests')
+        self.assertEqual(dict(pagination.count_metrics), {('exact', 'exact'): 1})
+        self.assertEqual(response.data['count'], 1)
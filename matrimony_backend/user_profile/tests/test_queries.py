@@ -0,0 +1,91 @@
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from authentication.cache import clear_local_cache
+from user_profile.models import Match, ProfileRecommendation
+
+from .factories import client_for, make_profile
+
+NO_CACHE = {'default': {'BACKEND': 'django.core.cache.backends.dummy.DummyCache'}}
+
+
+@override_settings(CACHES=NO_CACHE)
+class ProfileQueryCountTests(TestCase):
+    """
+    The profile endpoints run a fixed number of queries however many rows
+    they serialize. Each is counted with the viewer's token uncached, when
+    token, user and profile are loaded in one query, and then cached, when
+    only the profile is (and only where the action uses it). A count above
+    its budget means a lookup crept back in.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.viewer = make_profile('Male')
+        cls.others = [make_profile('Female') for _ in range(6)]
+        for other in cls.others[:3]:
+            cls.viewer.interests.add(other)
+        cls.others[3].interests.add(cls.viewer)
+        Match.objects.create(profile=cls.viewer, matched=cls.others[0])
+        ProfileRecommendation.objects.create(viewer=cls.viewer, candidate=cls.others[4], score=0.9)
+
+    def setUp(self):
+        clear_local_cache()
+        self.client = client_for(self.viewer)
+
+    def request(self, method, route, uncached, cached, data=None, **kwargs):
+        """Make the request twice, token uncached then cached, each within its budget"""
+        path = reverse(route, kwargs=kwargs)
+        for token_cached, queries in ((False, uncached), (True, cached)):
+            with self.subTest(token_cached=token_cached), self.assertNumQueries(queries):
+                if method == 'get':
+                    response = self.client.get(path, data)
+                else:
+                    response = getattr(self.client, method)(path, data, format='json')
+            self.assertEqual(response.status_code, 200, getattr(response, 'data', None))
+        clear_local_cache()
+        return response
+
+    def test_list_is_constant_in_page_size(self):
+        # Viewer, count estimate (EXPLAIN), count, page, interests; the count
+        # is cached outside tests
+        for page_size in (1, 2, 5):
+            with self.subTest(page_size=page_size):
+                response = self.request('get', 'userprofile-list', 5, 5, data={'page_size': page_size})
+                self.assertEqual(len(response.data['results']), page_size)
+
+    def test_retrieve(self):
+        # Viewer, profile, interests
+        self.request('get', 'userprofile-detail', 3, 3, pk=self.others[0].pk)
+
+    def test_me(self):
+        # Viewer with profile, interests
+        response = self.request('get', 'userprofile-me', 2, 2)
+        self.assertEqual(len(response.data['interests']), 3)
+
+    def test_my_interests(self):
+        # Viewer, count, page, interests
+        response = self.request('get', 'userprofile-my-interests', 4, 4)
+        self.assertEqual(len(response.data['results']), 3)
+
+    def test_matches(self):
+        # Viewer (a cached token doesn't need the profile), page, interests
+        response = self.request('get', 'userprofile-matches', 3, 2)
+        self.assertEqual(len(response.data['results']), 1)
+
+    def test_interested_in_me(self):
+        response = self.request('get', 'userprofile-interested-in-me', 3, 2)
+        self.assertEqual(len(response.data['results']), 1)
+
+    def test_recommendations(self):
+        # Viewer, count, page, interests
+        response = self.request('get', 'userprofile-recommendations', 4, 4)
+        self.assertEqual(len(response.data['results']), 1)
+
+    def test_toggle_interest(self):
+        self.request('post', 'userprofile-toggle-interest', 5, 4, data={'profile_id': self.others[5].pk})
+
+    def test_update_me(self):
+        # Viewer, savepoint, update, search vector, release, interests; the
+        # location suggestions are only refreshed when a place changes
+        self.request('patch', 'userprofile-update-me', 6, 6, data={'bio': self.viewer.bio})
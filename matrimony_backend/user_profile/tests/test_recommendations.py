@@ -0,0 +1,81 @@
+from unittest import mock
+
+from django.test import TestCase, override_settings
+
+from user_profile import recommendations, tasks
+from user_profile.models import ProfileRecommendation, UserProfile
+
+from .factories import make_profile
+
+LOCAL_CACHE = {'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'recommendation-tests'}}
+
+
+def stored():
+    return sorted(
+        (viewer, candidate, round(score, 5))
+        for viewer, candidate, score in ProfileRecommendation.objects.values_list('viewer', 'candidate', 'score')
+    )
+
+
+@override_settings(CACHES=LOCAL_CACHE)
+class RefreshProfileTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cities = ['Kochi', 'Pune', 'Delhi']
+        for i in range(6):
+            make_profile('Male', city=cities[i % 3], height=160 + i * 3, family_type='nuclear')
+            make_profile('Female', city=cities[(i + 1) % 3], height=150 + i * 2, family_type='joint')
+
+    def setUp(self):
+        recommendations.cache.clear()
+        recommendations.refresh_all()
+
+    def test_matches_a_full_refresh(self):
+        profile = UserProfile.objects.filter(gender='Female').first()
+        UserProfile.objects.filter(pk=profile.pk).update(city='Pune', family_type='nuclear')
+
+        with mock.patch.object(recommendations.ProfileMatrix, 'load', side_effect=AssertionError('loaded')):
+            recommendations.refresh_profile(profile.pk)
+        incremental = stored()
+
+        recommendations.refresh_all()
+        self.assertEqual(incremental, stored())
+
+    def test_new_profile_is_added_to_the_matrix(self):
+        profile = make_profile('Female', city='Kochi')
+        recommendations.refresh_profile(profile.pk)
+        self.assertIn(profile.pk, recommendations.ProfileMatrix.cached().index)
+        self.assertTrue(ProfileRecommendation.objects.filter(viewer=profile).exists())
+        self.assertTrue(ProfileRecommendation.objects.filter(candidate=profile).exists())
+
+    def test_deleted_candidates_are_skipped(self):
+        viewer = UserProfile.objects.filter(gender='Male').first()
+        deleted = UserProfile.objects.filter(gender='Female').first()
+        deleted.user.delete()
+        recommendations.refresh_profile(viewer.pk)
+        candidates = set(ProfileRecommendation.objects.filter(viewer=viewer).values_list('candidate', flat=True))
+        self.assertNotIn(deleted.pk, candidates)
+        self.assertTrue(candidates)
+
+
+@override_settings(CACHES=LOCAL_CACHE)
+class QueueRecommendationsTests(TestCase):
+    def setUp(self):
+        tasks.cache.clear()
+
+    def test_edits_are_coalesced(self):
+        with mock.patch.object(tasks, 'enqueue_on_commit') as enqueue:
+            with self.captureOnCommitCallbacks(execute=True):
+                profile = make_profile('Female')
+            for city in ('Kochi', 'Pune'):
+                with self.captureOnCommitCallbacks(execute=True):
+                    profile.city = city
+                    profile.save()
+            self.assertEqual(enqueue.call_count, 1)
+
+            # Once the queued refresh starts, the next edit queues another
+            with mock.patch.object(recommendations, 'refresh_profile'):
+                tasks.refresh_profile_recommendations(profile.pk)
+            with self.captureOnCommitCallbacks(execute=True):
+                profile.save()
+            self.assertEqual(enqueue.call_count, 2)
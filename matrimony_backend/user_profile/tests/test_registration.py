@@ -0,0 +1,126 @@
+import threading
+from collections import Counter
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.urls import reverse
+from celery import group
+from rest_framework.test import APIClient
+
+from notification.models import Device
+from notification.tasks import send_welcome_notification
+
+from user_profile.constraints import MESSAGES
+from user_profile.models import UserProfile
+
+from .factories import client_for, make_profile
+
+User = get_user_model()
+
+LOCAL_CACHE = {'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'registration-tests'}}
+
+
+def registration(email, phone_number):
+    return {
+        'email': email,
+        'password': 'race-password-123',
+        'first_name': 'Race',
+        'last_name': 'Check',
+        'phone_number': phone_number,
+        'gender': 'Female',
+    }
+
+
+@override_settings(CACHES=LOCAL_CACHE)
+class ConcurrentRegistrationTests(TransactionTestCase):
+    """
+    Registrations sharing an email (in different cases) or a phone number,
+    posted at once: the database lets exactly one through and the rest get
+    the duplicate's error message rather than a server error.
+    """
+
+    concurrency = 8
+
+    def register_concurrently(self, payloads):
+        """The status code, or 400's error message, of each registration"""
+        barrier = threading.Barrier(len(payloads))
+        outcomes = []
+
+        def run(payload):
+            client = APIClient()
+            try:
+                barrier.wait()
+                response = client.post(reverse('userprofile-register'), payload, format='json')
+                outcomes.append(response.data['detail'] if response.status_code == 400 else response.status_code)
+            finally:
+                connection.close()
+
+        threads = [threading.Thread(target=run, args=(payload,)) for payload in payloads]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        return Counter(outcomes)
+
+    def test_same_email(self):
+        email = 'race@example.com'
+        payloads = [
+            registration(email.upper() if i % 2 else email, f'+16502530{i:03d}')
+            for i in range(self.concurrency)
+        ]
+        outcomes = self.register_concurrently(payloads)
+        self.assertEqual(outcomes, Counter({201: 1, MESSAGES['email']: self.concurrency - 1}))
+        self.assertEqual(User.objects.filter(email__iexact=email).count(), 1)
+
+    def test_same_phone_number(self):
+        phone_number = '+16502531000'
+        payloads = [registration(f'race-{i}@example.com', phone_number) for i in range(self.concurrency)]
+        outcomes = self.register_concurrently(payloads)
+        self.assertEqual(outcomes, Counter({201: 1, MESSAGES['phone_number']: self.concurrency - 1}))
+        self.assertEqual(UserProfile.objects.filter(phone_number=phone_number).count(), 1)
+        # The losers' users were rolled back with their profiles
+        self.assertEqual(User.objects.filter(email__startswith='race-').count(), 1)
+
+
+@override_settings(CACHES=LOCAL_CACHE)
+class DuplicateEmailTests(TestCase):
+    """Changing an account's email to another's is a 400, not a server error"""
+
+    def test_profile_update(self):
+        profile, other = make_profile(), make_profile()
+        response = client_for(profile).put(
+            reverse('auth-profile'), {'email': other.user.email.upper()}, format='json'
+        )
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.data, {'email': MESSAGES['email']})
+        profile.user.refresh_from_db()
+        self.assertNotEqual(profile.user.email.lower(), other.user.email.lower())
+
+
+@override_settings(CACHES=LOCAL_CACHE)
+class RegistrationTasksTests(TestCase):
+    """Device registration and the welcome notification don't depend on each other"""
+
+    def test_queued_independently(self):
+        payload = registration('welcome@example.com', '+16502532000')
+        with mock.patch('user_profile.views.enqueue_on_commit') as enqueue:
+            response = APIClient().post(
+                reverse('userprofile-register'), {**payload, 'device_token': 'device-1'}, format='json'
+            )
+        self.assertEqual(response.status_code, 201)
+        (signature,), _ = enqueue.call_args
+        self.assertIsInstance(signature, group)
+        self.assertEqual(
+            sorted(task.task for task in signature.tasks),
+            ['notification.tasks.register_device', 'notification.tasks.send_welcome_notification'],
+        )
+
+    def test_welcome_registers_the_device(self):
+        profile = make_profile()
+        with mock.patch('notification.tasks.FirebaseNotificationService') as service:
+            service.return_value.send_to_user.return_value = []
+            send_welcome_notification(profile.user.pk, device_token='device-2')
+        self.assertTrue(Device.objects.filter(user=profile.user, token='device-2').exists())
+        service.return_value.send_to_user.assert_called_once()
@@ -0,0 +1,30 @@
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from .factories import client_for, make_profile
+
+NO_CACHE = {'default': {'BACKEND': 'django.core.cache.backends.dummy.DummyCache'}}
+
+
+@override_settings(CACHES=NO_CACHE)
+class ProfileSearchTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.viewer = make_profile('Male')
+        cls.alice = make_profile('Female')
+        cls.alice.user.email = 'alice.smith@example.com'
+        cls.alice.user.save()
+        make_profile('Female')
+
+    def search(self, term):
+        response = client_for(self.viewer).get(reverse('userprofile-list'), {'search': term})
+        self.assertEqual(response.status_code, 200)
+        return [profile['user'] for profile in response.data['results']]
+
+    def test_full_email(self):
+        self.assertEqual(self.search('alice.smith@example.com'), [self.alice.pk])
+
+    def test_email_parts(self):
+        for term in ('alice', 'alice.smith', 'smith@example'):
+            with self.subTest(term):
+                self.assertEqual(self.search(term), [self.alice.pk])
@@ -0,0 +1,147 @@
+"""
+Direct-to-S3 uploads of profile photos.
+
+Instead of sending the photo through the API, the client asks for a
+presigned POST form (presign_photo_upload), sends the file straight to S3
+with it, then reports the key back (attach_uploaded_photo). S3 enforces the
+size and content type limits of the form; on completion the object is
+checked to be an image and copied next to regular uploads within S3.
+Uploads that are never attached are left under UPLOADS_DIR for a bucket
+lifecycle rule to expire (see README).
+"""
+import io
+import posixpath
+import re
+import uuid
+
+from botocore.exceptions import ClientError
+from django.conf import settings
+from PIL import Image
+from storages.backends.s3boto3 import S3Boto3Storage
+
+from .models import UserProfile
+
+# Content types accepted, with the file extension and Pillow format of each
+CONTENT_TYPES = {
+    'image/jpeg': ('jpg', 'JPEG'),
+    'image/png': ('png', 'PNG'),
+    'image/webp': ('webp', 'WEBP'),
+}
+
+UPLOADS_DIR = 'profile_photos/uploads'
+
+MAX_SIZE = getattr(settings, 'PROFILE_PHOTO_MAX_UPLOAD_SIZE', 10 * 1024 * 1024)
+EXPIRES_IN = getattr(settings, 'PROFILE_PHOTO_UPLOAD_EXPIRY', 300)
+
+# Enough of a file for Pillow to read its format and dimensions, including
+# the large EXIF blocks of camera photos
+HEADER_BYTES = 256 * 1024
+
+
+class UploadError(Exception):
+    """The upload can't be started or attached; the message is for the client"""
+    status_code = 400
+
+
+class UploadsUnavailable(UploadError):
+    status_code = 503
+
+
+def _storage():
+    storage = UserProfile._meta.get_field('photo').storage
+    if not isinstance(storage, S3Boto3Storage):
+        raise UploadsUnavailable('Direct uploads need S3 storage; upload the photo with update_me')
+    return storage
+
+
+def _object_key(storage, name):
+    """Bucket key of the storage file ``name``"""
+    return posixpath.join(storage.location, name) if storage.location else name
+
+
+def presign_photo_upload(profile_id, content_type):
+    """
+    Presigned POST form for uploading one photo of ``content_type``:
+    {url, fields, key, max_size, expires_in}. The client POSTs ``fields``
+    plus the file (as the last field, named "file") to ``url``.
+    """
+    if content_type not in CONTENT_TYPES:
+        raise UploadError(f'content_type must be one of: {", ".join(CONTENT_TYPES)}')
+    storage = _storage()
+
+    extension, _ = CONTENT_TYPES[content_type]
+    name = f'{UPLOADS_DIR}/{profile_id}/{uuid.uuid4().hex}.{extension}'
+    post = storage.connection.meta.client.generate_presigned_post(
+        Bucket=storage.bucket_name,
+        Key=_object_key(storage, name),
+        Fields={'Content-Type': content_type},
+        Conditions=[
+            {'Content-Type': content_type},
+            ['content-length-range', 1, MAX_SIZE],
+        ],
+        ExpiresIn=EXPIRES_IN,
+    )
+    return {
+        'url': post['url'],
+        'fields': post['fields'],
+        'key': name,
+        'max_size': MAX_SIZE,
+        'expires_in': EXPIRES_IN,
+    }
+
+
+def attach_uploaded_photo(profile, key):
+    """
+    Make the photo uploaded to ``key`` (from presign_photo_upload) the
+    profile's photo, after checking it is an image of the declared type
+    """
+    match = re.fullmatch(rf'{UPLOADS_DIR}/{profile.pk}/([0-9a-f]{{32}})\.(\w+)', key or '')
+    extensions = {extension: content_type for content_type, (extension, _) in CONTENT_TYPES.items()}
+    if match is None or match.group(2) not in extensions:
+        raise UploadError('Unknown upload key')
+    storage = _storage()
+    client = storage.connection.meta.client
+    source = {'Bucket': storage.bucket_name, 'Key': _object_key(storage, key)}
+    content_type = extensions[match.group(2)]
+
+    try:
+        response = client.get_object(**source, Range=f'bytes=0-{HEADER_BYTES - 1}')
+    except ClientError as exc:
+        if exc.response['Error']['Code'] in ('NoSuchKey', '404'):
+            raise UploadError('Upload not found; it may have expired') from exc
+        raise
+    header = response['Body'].read()
+
+    # The policy already limits the size; not every S3 stand-in enforces it
+    size = int(response['ContentRange'].rsplit('/', 1)[1]) if 'ContentRange' in response else len(header)
+    if size > MAX_SIZE:
+        client.delete_object(**source)
+        raise UploadError(f'The photo must be at most {MAX_SIZE} bytes')
+
+    try:
+        image = Image.open(io.BytesIO(header))
+    except OSError:
+        # Not an image, or its header doesn't fit in HEADER_BYTES
+        image = None
+    if image is None or image.format != CONTENT_TYPES[content_type][1]:
+        client.delete_object(**source)
+        raise UploadError(f'The upload is not an image of type {content_type}')
+    if Image.MAX_IMAGE_PIXELS and image.width * image.height > Image.MAX_IMAGE_PIXELS:
+        client.delete_object(**source)
+        raise UploadError('The image has too many pixels')
+
+    # Copied within S3, so the photo never passes through the API
+    name = f'profile_photos/{match.group(1)}.{match.group(2)}'
+    client.copy_object(
+        CopySource=source,
+        Bucket=storage.bucket_name,
+        Key=_object_key(storage, name),
+        ContentType=content_type,
+        MetadataDirective='REPLACE',
+        **storage.get_object_parameters(_object_key(storage, name)),
+    )
+    client.delete_object(**source)
+
+    profile.photo.name = name
+    profile.save(update_fields=['photo', 'updated_at'])
+    return profile
@@ -1,3 +1,4 @@
+from django.conf import settings
 from django.urls import path, include
 from rest_framework.routers import DefaultRouter
 from .views import UserProfileViewSet
@@ -5,6 +6,12 @@ from .views import UserProfileViewSet
 router = DefaultRouter()
 router.register(r'profiles', UserProfileViewSet, basename='userprofile')
 
+profile_urls = router.urls
+
+if settings.ASYNC_PROFILE_READS:
+    from .async_views import use_async_reads
+    profile_urls = use_async_reads(profile_urls)
+
 urlpatterns = [
-    path('', include(router.urls)),
+    path('', include(profile_urls)),
 ]
@@ -1,18 +1,41 @@
 from rest_framework import viewsets, status
 from rest_framework.decorators import action
+from rest_framework.exceptions import ValidationError
 from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated, AllowAny
 from rest_framework.authtoken.models import Token
 from django.contrib.auth import get_user_model
-from django.db import transaction
-from .models import UserProfile
-from .serializers import UserProfileSerializer, UserProfileCreateUpdateSerializer
+from django.db import IntegrityError, transaction
+from django.db.models import F
+from django.http import Http404
+from django_filters.rest_framework import DjangoFilterBackend
+from authentication import hashing
+from authentication.viewer import get_viewer
+from celery import group
+from rest_framework.filters import OrderingFilter
+from . import cache as profile_cache
+from . import constraints as profile_constraints
+from . import interests as profile_interests
+from . import uploads as profile_uploads
+from .filters import UserProfileFilterSet, fuzzy_location_filter
+from .models import Location, UserProfile
+from .search import ProfileSearchFilter
+from .serializers import (
+    EagerLoadingMixin,
+    LocationSerializer,
+    UserProfileSerializer,
+    UserProfileCreateUpdateSerializer,
+    UserProfileReadSerializer,
+)
 import phonenumbers
+import uuid
 
 User = get_user_model()
 
 
-from matrimony.pagination import CustomPagination
+from matrimony.celery import enqueue_on_commit
+from matrimony.pagination import CustomPagination, KeysetPagination
+from notification.tasks import register_device, send_welcome_notification
 
 class UserProfileViewSet(viewsets.ModelViewSet):
     """
@@ -24,42 +47,271 @@ class UserProfileViewSet(viewsets.ModelViewSet):
     pagination_class = CustomPagination
 
     # Filter and Search
-    filterset_fields = {
-        'gender': ['exact'],
-        'city': ['icontains', 'exact'],
-        'state': ['icontains', 'exact'],
-        'country': ['icontains', 'exact'],
-        'family_type': ['exact'],
-        'family_status': ['exact'],
-        'height': ['gte', 'lte'],
-        'weight': ['gte', 'lte'],
-        'siblings': ['exact', 'gte', 'lte'],
-    }
+    filter_backends = [DjangoFilterBackend, ProfileSearchFilter, OrderingFilter]
+    filterset_class = UserProfileFilterSet
     search_fields = ['user__first_name', 'user__last_name', 'user__email', 'city', 'state', 'bio']
     ordering_fields = ['created_at', 'height', 'weight']
+
+    # Most profile_ids accepted by toggle_interests
+    max_bulk_toggles = 100
+    # Most ids accepted by bulk
+    max_bulk_profiles = 100
+
+    # List actions whose rows can be trimmed with ?fields=, ?exclude= or ?view=
+    sparse_actions = ('list', 'my_interests', 'matches', 'interested_in_me', 'recommendations')
+
+    @property
+    def viewer(self):
+        """Who the request is made by, with their profile loaded once"""
+        return get_viewer(self.request)
+
+    @property
+    def pagination_count_strategy(self):
+        """Feed counts may lag behind briefly; own interest lists must not"""
+        return 'exact' if self.action in ('my_interests', 'recommendations') else 'estimate'
     
     def get_queryset(self):
         """Return profiles - admins see all, users see others (excluding self and same gender)"""
         if self.request.user.is_staff:
-            return UserProfile.objects.all()
+            return self.with_eager_loading(UserProfile.objects.all())
         
         # Initial queryset excluding self
         queryset = UserProfile.objects.exclude(user=self.request.user)
         
-        # If user has a profile, exclude same gender
-        if hasattr(self.request.user, 'profile'):
-            user_gender = self.request.user.profile.gender
-            if user_gender:
-                queryset = queryset.exclude(gender=user_gender)
+        # If user has a profile, only show the other gender(s). Filtering
+        # with equality (rather than excluding) lets the feed use the
+        # (gender, created_at) index.
+        visible_genders = self.get_visible_genders()
+        if visible_genders is not None:
+            queryset = queryset.filter(gender__in=visible_genders)
         
-        return queryset.order_by('-created_at')
+        return self.with_eager_loading(queryset.order_by('-created_at', '-user_id'))
+
+    def get_visible_genders(self):
+        """Genders a non-staff viewer is shown, None if not restricted"""
+        profile = self.viewer.profile
+        if profile is not None:
+            user_gender = profile.gender
+            if user_gender:
+                gender_choices = UserProfile._meta.get_field('gender').choices
+                return [value for value, _ in gender_choices if value != user_gender]
+        return None
+
+    def can_view(self, profile_data):
+        """get_queryset's visibility rules, applied to a serialized profile"""
+        user = self.request.user
+        if user.is_staff:
+            return True
+        if profile_data['user'] == user.pk:
+            return False
+        visible_genders = self.get_visible_genders()
+        return visible_genders is None or profile_data['gender'] in visible_genders
+
+    def get_cache_scope(self):
+        """Viewers in the same scope are shown exactly the same feed"""
+        if self.request.user.is_staff:
+            return 'staff'
+        if self.get_visible_genders() is not None:
+            return f'gender:{self.viewer.profile.gender}'
+        return f'user:{self.request.user.pk}'
+
+    def get_cached_response(self, key, data=None):
+        """
+        304 when the client already has ``key``'s content, the cached body
+        (or ``data``) otherwise, None if the response has to be built
+        """
+        if key is None:
+            return None
+        etag = profile_cache.etag_for(key)
+        if profile_cache.is_not_modified(self.request, etag):
+            response = Response(status=status.HTTP_304_NOT_MODIFIED)
+        else:
+            if data is None:
+                data = profile_cache.get_data(key)
+            if data is None:
+                return None
+            response = Response(data)
+        return self.add_cache_headers(response, etag)
+
+    def get_cached_feed_page(self, key):
+        """304 or the cached feed page ``key`` while none of its profiles changed, None otherwise"""
+        cached = profile_cache.get_feed_page(key)
+        if cached is None:
+            return None
+        data, etag = cached
+        if profile_cache.is_not_modified(self.request, etag):
+            response = Response(status=status.HTTP_304_NOT_MODIFIED)
+        else:
+            response = Response(data)
+        return self.add_cache_headers(response, etag)
+
+    def cache_feed_page(self, key, response):
+        """Store a freshly built feed page under ``key``, with the profiles it shows"""
+        page = getattr(self.paginator, 'page', None)
+        if key is not None and page is not None and response.status_code == status.HTTP_200_OK:
+            etag = profile_cache.set_feed_page(key, response.data, [profile.pk for profile in page])
+            if etag is not None:
+                self.add_cache_headers(response, etag)
+        return response
+
+    def cache_response(self, key, response):
+        """Store a freshly built response under ``key``"""
+        if key is not None and response.status_code == status.HTTP_200_OK:
+            profile_cache.set_data(key, response.data)
+            self.add_cache_headers(response, profile_cache.etag_for(key))
+        return response
+
+    def add_cache_headers(self, response, etag):
+        response['ETag'] = etag
+        # Clients may keep the body but must revalidate it before reuse
+        response['Cache-Control'] = 'private, no-cache'
+        return response
+
+    # Interest lists, newest first, always paged by cursor
+    keyset_orderings = {
+        'matches': ('-matched_at', '-user_id'),
+        'interested_in_me': ('-interested_at', '-user_id'),
+    }
+
+    @property
+    def pagination_keyset_ordering(self):
+        return self.keyset_orderings.get(self.action, KeysetPagination.ordering)
+
+    @property
+    def paginator(self):
+        """Page-number pagination by default, keyset pagination on request"""
+        if not hasattr(self, '_paginator'):
+            if self.action in self.keyset_orderings:
+                self._paginator = KeysetPagination()
+            # Recommendations are ranked by score and few enough for page numbers
+            elif KeysetPagination.is_requested(self.request) and self.action != 'recommendations':
+                self._paginator = KeysetPagination()
+            else:
+                self._paginator = self.pagination_class()
+        return self._paginator
+
+    def with_eager_loading(self, queryset):
+        """Load the relations the read serializer renders alongside the rows"""
+        serializer = self.get_serializer()
+        if isinstance(serializer, EagerLoadingMixin):
+            # Keyset pagination reads created_at from every row
+            return serializer.setup_eager_loading(queryset, required_fields=['created_at'])
+        return queryset
     
     def get_serializer_class(self):
         """Use different serializers for read and write operations"""
         if self.action in ['create', 'update', 'partial_update']:
             return UserProfileCreateUpdateSerializer
-        return UserProfileSerializer
+        return UserProfileReadSerializer
+
+    def get_serializer(self, *args, **kwargs):
+        if self.action in self.sparse_actions:
+            fields, exclude = self.get_sparse_fields()
+            kwargs.setdefault('fields', fields)
+            kwargs.setdefault('exclude', exclude)
+        return super().get_serializer(*args, **kwargs)
+
+    def get_sparse_fields(self):
+        """
+        (fields, exclude) requested with ?fields=a,b, ?exclude=a,b or
+        ?view=<representation>; fields is None when not limited
+        """
+        params = self.request.query_params
+        serializer_class = self.get_serializer_class()
+
+        def names(param):
+            return [name.strip() for name in params.get(param, '').split(',') if name.strip()]
+
+        fields = None
+        view = params.get('view')
+        if view:
+            if view not in serializer_class.representations:
+                choices = ', '.join(serializer_class.representations)
+                raise ValidationError({'view': [f'Unknown view. Choose from: {choices}']})
+            fields = serializer_class.representations[view]
+        if names('fields'):
+            fields = names('fields')
+        exclude = names('exclude')
+
+        unknown = (set(fields or ()) | set(exclude)) - set(serializer_class.Meta.fields)
+        if unknown:
+            raise ValidationError({'fields': [f'Unknown fields: {", ".join(sorted(unknown))}']})
+        return fields, exclude
     
+    def list(self, request, *args, **kwargs):
+        key = profile_cache.feed_cache_key(request, self.get_cache_scope())
+        response = self.get_cached_feed_page(key)
+        if response is None:
+            response = self.cache_feed_page(key, super().list(request, *args, **kwargs))
+        return response
+
+    def retrieve(self, request, *args, **kwargs):
+        key = profile_cache.profile_cache_key(kwargs['pk'])
+        data = profile_cache.get_data(key)
+        if data is None:
+            # Loading through get_object applies the visibility rules
+            data = self.cache_response(key, super().retrieve(request, *args, **kwargs)).data
+        elif not self.can_view(data):
+            raise Http404
+        response = self.get_cached_response(key, data)
+        return response if response is not None else Response(data)
+    
+    @action(detail=False, methods=['get'])
+    def bulk(self, request):
+        """
+        Several profiles by user ID, in the requested order, e.g. to resolve
+        an interests list. IDs that don't exist or aren't visible to the
+        current user are reported in missing.
+        Query params: ids (comma separated, at most max_bulk_profiles)
+        """
+        try:
+            ids = [int(value) for value in request.query_params.get('ids', '').split(',') if value.strip()]
+        except ValueError:
+            return Response(
+                {'detail': 'ids must be a comma separated list of profile IDs'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        ids = list(dict.fromkeys(ids))
+        if not ids:
+            return Response(
+                {'detail': 'ids is required'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        if len(ids) > self.max_bulk_profiles:
+            return Response(
+                {'detail': f'At most {self.max_bulk_profiles} ids per request'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        # Cached profiles first, then the rest in one query
+        keys = profile_cache.profile_cache_keys(ids)
+        cached = profile_cache.get_many_data(keys.values())
+        profiles = {}
+        for pk, key in keys.items():
+            if key in cached:
+                profiles[pk] = cached[key] if self.can_view(cached[key]) else None
+
+        uncached = [pk for pk in ids if pk not in profiles]
+        if uncached:
+            instances = self.get_queryset().filter(pk__in=uncached)
+            serialized = {data['user']: data for data in self.get_serializer(instances, many=True).data}
+            profiles.update(serialized)
+            profile_cache.set_many_data({keys[pk]: data for pk, data in serialized.items() if pk in keys})
+
+        # Cached profiles are complete, so trim them here rather than in the serializer
+        fields, exclude = self.get_sparse_fields()
+        if fields is not None or exclude:
+            keep = set(fields if fields is not None else UserProfileSerializer.Meta.fields) - set(exclude)
+            profiles = {
+                pk: data and {name: value for name, value in data.items() if name in keep}
+                for pk, data in profiles.items()
+            }
+
+        return Response({
+            'results': [profiles[pk] for pk in ids if profiles.get(pk) is not None],
+            'missing': [pk for pk in ids if profiles.get(pk) is None],
+        })
+
     def perform_create(self, serializer):
         """Create profile for the current user"""
         serializer.save(user=self.request.user)
@@ -68,7 +320,8 @@ class UserProfileViewSet(viewsets.ModelViewSet):
     def register(self, request):
         """
         Register a new user with profile information.
-        Accepts: email, password, first_name, last_name, phone_number, gender
+        Accepts: email, password, first_name, last_name, phone_number, gender,
+        device_token (optional FCM token for push notifications)
         Returns: token and user profile data
         """
         # Validate required fields
@@ -103,85 +356,99 @@ class UserProfileViewSet(viewsets.ModelViewSet):
                     status=status.HTTP_400_BAD_REQUEST
                 )
             
-            # Check if phone number already exists
-            formatted_number = phonenumbers.format_number(parsed_number, phonenumbers.PhoneNumberFormat.E164)
-            if UserProfile.objects.filter(phone_number=formatted_number).exists():
-                return Response(
-                    {'detail': 'Phone number already registered'},
-                    status=status.HTTP_400_BAD_REQUEST
-                )
-            
             # Use normalized number for profile creation
-            phone_number = formatted_number
+            phone_number = phonenumbers.format_number(parsed_number, phonenumbers.PhoneNumberFormat.E164)
         except phonenumbers.NumberParseException:
             return Response(
                 {'detail': 'Invalid phone number format. Please include country code'},
                 status=status.HTTP_400_BAD_REQUEST
             )
         
-        # Check if email already exists
-        if User.objects.filter(email=email).exists():
+        # Use email as username. If that username is taken (its owner changed
+        # their email since), use email prefix + random suffix instead.
+        usernames = [email, f"{email.split('@')[0]}_{uuid.uuid4().hex[:6]}"]
+        device_token = request.data.get('device_token')
+        # Hashed once, on the hashing pool and outside the transaction
+        try:
+            encoded_password = hashing.make_password(password)
+        except TypeError as e:
             return Response(
-                {'detail': 'Email already exists'},
+                {'detail': str(e)},
                 status=status.HTTP_400_BAD_REQUEST
             )
-        
-        # Use email as username
-        username = email
-        
-        # Check if username already exists (shouldn't happen if email is unique, but just in case)
-        if User.objects.filter(username=username).exists():
-            # If email as username exists, try using email prefix + random suffix
-            import uuid
-            username = f"{email.split('@')[0]}_{uuid.uuid4().hex[:6]}"
-        print("ik")
-        try:
-            with transaction.atomic():
-                # Create user with email as username
-                user = User.objects.create_user(
-                    username=username,
-                    email=email,
-                    password=password,
-                    first_name=first_name,
-                    last_name=last_name
-                )
-                
-                # Create profile with gender and phone_number
-                profile = UserProfile.objects.create(
-                    user=user,
-                    gender=gender,
-                    phone_number=phone_number
+        for username in usernames:
+            # Email, phone number and username uniqueness is enforced by the
+            # database (see user_profile.constraints), not checked up front
+            try:
+                with transaction.atomic():
+                    # Create user with email as username, as create_user would
+                    user = User.objects.create(
+                        username=User.normalize_username(username),
+                        email=User.objects.normalize_email(email),
+                        password=encoded_password,
+                        first_name=first_name,
+                        last_name=last_name
+                    )
+
+                    # Create profile with gender and phone_number
+                    profile = UserProfile.objects.create(
+                        user=user,
+                        gender=gender,
+                        phone_number=phone_number
+                    )
+
+                    # Generate auth token
+                    token = Token.objects.create(user=user)
+
+                    # Everything else happens in the background once committed:
+                    # the welcome notification and device registration here
+                    # (independently, so one failing doesn't drop the other),
+                    # recommendations and photo processing through the
+                    # profile's post_save receivers
+                    welcome = send_welcome_notification.si(user.pk, device_token=device_token)
+                    if device_token:
+                        welcome = group(register_device.si(user.pk, device_token), welcome)
+                    enqueue_on_commit(welcome)
+                break
+            except IntegrityError as e:
+                field = profile_constraints.duplicate_field(e)
+                if field == 'username' and username != usernames[-1]:
+                    continue
+                return Response(
+                    {'detail': profile_constraints.MESSAGES.get(field, str(e))},
+                    status=status.HTTP_400_BAD_REQUEST
                 )
-                
-                # Generate auth token
-                token, _ = Token.objects.get_or_create(user=user)
-                
-                # Return token and profile data
+            except Exception as e:
                 return Response(
-                    {
-                        'token': token.key,
-                        'user': UserProfileSerializer(profile).data
-                    },
-                    status=status.HTTP_201_CREATED
+                    {'detail': str(e)},
+                    status=status.HTTP_400_BAD_REQUEST
                 )
-        except Exception as e:
-            return Response(
-                {'detail': str(e)},
-                status=status.HTTP_400_BAD_REQUEST
-            )
+
+        # Return token and profile data
+        return Response(
+            {
+                'token': token.key,
+                'user': UserProfileSerializer(profile).data
+            },
+            status=status.HTTP_201_CREATED
+        )
     
     @action(detail=False, methods=['get'])
     def me(self, request):
         """Get the current user's profile"""
-        try:
-            profile = UserProfile.objects.get(user=request.user)
-            serializer = self.get_serializer(profile)
-            return Response(serializer.data)
-        except UserProfile.DoesNotExist:
+        key = profile_cache.profile_cache_key(request.user.pk)
+        response = self.get_cached_response(key)
+        if response is not None:
+            return response
+
+        profile = self.viewer.profile
+        if profile is None:
             return Response(
                 {'detail': 'Profile not found'},
                 status=status.HTTP_404_NOT_FOUND
             )
+        serializer = self.get_serializer(profile)
+        return self.cache_response(key, Response(serializer.data))
     
     @action(detail=False, methods=['post'])
     def toggle_interest(self, request):
@@ -193,57 +460,126 @@ class UserProfileViewSet(viewsets.ModelViewSet):
                 status=status.HTTP_400_BAD_REQUEST
             )
         
-        try:
-            target_profile = UserProfile.objects.get(pk=profile_id)
-            user_profile = UserProfile.objects.get(user=request.user)
-            
-            if target_profile == user_profile:
-                return Response(
-                    {'detail': 'You cannot express interest in your own profile'},
-                    status=status.HTTP_400_BAD_REQUEST
-                )
-            
-            if user_profile.interests.filter(pk=profile_id).exists():
-                user_profile.interests.remove(target_profile)
-                is_interested = False
-                message = "Interest removed"
-            else:
-                user_profile.interests.add(target_profile)
-                is_interested = True
-                message = "Interest expressed"
-            
-            return Response({
-                'is_interested': is_interested,
-                'message': message
-            }, status=status.HTTP_200_OK)
-            
-        except UserProfile.DoesNotExist:
+        data, response_status = self.toggle_interest_in(profile_id)
+        return Response(data, status=response_status)
+
+    @action(detail=False, methods=['post'])
+    def toggle_interests(self, request):
+        """
+        Toggle interest in several profiles, in order (e.g. actions queued
+        while offline). Each toggle succeeds or fails on its own.
+        Accepts: profile_ids (list, at most 100)
+        """
+        profile_ids = request.data.get('profile_ids')
+        if not isinstance(profile_ids, list) or not profile_ids:
             return Response(
-                {'detail': 'Target profile not found'},
-                status=status.HTTP_404_NOT_FOUND
+                {'detail': 'profile_ids must be a non-empty list'},
+                status=status.HTTP_400_BAD_REQUEST
             )
+        if len(profile_ids) > self.max_bulk_toggles:
+            return Response(
+                {'detail': f'At most {self.max_bulk_toggles} profile_ids per request'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        results = []
+        counts = None
+        # Each toggle commits on its own, so its locks are released before
+        # the next is taken: bulk toggles over the same profiles in other
+        # orders can't deadlock each other
+        for profile_id in profile_ids:
+            data, response_status = self.toggle_interest_in(profile_id)
+            results.append({'profile_id': profile_id, 'status': response_status, **data})
+            counts = data.get('counts', counts)
+
+        return Response({'results': results, 'counts': counts}, status=status.HTTP_200_OK)
+
+    def toggle_interest_in(self, profile_id):
+        """Toggle the current user's interest in one profile; returns (data, status)"""
+        try:
+            profile_id = int(profile_id)
+        except (TypeError, ValueError):
+            return {'detail': 'Target profile not found'}, status.HTTP_404_NOT_FOUND
+
+        if profile_id == self.request.user.pk:
+            return (
+                {'detail': 'You cannot express interest in your own profile'},
+                status.HTTP_400_BAD_REQUEST
+            )
+
+        try:
+            is_interested, is_match, counts = profile_interests.toggle_interest(
+                self.request.user.pk, profile_id
+            )
+        except UserProfile.DoesNotExist:
+            return {'detail': 'Target profile not found'}, status.HTTP_404_NOT_FOUND
+
+        return {
+            'is_interested': is_interested,
+            'is_match': is_match,
+            'message': "Interest expressed" if is_interested else "Interest removed",
+            'counts': counts,
+        }, status.HTTP_200_OK
 
     @action(detail=False, methods=['get'])
     def my_interests(self, request):
         """List profiles the current user is interested in"""
-        try:
-            user_profile = UserProfile.objects.get(user=request.user)
-            interests = user_profile.interests.all().order_by('-created_at')
-            
-            page = self.paginate_queryset(interests)
-            if page is not None:
-                serializer = self.get_serializer(page, many=True)
-                return self.get_paginated_response(serializer.data)
-            
-            serializer = self.get_serializer(interests, many=True)
-            return Response(serializer.data)
-        except UserProfile.DoesNotExist:
+        user_profile = self.viewer.profile
+        if user_profile is None:
             return Response([], status=status.HTTP_200_OK)
+        interests = self.with_eager_loading(user_profile.interests.order_by('-created_at', '-user_id'))
+
+        page = self.paginate_queryset(interests)
+        if page is not None:
+            serializer = self.get_serializer(page, many=True)
+            return self.get_paginated_response(serializer.data)
+
+        serializer = self.get_serializer(interests, many=True)
+        return Response(serializer.data)
+
+    @action(detail=False, methods=['get'])
+    def matches(self, request):
+        """Profiles with mutual interest, most recent match first"""
+        matched = UserProfile.objects.filter(matched_with__profile=request.user.pk).annotate(
+            matched_at=F('matched_with__created_at')
+        )
+        return self.keyset_page(matched)
+
+    @action(detail=False, methods=['get'])
+    def interested_in_me(self, request):
+        """Profiles interested in the current user, most recent first"""
+        interested = UserProfile.objects.filter(interests_sent__to_profile=request.user.pk).annotate(
+            interested_at=F('interests_sent__created_at')
+        )
+        return self.keyset_page(interested)
+
+    def keyset_page(self, queryset):
+        page = self.paginate_queryset(self.with_eager_loading(queryset))
+        serializer = self.get_serializer(page, many=True)
+        return self.get_paginated_response(serializer.data)
+
+    @action(detail=False, methods=['get'])
+    def recommendations(self, request):
+        """
+        Most compatible profiles first, precomputed by
+        user_profile.recommendations. Empty until the first refresh has run.
+        """
+        recommended = self.get_queryset().filter(
+            recommended_to__viewer=request.user.pk
+        ).order_by('-recommended_to__score', '-user_id')
+
+        page = self.paginate_queryset(recommended)
+        if page is not None:
+            serializer = self.get_serializer(page, many=True)
+            return self.get_paginated_response(serializer.data)
+
+        serializer = self.get_serializer(recommended, many=True)
+        return Response(serializer.data)
 
     @action(detail=False, methods=['post', 'put', 'patch'])
     def update_me(self, request):
         """Update the current user's profile"""
-        profile, created = UserProfile.objects.get_or_create(user=request.user)
+        profile = self.viewer.profile or UserProfile.objects.get_or_create(user=request.user)[0]
         
         # Update User model fields if provided
         user = request.user
@@ -258,19 +594,10 @@ class UserProfileViewSet(viewsets.ModelViewSet):
             user_updated = True
         
         if 'email' in request.data:
-            new_email = request.data['email']
-            # Check if email is already taken by another user
-            if User.objects.filter(email=new_email).exclude(id=user.id).exists():
-                return Response(
-                    {'detail': 'Email already exists'},
-                    status=status.HTTP_400_BAD_REQUEST
-                )
-            user.email = new_email
+            # Uniqueness is enforced by the database (see user_profile.constraints)
+            user.email = request.data['email']
             user_updated = True
         
-        if user_updated:
-            user.save()
-        
         # Update UserProfile fields
         serializer = UserProfileCreateUpdateSerializer(
             profile,
@@ -278,10 +605,81 @@ class UserProfileViewSet(viewsets.ModelViewSet):
             partial=request.method == 'PATCH'
         )
         serializer.is_valid(raise_exception=True)
-        serializer.save()
+
+        try:
+            with transaction.atomic():
+                if user_updated:
+                    user.save()
+                serializer.save()
+        except IntegrityError as e:
+            field = profile_constraints.duplicate_field(e)
+            if field not in profile_constraints.MESSAGES:
+                raise
+            return Response(
+                {'detail': profile_constraints.MESSAGES[field]},
+                status=status.HTTP_400_BAD_REQUEST
+            )
         
         # Return full profile data
         return Response(
             UserProfileSerializer(profile).data,
             status=status.HTTP_200_OK
         )
+
+    @action(detail=False, methods=['post'])
+    def photo_upload_url(self, request):
+        """
+        Presigned form for uploading a profile photo straight to S3; attach
+        it with photo_upload_complete afterwards.
+        Body: content_type (image/jpeg, image/png or image/webp)
+        """
+        try:
+            upload = profile_uploads.presign_photo_upload(request.user.pk, request.data.get('content_type'))
+        except profile_uploads.UploadError as e:
+            return Response({'detail': str(e)}, status=e.status_code)
+        return Response(upload)
+
+    @action(detail=False, methods=['post'])
+    def photo_upload_complete(self, request):
+        """
+        Make a photo uploaded with photo_upload_url the current user's photo.
+        Body: key (as returned by photo_upload_url)
+        """
+        profile = self.viewer.profile or UserProfile.objects.get_or_create(user=request.user)[0]
+        try:
+            profile_uploads.attach_uploaded_photo(profile, request.data.get('key'))
+        except profile_uploads.UploadError as e:
+            return Response({'detail': str(e)}, status=e.status_code)
+        return Response(
+            UserProfileSerializer(profile).data,
+            status=status.HTTP_200_OK
+        )
+
+    @action(detail=False, methods=['get'])
+    def locations(self, request):
+        """
+        Autocomplete suggestions for location filters.
+        Query params: kind (city, state or country), q (partial text), limit
+        """
+        kind = request.query_params.get('kind', 'city')
+        if kind not in dict(Location.KIND_CHOICES):
+            return Response(
+                {'detail': 'kind must be one of: city, state, country'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        try:
+            limit = max(1, min(int(request.query_params.get('limit', 10)), 50))
+        except ValueError:
+            return Response(
+                {'detail': 'limit must be a number'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        locations = Location.objects.filter(kind=kind)
+        query = request.query_params.get('q', '').strip()
+        if query:
+            locations = fuzzy_location_filter(locations, 'value', query)
+
+        locations = locations.order_by('-profile_count', 'value')[:limit]
+        return Response({'results': LocationSerializer(locations, many=True).data})